@@ -0,0 +1,58 @@
+from typing import Callable, Final
+import time
+
+ACTIVE_INTERVAL_DEFAULT: Final[float] = 15.0
+NORMAL_INTERVAL_DEFAULT: Final[float] = 60.0
+QUIET_INTERVAL_DEFAULT: Final[float] = 180.0
+QUIET_AFTER_DEFAULT: Final[float] = 30 * 60.0
+
+
+class AdaptiveInterval:
+    """ページの状態に応じてポーリング間隔を決定する
+
+    - 現在発生中の災害がある、またはページが変化した: active_interval
+    - 最後に上記の状態になってから quiet_after 秒未満: normal_interval
+    - それ以降（静かな状態が続いている）: quiet_interval
+    """
+
+    def __init__(
+        self,
+        active_interval: float = ACTIVE_INTERVAL_DEFAULT,
+        normal_interval: float = NORMAL_INTERVAL_DEFAULT,
+        quiet_interval: float = QUIET_INTERVAL_DEFAULT,
+        quiet_after: float = QUIET_AFTER_DEFAULT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not (0 < active_interval <= normal_interval <= quiet_interval):
+            raise ValueError('interval setting is illegal.')
+        self._active_interval: Final[float] = active_interval
+        self._normal_interval: Final[float] = normal_interval
+        self._quiet_interval: Final[float] = quiet_interval
+        self._quiet_after: Final[float] = quiet_after
+        self._clock: Final[Callable[[], float]] = clock
+        self._last_activity: float = clock()
+        self._active: bool = False
+        self._value: float = normal_interval
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    def update(self, changed: bool, active: bool | None = None) -> float:
+        # ポーリング結果を反映し、次のポーリング間隔を返す
+        # （active=None の場合は前回の状態を引き継ぐ）
+        if active is not None:
+            self._active = active
+        now = self._clock()
+        if changed or self._active:
+            self._last_activity = now
+            self._value = self._active_interval
+        elif now - self._last_activity < self._quiet_after:
+            self._value = self._normal_interval
+        else:
+            self._value = self._quiet_interval
+        return self._value
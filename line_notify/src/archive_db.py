@@ -0,0 +1,21 @@
+from pathlib import Path
+from typing import Final
+
+# 保存期間を過ぎた災害情報を移す月ごとのアーカイブDB（retention.DataRetention が作成し、
+# disaster_stats.DisasterStats、disaster_search.DisasterSearch が参照する）のファイル名
+ARCHIVE_DB_PREFIX: Final[str] = 'line_notify_data_'
+
+
+def archive_db_path(archive_dir: Path, month: str) -> Path:
+    # 月（YYYY-MM）ごとのアーカイブDB（ATTACH して災害情報テーブルと同じ列で参照できる）
+    return archive_dir / f'{ARCHIVE_DB_PREFIX}{month}.db'
+
+
+def archive_db_paths(archive_dir: Path) -> list[Path]:
+    # 作成済みのアーカイブDB（古い順）
+    return sorted(archive_dir.glob(f'{ARCHIVE_DB_PREFIX}*.db'))
+
+
+def archive_db_month(path: Path) -> str:
+    # アーカイブDBの月（YYYY-MM）
+    return path.stem[len(ARCHIVE_DB_PREFIX):]
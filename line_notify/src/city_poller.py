@@ -0,0 +1,182 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+from logging import getLogger, Logger
+from typing import Final, Protocol
+import asyncio
+
+from line_notify.src.ln_metrics import MetricsRegistry, get_metrics_registry, record_skipped_run
+from line_notify.src.run_lock import RunLock, acquire_or_skip
+from line_notify.src.structures import DisasterTextInfo, OverlapPolicy
+
+
+class CitySource(Protocol):
+    """MultiCityPoller でポーリングする都市ごとの取得元"""
+
+    name: str
+    interval: float
+
+    def fetch(self) -> str | None:
+        # Webページを取得（変更がない場合はNone）
+        ...
+
+    def parse(self, webpage_text: str) -> list[DisasterTextInfo]:
+        # 災害情報を抜き出す（parse_executor 上で実行される）
+        ...
+
+    def process(self, disaster_text_info_list: list[DisasterTextInfo]):
+        # 重複排除、登録、通知（パイプライン上で直列に実行される）
+        ...
+
+
+class MultiCityPoller:
+    """複数都市の取得元を1プロセスで並行してポーリングする
+
+    - 取得元ごとに独立したタスクで、それぞれのポーリング間隔で取得する
+    - 取得は fetch_executor、解析は parse_executor 上で実行し、イベントループを止めない
+    - 解析結果は共通のキューに入り、1つのパイプラインで順に重複排除、登録、通知を行う
+      （DBへの書き込みを直列化するため）
+    - 取得元ごとに実行中のポーリングは1回まで（取得から登録の完了まで次の回を始めない）
+      run_locks を指定した場合は、他のプロセス（cron で起動した NagaokaMain.main など）とも重ならないように
+      取得元のロックを取得してからポーリングし、取得できない回は行わない
+    - ポーリングが間隔を超えた場合は overlap_policy に従い、超過中の回を行わないか1回にまとめる
+    """
+
+    def __init__(
+        self,
+        sources: list[CitySource],
+        parse_executor: Executor | None = None,
+        logger: Logger | None = None,
+        overlap_policy: OverlapPolicy = OverlapPolicy.COALESCE,
+        run_locks: dict[str, RunLock] | None = None,
+        metrics: MetricsRegistry | None = None,
+    ):
+        if len({source.name for source in sources}) != len(sources):
+            raise ValueError('source name is duplicated.')
+
+        self._sources: Final[list[CitySource]] = list(sources)
+        self._logger: Final[Logger] = logger if logger is not None else getLogger('ln.poller')
+        self._overlap_policy: Final[OverlapPolicy] = overlap_policy
+        self._run_locks: Final[dict[str, RunLock]] = dict(run_locks or {})
+        self._metrics: Final[MetricsRegistry] = metrics if metrics is not None else get_metrics_registry()
+
+        # 取得は都市数分のスレッドで同時に行い、都市を追加しても待ち時間が直列に増えないようにする
+        self._fetch_executor: Final[Executor] = ThreadPoolExecutor(
+            max_workers=max(len(self._sources), 1), thread_name_prefix='ln-fetch'
+        )
+        # 解析用（ProcessPoolExecutorを指定する場合、parseはpickle可能である必要がある）
+        self._own_parse_executor: Final[bool] = parse_executor is None
+        self._parse_executor: Final[Executor] = (
+            parse_executor if parse_executor is not None
+            else ThreadPoolExecutor(max_workers=max(len(self._sources), 1), thread_name_prefix='ln-parse')
+        )
+        # パイプライン用（DB操作を直列化するため1スレッド）
+        self._pipeline_executor: Final[Executor] = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ln-pipeline')
+
+        self._queue: asyncio.Queue | None = None
+        self._stop_event: asyncio.Event | None = None
+
+    @property
+    def sources(self) -> list[CitySource]:
+        return list(self._sources)
+
+    async def run(self):
+        # stop() が呼ばれるまで全取得元をポーリング
+        self._queue = asyncio.Queue()
+        self._stop_event = asyncio.Event()
+        pipeline_task = asyncio.create_task(self._pipeline())
+        try:
+            await asyncio.gather(*(self._poll_loop(source) for source in self._sources))
+            await self._queue.join()
+        finally:
+            pipeline_task.cancel()
+            await asyncio.gather(pipeline_task, return_exceptions=True)
+
+    async def run_once(self):
+        # 全取得元を1回ずつ同時にポーリングし、パイプラインの処理完了まで待つ
+        self._queue = asyncio.Queue()
+        pipeline_task = asyncio.create_task(self._pipeline())
+        try:
+            await asyncio.gather(*(self._poll_once(source) for source in self._sources))
+            await self._queue.join()
+        finally:
+            pipeline_task.cancel()
+            await asyncio.gather(pipeline_task, return_exceptions=True)
+
+    def stop(self):
+        # ポーリングを停止（実行中のポーリングは完了まで待つ）
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    def shutdown(self):
+        # executorを終了
+        self._fetch_executor.shutdown(wait=True)
+        if self._own_parse_executor:
+            self._parse_executor.shutdown(wait=True)
+        self._pipeline_executor.shutdown(wait=True)
+
+    async def _poll_loop(self, source: CitySource):
+        loop = asyncio.get_running_loop()
+        while not self._stop_event.is_set():
+            started = loop.time()
+            await self._poll_once(source)
+            next_time = self._next_poll_time(source, started, loop.time())
+
+            # 次回ポーリングまで待機（停止要求があれば直ちに抜ける）
+            wait_time = max(next_time - loop.time(), 0.0)
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=wait_time)
+            except asyncio.TimeoutError:
+                pass
+
+    def _next_poll_time(self, source: CitySource, started: float, finished: float) -> float:
+        # 次回のポーリング開始時刻（間隔を超えた場合は、超過中の回を重ねずに行わないか1回にまとめる）
+        interval = source.interval
+        if interval <= 0 or finished - started <= interval:
+            return started + interval
+        overrun = int((finished - started) // interval)
+        if self._overlap_policy is OverlapPolicy.SKIP:
+            # 超過中の回は全て行わず、次の間隔の区切りから再開
+            skipped, next_time = overrun, started + (overrun + 1) * interval
+        else:
+            # 超過中の回を1回にまとめて直ちに行う
+            skipped, next_time = overrun - 1, finished
+        if skipped > 0:
+            self._logger.warning(
+                f'Polling took {finished - started:.1f}s (interval={interval:.1f}s). '
+                f'{skipped} run(s) skipped. ({source.name})'
+            )
+            record_skipped_run(self._metrics, source.name, 'overrun', skipped)
+        return next_time
+
+    async def _poll_once(self, source: CitySource):
+        loop = asyncio.get_running_loop()
+        lock = self._run_locks.get(source.name)
+        if lock is not None and not acquire_or_skip(lock, source.name, self._metrics, self._logger):
+            return
+        try:
+            webpage_text = await loop.run_in_executor(self._fetch_executor, source.fetch)
+            if webpage_text is None:
+                return
+            disaster_text_info_list = await loop.run_in_executor(self._parse_executor, source.parse, webpage_text)
+            # 登録、通知の完了まで待ち、同じ取得元の次のポーリングと重ならないようにする
+            processed = loop.create_future()
+            await self._queue.put((source, disaster_text_info_list, processed))
+            await processed
+        except Exception:
+            # 1都市の失敗で他の都市のポーリングを止めない
+            self._logger.exception(f'Failed to poll. ({source.name})')
+        finally:
+            if lock is not None:
+                lock.release()
+
+    async def _pipeline(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            source, disaster_text_info_list, processed = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._pipeline_executor, source.process, disaster_text_info_list)
+            except Exception:
+                self._logger.exception(f'Failed to process disaster text. ({source.name})')
+            finally:
+                if not processed.done():
+                    processed.set_result(None)
+                self._queue.task_done()
@@ -0,0 +1,287 @@
+from pathlib import Path
+from typing import Callable, Final
+import contextlib
+import sqlite3
+
+import yaml
+
+from line_notify.src.errors import DbOperationError
+from line_notify.src.master_data import MASTER_DATA_PATH
+
+# 都市ごとの災害情報テーブル
+DISASTER_TEXT_TABLES: Final[tuple[str, ...]] = ('t_disaster_text_nagaoka', 't_disaster_text_niigata')
+
+# 災害情報テーブルと都市名（集計テーブルの city_id）
+DISASTER_TEXT_TABLE_CITIES: Final[dict[str, str]] = {
+    't_disaster_text_nagaoka': '長岡市',
+    't_disaster_text_niigata': '新潟市',
+}
+
+# マスターデータのキーと登録先テーブル、列
+MASTER_TABLES: Final[tuple[tuple[str, str, str], ...]] = (
+    ('city_name', 't_city_name', 'city_name'),
+    ('disaster_category', 't_disaster_category', 'category_name'),
+    ('disaster_status', 't_disaster_status', 'status_name'),
+    ('district', 't_district', 'district_name'),
+)
+
+
+def _migrate_v1(conn: sqlite3.Connection, master_data: dict):
+    # マスターデータ用テーブル（IDはrowidを使用）
+    for _, table_name, column_name in MASTER_TABLES:
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table_name} ({column_name} TEXT NOT NULL UNIQUE);')
+
+    # 災害情報テーブル
+    # text_hash は正規化した災害情報文字列（と発生年）の固定長ハッシュ（disaster_store.fingerprint）
+    for table_name in DISASTER_TEXT_TABLES:
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table_name} (\n'
+            'datetime TEXT NOT NULL,\n'
+            'disaster_text TEXT NOT NULL,\n'
+            'text_hash BLOB NOT NULL\n'
+            ');'
+        )
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{table_name}_text_hash ON {table_name} (text_hash);')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table_name}_datetime ON {table_name} (datetime);')
+
+    # マスターデータ登録（定義順にrowidを割り当てる）
+    data: Final[dict] = master_data.get('data', {})
+    for key, table_name, column_name in MASTER_TABLES:
+        conn.executemany(
+            f'INSERT OR IGNORE INTO {table_name} ({column_name}) VALUES (?);',
+            [(value,) for value in data.get(key, [])]
+        )
+
+
+def _migrate_v2(conn: sqlite3.Connection, master_data: dict):
+    # 通知待ちメッセージ（アウトボックス）
+    # 時刻はUNIX時間[s]、delivered_at/failed_at がともにNULLの行が未送信
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS t_notify_outbox (\n'
+        'outbox_id INTEGER PRIMARY KEY,\n'
+        'token_key TEXT NOT NULL,\n'
+        'message TEXT NOT NULL,\n'
+        'created_at REAL NOT NULL,\n'
+        'attempts INTEGER NOT NULL DEFAULT 0,\n'
+        'next_attempt_at REAL NOT NULL,\n'
+        'delivered_at REAL,\n'
+        'failed_at REAL,\n'
+        'last_error TEXT\n'
+        ');'
+    )
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_t_notify_outbox_pending ON t_notify_outbox (next_attempt_at) '
+        'WHERE delivered_at IS NULL AND failed_at IS NULL;'
+    )
+
+
+def _migrate_v3(conn: sqlite3.Connection, master_data: dict):
+    # 災害情報の解析結果（disaster_text_parser.parse_disaster_record）
+    # district_id/category_id/status_id はマスターデータのrowid
+    for table_name in DISASTER_TEXT_TABLES:
+        for column in ('occurred_at TEXT', 'location TEXT', 'district_id INTEGER',
+                       'category_id INTEGER', 'status_id INTEGER', 'status_time TEXT'):
+            conn.execute(f'ALTER TABLE {table_name} ADD COLUMN {column};')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table_name}_occurred_at ON {table_name} (occurred_at);')
+        conn.execute(
+            f'CREATE INDEX IF NOT EXISTS idx_{table_name}_district_category '
+            f'ON {table_name} (district_id, category_id, status_id);'
+        )
+
+
+def _migrate_v4(conn: sqlite3.Connection, master_data: dict):
+    # 災害ごとの現在の状態（incident_tracker.IncidentTracker）
+    # 時刻はUNIX時間[s]、closed_at がNULLの行が対応中の災害
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS t_incident (\n'
+        'incident_key TEXT PRIMARY KEY,\n'
+        'city_id INTEGER NOT NULL,\n'
+        'occurred_at TEXT NOT NULL,\n'
+        'location TEXT NOT NULL,\n'
+        'category_id INTEGER NOT NULL,\n'
+        'status_id INTEGER NOT NULL,\n'
+        'updated_at REAL NOT NULL,\n'
+        'closed_at REAL\n'
+        ') WITHOUT ROWID;'
+    )
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_t_incident_open ON t_incident (city_id, occurred_at) '
+        'WHERE closed_at IS NULL;'
+    )
+
+
+def _migrate_v5(conn: sqlite3.Connection, master_data: dict):
+    # 通知先トークン（scripts/tools/token.py で登録する、同じ定義）
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS t_token (\n'
+        'token_key TEXT PRIMARY KEY,\n'
+        'token_value TEXT\n'
+        ');'
+    )
+    # t_token の変更回数（token_registry.TokenRegistry のキャッシュ無効化用、トリガーで更新）
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS t_token_version (\n'
+        'id INTEGER PRIMARY KEY CHECK (id = 1),\n'
+        'version INTEGER NOT NULL\n'
+        ');'
+    )
+    conn.execute('INSERT OR IGNORE INTO t_token_version (id, version) VALUES (1, 0);')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS tr_t_token_{event.lower()} AFTER {event} ON t_token '
+            'BEGIN UPDATE t_token_version SET version = version + 1 WHERE id = 1; END;'
+        )
+
+
+def _migrate_v6(conn: sqlite3.Connection, master_data: dict):
+    # 災害情報の全文検索用インデックス（disaster_search.DisasterSearch）
+    # 災害情報テーブルを外部コンテンツとするFTS5テーブル（trigram、3文字以上の語で検索できる）
+    # 登録済みの行を索引に追加し、以降の追加、削除はトリガーで反映する
+    for table_name in DISASTER_TEXT_TABLES:
+        fts_name = f'{table_name}_fts'
+        conn.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts_name} USING fts5('
+            f"disaster_text, content='{table_name}', content_rowid='rowid', tokenize='trigram');"
+        )
+        conn.execute(f"INSERT INTO {fts_name} ({fts_name}) VALUES ('rebuild');")
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS tr_{table_name}_fts_insert AFTER INSERT ON {table_name} '
+            f'BEGIN INSERT INTO {fts_name} (rowid, disaster_text) VALUES (new.rowid, new.disaster_text); END;'
+        )
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS tr_{table_name}_fts_delete AFTER DELETE ON {table_name} '
+            f"BEGIN INSERT INTO {fts_name} ({fts_name}, rowid, disaster_text) "
+            "VALUES ('delete', old.rowid, old.disaster_text); END;"
+        )
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS tr_{table_name}_fts_update AFTER UPDATE OF disaster_text ON {table_name} '
+            f"BEGIN INSERT INTO {fts_name} ({fts_name}, rowid, disaster_text) "
+            "VALUES ('delete', old.rowid, old.disaster_text); "
+            f'INSERT INTO {fts_name} (rowid, disaster_text) VALUES (new.rowid, new.disaster_text); END;'
+        )
+
+
+def _migrate_v7(conn: sqlite3.Connection, master_data: dict):
+    # 日別の件数（発生日 × 地区 × 災害種別 × 災害状況、disaster_stats.DisasterStats）
+    # 災害情報の登録と同じトランザクションでトリガーにより加算する（解析できなかった行は対象外）
+    # 災害情報テーブルから削除（保存期間経過による移動など）しても件数は減らさない
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS t_disaster_daily (\n'
+        'city_id INTEGER NOT NULL,\n'
+        'day TEXT NOT NULL,\n'
+        'district_id INTEGER NOT NULL,\n'
+        'category_id INTEGER NOT NULL,\n'
+        'status_id INTEGER NOT NULL,\n'
+        'count INTEGER NOT NULL,\n'
+        'PRIMARY KEY (city_id, day, district_id, category_id, status_id)\n'
+        ') WITHOUT ROWID;'
+    )
+    for table_name, city_name in DISASTER_TEXT_TABLE_CITIES.items():
+        city_id = f"(SELECT rowid FROM t_city_name WHERE city_name='{city_name}')"
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS tr_{table_name}_daily AFTER INSERT ON {table_name} '
+            'WHEN new.occurred_at IS NOT NULL AND new.district_id IS NOT NULL '
+            'AND new.category_id IS NOT NULL AND new.status_id IS NOT NULL '
+            'BEGIN '
+            'INSERT INTO t_disaster_daily (city_id, day, district_id, category_id, status_id, count) '
+            f'VALUES ({city_id}, substr(new.occurred_at, 1, 10), new.district_id, new.category_id, new.status_id, 1) '
+            'ON CONFLICT (city_id, day, district_id, category_id, status_id) DO UPDATE SET count=count+1; '
+            'END;'
+        )
+        conn.execute(
+            'INSERT INTO t_disaster_daily (city_id, day, district_id, category_id, status_id, count) '
+            f'SELECT {city_id}, substr(occurred_at, 1, 10), district_id, category_id, status_id, COUNT(*) '
+            f'FROM {table_name} WHERE occurred_at IS NOT NULL AND district_id IS NOT NULL '
+            'AND category_id IS NOT NULL AND status_id IS NOT NULL '
+            'GROUP BY 2, 3, 4, 5 '
+            'ON CONFLICT (city_id, day, district_id, category_id, status_id) DO UPDATE SET count=excluded.count;'
+        )
+
+
+def _migrate_v8(conn: sqlite3.Connection, master_data: dict):
+    # 保存期間を過ぎてアーカイブに移した災害情報のフィンガープリント（retention.DataRetention）
+    # 重複判定で災害情報テーブルとともに参照する（registered_at は災害情報テーブルの datetime）
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS t_recent_fingerprint (\n'
+        'city_id INTEGER NOT NULL,\n'
+        'text_hash BLOB NOT NULL,\n'
+        'registered_at TEXT NOT NULL,\n'
+        'PRIMARY KEY (city_id, text_hash)\n'
+        ') WITHOUT ROWID;'
+    )
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_t_recent_fingerprint_registered_at ON t_recent_fingerprint (registered_at);'
+    )
+
+
+# バージョンごとの移行処理（db_master_data.yaml の admin.system.db_version まで順に適用する）
+MIGRATIONS: Final[dict[int, Callable[[sqlite3.Connection, dict], None]]] = {
+    1: _migrate_v1,
+    2: _migrate_v2,
+    3: _migrate_v3,
+    4: _migrate_v4,
+    5: _migrate_v5,
+    6: _migrate_v6,
+    7: _migrate_v7,
+    8: _migrate_v8,
+}
+
+
+class DbMigration:
+    """データDBのスキーマを db_master_data.yaml の db_version まで移行する
+
+    適用済みのバージョンは PRAGMA user_version に記録し、
+    各バージョンの移行処理はスキーマ変更とバージョン更新を1トランザクションで行う。
+    """
+
+    def __init__(self, db_path: Path, master_data_path: Path = MASTER_DATA_PATH):
+        self._db_path: Final[Path] = db_path
+        self._master_data_path: Final[Path] = master_data_path
+
+    def load_master_data(self) -> dict:
+        master_data = yaml.safe_load(self._master_data_path.read_text(encoding='utf-8'))
+        if not isinstance(master_data, dict):
+            raise ValueError('master data file illegal format.')
+        return master_data
+
+    def target_version(self, master_data: dict | None = None) -> int:
+        if master_data is None:
+            master_data = self.load_master_data()
+        try:
+            return int(master_data['admin']['system']['db_version'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('master data file illegal format. (db_version)')
+
+    def current_version(self) -> int:
+        with contextlib.closing(sqlite3.connect(self._db_path)) as conn:
+            return conn.execute('PRAGMA user_version;').fetchone()[0]
+
+    def migrate(self) -> int:
+        # 未適用のバージョンを順に適用し、適用後のバージョンを返す
+        master_data: Final[dict] = self.load_master_data()
+        target_version: Final[int] = self.target_version(master_data)
+        if (missing := [v for v in range(1, target_version + 1) if v not in MIGRATIONS]):
+            raise DbOperationError(f'migration is not defined. (version={missing})')
+
+        self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.closing(sqlite3.connect(self._db_path, isolation_level=None)) as conn:
+            version = conn.execute('PRAGMA user_version;').fetchone()[0]
+            if version == 0 and conn.execute('PRAGMA page_count;').fetchone()[0] == 0:
+                # 新規作成するDBは削除で空いたページを少しずつ解放できるようにする（テーブル作成前のみ設定できる）
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL;')
+            while version < target_version:
+                version += 1
+                try:
+                    conn.execute('BEGIN IMMEDIATE;')
+                    # 他のプロセスが先に移行した場合は何もしない
+                    if conn.execute('PRAGMA user_version;').fetchone()[0] >= version:
+                        conn.execute('COMMIT;')
+                        continue
+                    MIGRATIONS[version](conn, master_data)
+                    conn.execute(f'PRAGMA user_version={version};')
+                    conn.execute('COMMIT;')
+                except Exception as err:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK;')
+                    raise DbOperationError(f'migration failed. (version={version}, {err})')
+            return version
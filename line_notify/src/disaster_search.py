@@ -0,0 +1,179 @@
+from pathlib import Path
+from typing import Final, Iterator
+import contextlib
+import datetime
+import sqlite3
+
+from line_notify.src.archive_db import archive_db_month, archive_db_paths
+from line_notify.src.disaster_store import BUSY_TIMEOUT_MS_DEFAULT, connect, normalize_disaster_text
+from line_notify.src.errors import DbOperationError
+from line_notify.src.master_data import MasterDataLookup, get_master_data_lookup
+from line_notify.src.structures import SearchHit
+
+# trigram で検索できる語の最短文字数（短い語は LIKE で絞り込む）
+TRIGRAM_MIN_LENGTH: Final[int] = 3
+LIMIT_DEFAULT: Final[int] = 20
+
+
+def _fts_phrase(term: str) -> str:
+    # FTS5 のフレーズ（語をそのまま一致させる）
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like_pattern(term: str) -> str:
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class DisasterSearch:
+    """災害情報テーブルの検索（語は全て含むもの、新しい順）
+
+    3文字以上の語は全文検索用インデックス（<テーブル名>_fts、trigram）で、
+    2文字以下の語は LIKE で絞り込む。発生日時、災害種別/災害状況/地区の条件を組み合わせられる。
+    保存期間を過ぎて月ごとのアーカイブDB（archive_dir、retention.DataRetention）に移した災害情報も、
+    データDBの後に新しい月から順に検索する（インデックスのないアーカイブDBは全ての語を LIKE で絞り込む）。
+    ページ送りは前ページの最後の結果の rowid、archive（アーカイブDBの月）より前を取得する（before、before_archive）。
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        table_name: str,
+        lookup: MasterDataLookup | None = None,
+        archive_dir: Path | None = None,
+        busy_timeout_ms: int = BUSY_TIMEOUT_MS_DEFAULT,
+    ):
+        self._db_path: Final[Path] = db_path
+        self._table_name: Final[str] = table_name
+        self._fts_name: Final[str] = f'{table_name}_fts'
+        self._lookup: Final[MasterDataLookup] = lookup if lookup is not None else get_master_data_lookup()
+        self._archive_dir: Final[Path] = archive_dir if archive_dir is not None else db_path.parent / 'archive'
+        self._busy_timeout_ms: Final[int] = busy_timeout_ms
+
+    def search(
+        self,
+        terms: list[str],
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None,
+        category: str | None = None,
+        status: str | None = None,
+        district: str | None = None,
+        limit: int = LIMIT_DEFAULT,
+        before: int | None = None,
+        before_archive: str | None = None,
+    ) -> list[SearchHit]:
+        # 条件に一致する災害情報を新しい順に最大 limit 件返す
+        # since/until は発生日時（since <= 発生日時 < until）、category/status/district はマスターデータの名称
+        # before を指定した場合は before_archive のDB（None はデータDB）の rowid が before より前から取得する
+        hits: list[SearchHit] = []
+        sources = self._sources()
+        if before is not None:
+            archives = [archive for archive, _ in sources]
+            if before_archive not in archives:
+                raise ValueError(f'archive {before_archive} is not found.')
+            sources = sources[archives.index(before_archive):]
+        for archive, path in sources:
+            if len(hits) >= limit:
+                break
+            with self._connect(path, archive) as conn:
+                from_clause, rowid_column, conditions, params = self._build(
+                    conn, terms, since, until, category, status, district
+                )
+                if before is not None and archive == before_archive:
+                    conditions.append(f'{rowid_column}<?')
+                    params.append(before)
+                sql = (
+                    f'SELECT t.rowid, t.datetime, t.occurred_at, t.disaster_text FROM {from_clause} '
+                    f'WHERE {" AND ".join(conditions) or "1"} ORDER BY {rowid_column} DESC LIMIT ?;'
+                )
+                hits.extend(
+                    SearchHit(*row, archive=archive) for row in conn.execute(sql, params + [limit - len(hits)])
+                )
+        return hits
+
+    def count(
+        self,
+        terms: list[str],
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None,
+        category: str | None = None,
+        status: str | None = None,
+        district: str | None = None,
+    ) -> int:
+        # 条件に一致する件数（アーカイブDBを含む）
+        total = 0
+        for archive, path in self._sources():
+            with self._connect(path, archive) as conn:
+                from_clause, _, conditions, params = self._build(conn, terms, since, until, category, status, district)
+                sql = f'SELECT COUNT(*) FROM {from_clause} WHERE {" AND ".join(conditions) or "1"};'
+                total += conn.execute(sql, params).fetchone()[0]
+        return total
+
+    def _sources(self) -> list[tuple[str | None, Path]]:
+        # 検索するDB（アーカイブDBの月、パス）の新しい順（データDBは月がNone）
+        return [(None, self._db_path)] + [
+            (archive_db_month(path), path) for path in reversed(archive_db_paths(self._archive_dir))
+        ]
+
+    @contextlib.contextmanager
+    def _connect(self, path: Path, archive: str | None) -> Iterator[sqlite3.Connection]:
+        # データDBは書き込み中でも読める接続、アーカイブDBは読み取り専用で接続
+        try:
+            if archive is None:
+                conn = connect(path, self._busy_timeout_ms)
+            else:
+                conn = sqlite3.connect(f'{path.as_uri()}?mode=ro', uri=True)
+            with contextlib.closing(conn):
+                yield conn
+        except ValueError:
+            raise
+        except Exception as err:
+            raise DbOperationError(err)
+
+    def _build(
+        self,
+        conn: sqlite3.Connection,
+        terms: list[str],
+        since: datetime.datetime | None,
+        until: datetime.datetime | None,
+        category: str | None,
+        status: str | None,
+        district: str | None,
+    ) -> tuple[str, str, list[str], list]:
+        # 検索対象（FROM句）、並び順の rowid 列、条件、パラメーター（名称が未定義の場合は ValueError）
+        # （全文検索を行う場合は FTS5 の rowid 順に読み、LIMIT 件で打ち切る）
+        conditions: list[str] = []
+        params: list = []
+        terms = [normalize_disaster_text(term) for term in terms if term.strip()]
+        has_fts = conn.execute('SELECT 1 FROM sqlite_master WHERE name=?;', (self._fts_name,)).fetchone() is not None
+        fts_terms = [term for term in terms if len(term) >= TRIGRAM_MIN_LENGTH] if has_fts else []
+        if fts_terms:
+            from_clause = f'{self._fts_name} JOIN {self._table_name} AS t ON t.rowid={self._fts_name}.rowid'
+            rowid_column = f'{self._fts_name}.rowid'
+            conditions.append(f'{self._fts_name} MATCH ?')
+            params.append(' AND '.join(_fts_phrase(term) for term in fts_terms))
+        else:
+            from_clause = f'{self._table_name} AS t'
+            rowid_column = 't.rowid'
+        for term in terms:
+            if term not in fts_terms:
+                conditions.append("t.disaster_text LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(term))
+
+        if since is not None:
+            conditions.append('t.occurred_at>=?')
+            params.append(since.isoformat(' '))
+        if until is not None:
+            conditions.append('t.occurred_at<?')
+            params.append(until.isoformat(' '))
+        for column, names, name in (
+            ('category_id', self._lookup.category_ids, category),
+            ('status_id', self._lookup.status_ids, status),
+            ('district_id', self._lookup.district_ids, district),
+        ):
+            if name is None:
+                continue
+            if name not in names:
+                raise ValueError(f'{name} is not defined in master data.')
+            conditions.append(f't.{column}=?')
+            params.append(names[name])
+        return from_clause, rowid_column, conditions, params
@@ -0,0 +1,143 @@
+from pathlib import Path
+from typing import Final
+import contextlib
+import datetime
+import sqlite3
+
+from line_notify.src.archive_db import archive_db_paths
+from line_notify.src.db_migration import DISASTER_TEXT_TABLE_CITIES
+from line_notify.src.disaster_store import BUSY_TIMEOUT_MS_DEFAULT, connect
+from line_notify.src.errors import DbOperationError
+
+# 集計の単位（名前 → 列、結合するマスターデータのテーブル）
+GROUP_COLUMNS: Final[dict[str, tuple[str, str | None]]] = {
+    'day': ('d.day', None),
+    'month': ('substr(d.day, 1, 7)', None),
+    'district': ('district.district_name', 't_district AS district ON district.rowid=d.district_id'),
+    'category': ('category.category_name', 't_disaster_category AS category ON category.rowid=d.category_id'),
+    'status': ('status.status_name', 't_disaster_status AS status ON status.rowid=d.status_id'),
+}
+
+# 災害情報テーブル（アーカイブDBを含む）から日別の件数を求める列、条件（発生日時の範囲を指定する）
+DAILY_AGGREGATE_COLUMNS: Final[str] = 'substr(occurred_at, 1, 10), district_id, category_id, status_id, COUNT(*)'
+DAILY_AGGREGATE_WHERE: Final[str] = (
+    'occurred_at>=? AND occurred_at<? '
+    'AND district_id IS NOT NULL AND category_id IS NOT NULL AND status_id IS NOT NULL'
+)
+
+
+class DisasterStats:
+    """日別の件数（t_disaster_daily）の集計、再作成
+
+    t_disaster_daily は災害情報の登録時にトリガーで加算されるため、
+    月別、地区別などの集計は災害情報テーブルを読まずに日別の行のみから求める。
+    再作成（rebuild）では、保存期間を過ぎて月ごとのアーカイブDB（archive_dir、retention.DataRetention）に
+    移した災害情報も数える。
+    """
+
+    def __init__(self, db_path: Path, archive_dir: Path | None = None, busy_timeout_ms: int = BUSY_TIMEOUT_MS_DEFAULT):
+        self._db_path: Final[Path] = db_path
+        self._archive_dir: Final[Path] = archive_dir if archive_dir is not None else db_path.parent / 'archive'
+        self._busy_timeout_ms: Final[int] = busy_timeout_ms
+
+    def report(
+        self,
+        city_name: str,
+        group_by: list[str],
+        since: datetime.date | None = None,
+        until: datetime.date | None = None,
+    ) -> list[dict[str, str | int]]:
+        # 期間内（since <= 発生日 < until）の件数を group_by の単位ごとに集計（group_by の順に並べる）
+        if (unknown := [name for name in group_by if name not in GROUP_COLUMNS]):
+            raise ValueError(f'unknown group. ({unknown})')
+        columns = [GROUP_COLUMNS[name][0] for name in group_by]
+        joins = ''.join(f' JOIN {GROUP_COLUMNS[name][1]}' for name in group_by if GROUP_COLUMNS[name][1])
+        select_columns = ''.join(f'{column}, ' for column in columns)
+        group_clause = f' GROUP BY {", ".join(columns)} ORDER BY {", ".join(columns)}' if columns else ''
+        sql = (
+            f'SELECT {select_columns}SUM(d.count) FROM t_disaster_daily AS d{joins} '
+            'WHERE d.city_id=(SELECT rowid FROM t_city_name WHERE city_name=?) AND d.day>=? AND d.day<?'
+            f'{group_clause};'
+        )
+        params = (
+            city_name,
+            since.isoformat() if since is not None else '',
+            until.isoformat() if until is not None else '9999-12-31',
+        )
+        try:
+            with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+                rows = conn.execute(sql, params).fetchall()
+        except Exception as err:
+            raise DbOperationError(err)
+        return [dict(zip(group_by + ['count'], row)) for row in rows if row[-1] is not None]
+
+    def rebuild(
+        self,
+        city_name: str | None = None,
+        since: datetime.date | None = None,
+        until: datetime.date | None = None,
+    ) -> int:
+        # 災害情報テーブルとアーカイブDBから日別の件数を作り直し、作成した行数を返す（都市、期間の指定がない場合は全て）
+        # （削除と再作成は1トランザクションで行い、作成中の集計が読まれないようにする）
+        tables = [
+            (table_name, table_city) for table_name, table_city in DISASTER_TEXT_TABLE_CITIES.items()
+            if city_name is None or table_city == city_name
+        ]
+        if not tables:
+            raise ValueError(f'{city_name} is not defined.')
+        day_range = (
+            since.isoformat() if since is not None else '',
+            until.isoformat() if until is not None else '9999-12-31',
+        )
+
+        created = 0
+        try:
+            # アーカイブDBはそれぞれ読み取り専用で集計しておく（トランザクション中は ATTACH できないため）
+            archived = self._count_archives([table_name for table_name, _ in tables], day_range)
+            with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+                with conn as cur:
+                    cur.execute('BEGIN IMMEDIATE;')
+                    for table_name, table_city in tables:
+                        city_id = cur.execute(
+                            'SELECT rowid FROM t_city_name WHERE city_name=?;', (table_city,)
+                        ).fetchone()[0]
+                        cur.execute(
+                            'DELETE FROM t_disaster_daily WHERE city_id=? AND day>=? AND day<?;',
+                            (city_id, *day_range)
+                        )
+                        # 発生日時のインデックスで期間内の行のみを読む
+                        cur.execute(
+                            'INSERT INTO t_disaster_daily (city_id, day, district_id, category_id, status_id, count) '
+                            f'SELECT ?, {DAILY_AGGREGATE_COLUMNS} FROM {table_name} WHERE {DAILY_AGGREGATE_WHERE} '
+                            'GROUP BY 2, 3, 4, 5;',
+                            (city_id, *day_range)
+                        )
+                        cur.executemany(
+                            'INSERT INTO t_disaster_daily (city_id, day, district_id, category_id, status_id, count) '
+                            'VALUES (?, ?, ?, ?, ?, ?) '
+                            'ON CONFLICT (city_id, day, district_id, category_id, status_id) '
+                            'DO UPDATE SET count=count+excluded.count;',
+                            [(city_id, *row) for row in archived[table_name]]
+                        )
+                        created += cur.execute(
+                            'SELECT COUNT(*) FROM t_disaster_daily WHERE city_id=? AND day>=? AND day<?;',
+                            (city_id, *day_range)
+                        ).fetchone()[0]
+        except Exception as err:
+            raise DbOperationError(err)
+        return created
+
+    def _count_archives(self, table_names: list[str], day_range: tuple[str, str]) -> dict[str, list[tuple]]:
+        # アーカイブDBごとに期間内の日別の件数を集計（テーブル名 → 行、テーブルのないDBは読み飛ばす）
+        archived: dict[str, list[tuple]] = {table_name: [] for table_name in table_names}
+        for path in archive_db_paths(self._archive_dir):
+            with contextlib.closing(sqlite3.connect(f'{path.as_uri()}?mode=ro', uri=True)) as conn:
+                existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")}
+                for table_name in table_names:
+                    if table_name in existing:
+                        archived[table_name].extend(conn.execute(
+                            f'SELECT {DAILY_AGGREGATE_COLUMNS} FROM {table_name} WHERE {DAILY_AGGREGATE_WHERE} '
+                            'GROUP BY 1, 2, 3, 4;',
+                            day_range
+                        ).fetchall())
+        return archived
@@ -0,0 +1,232 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Final
+import contextlib
+import datetime
+import hashlib
+import re
+import sqlite3
+import unicodedata
+
+from line_notify.src.errors import DbOperationError
+from line_notify.src.structures import DisasterTextInfo, DisasterRecord
+
+FINGERPRINT_CACHE_SIZE_DEFAULT: Final[int] = 4096
+QUERY_CHUNK_SIZE: Final[int] = 500
+# 災害ごとの状態の追加、更新（incident_tracker.IncidentTracker.incident_rows の行）
+INCIDENT_UPSERT_SQL: Final[str] = (
+    'INSERT INTO t_incident (incident_key, city_id, occurred_at, location, '
+    'category_id, status_id, updated_at, closed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (incident_key) DO UPDATE SET '
+    'status_id=excluded.status_id, updated_at=excluded.updated_at, closed_at=excluded.closed_at;'
+)
+BUSY_TIMEOUT_MS_DEFAULT: Final[int] = 5000
+
+
+def connect(db_path: Path, busy_timeout_ms: int = BUSY_TIMEOUT_MS_DEFAULT) -> sqlite3.Connection:
+    # データDBに接続
+    # WALモードにより、書き込み中でも読み取り（レポート、ツール類）がブロックされない
+    conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000)
+    conn.execute('PRAGMA journal_mode=WAL;')
+    conn.execute('PRAGMA synchronous=NORMAL;')
+    conn.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)};')
+    return conn
+
+
+def normalize_disaster_text(disaster_text: str) -> str:
+    # 重複判定用に災害情報文字列を正規化（NFKC、連続する空白を1つにまとめる）
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', disaster_text)).strip()
+
+
+def fingerprint(disaster_text: str, year: int | None = None) -> bytes:
+    # 正規化した災害情報文字列と発生年の固定長（16バイト）フィンガープリント
+    # （災害情報テーブルの text_hash 列、一意インデックスの値）
+    # 災害情報文字列には年がないため、発生年を含めて翌年以降の同じ文字列を重複とみなさないようにする
+    # （解析できず発生年のない場合は文字列のみ）
+    normalized = normalize_disaster_text(disaster_text)
+    key = normalized if year is None else f'{year:04}\n{normalized}'
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+
+def info_fingerprint(disaster_text_info: DisasterTextInfo) -> bytes:
+    # 災害情報のフィンガープリント（解析結果の発生日時の年を含める）
+    record = disaster_text_info.record
+    return fingerprint(disaster_text_info.disaster_text, record.occurred_at.year if record is not None else None)
+
+
+def _record_values(record: DisasterRecord | None) -> tuple:
+    # 解析結果の列の値（解析できなかった場合は全てNULL）
+    if record is None:
+        return (None,) * 6
+    return (
+        record.occurred_at.isoformat(' '),
+        record.location,
+        record.district_id,
+        record.category_id,
+        record.status_id,
+        record.status_time.isoformat('minutes') if record.status_time is not None else None,
+    )
+
+
+class DisasterTextStore:
+    """都市ごとの災害情報テーブルに対する重複判定と登録
+
+    1ページ分の災害情報を1つの接続でまとめて問い合わせる。
+    登録済みと分かった災害情報のフィンガープリントはプロセス内にキャッシュし、
+    次回以降のポーリングではDBに問い合わせない。
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        city_name: str,
+        table_name: str,
+        cache_size: int = FINGERPRINT_CACHE_SIZE_DEFAULT,
+        busy_timeout_ms: int = BUSY_TIMEOUT_MS_DEFAULT,
+    ):
+        self._db_path: Final[Path] = db_path
+        self._city_name: Final[str] = city_name
+        self._table_name: Final[str] = table_name
+        self._cache_size: Final[int] = cache_size
+        self._busy_timeout_ms: Final[int] = busy_timeout_ms
+        self._city_id: int | None = None
+        self._seen: OrderedDict[bytes, None] = OrderedDict()
+
+    def filter_new(self, disaster_text_info_list: list[DisasterTextInfo]) -> list[DisasterTextInfo]:
+        # 未登録の災害情報のみを返す（ページ内の重複も取り除く、順序は維持）
+        candidates: dict[bytes, DisasterTextInfo] = {}
+        for disaster_text_info in disaster_text_info_list:
+            fp = info_fingerprint(disaster_text_info)
+            if fp in self._seen:
+                self._seen.move_to_end(fp)
+                continue
+            candidates.setdefault(fp, disaster_text_info)
+        if not candidates:
+            return []
+
+        try:
+            with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+                city_id = self._get_city_id(conn)
+                registered = self._select_registered(conn, city_id, list(candidates))
+        except DbOperationError:
+            raise
+        except Exception as err:
+            raise DbOperationError(err)
+
+        new_list: list[DisasterTextInfo] = []
+        for fp, disaster_text_info in candidates.items():
+            if fp in registered:
+                self._remember(fp)
+            else:
+                new_list.append(disaster_text_info)
+        return new_list
+
+    def register(
+        self,
+        disaster_text_info_list: list[DisasterTextInfo],
+        registered_at: datetime.datetime | None = None,
+        token_keys: list[str] | None = None,
+        notify_list: list[DisasterTextInfo] | None = None,
+        incident_rows: list[tuple] | None = None,
+    ):
+        # 1回のポーリングで見つかった新しい災害情報を1トランザクションでまとめて登録
+        # token_keys を指定した場合、新たに登録した災害情報の通知を同じトランザクションで
+        # 通知先のトークンごとに1行ずつアウトボックスに追加する（notify_list を指定した場合は、そのうち notify_list に含まれるもののみ）
+        # incident_rows を指定した場合は、災害ごとの状態（t_incident）も同じトランザクションで更新する
+        # （途中で失敗した場合は全件ロールバックされる）
+        if not disaster_text_info_list:
+            return
+        if registered_at is None:
+            registered_at = datetime.datetime.now()
+
+        try:
+            with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+                with conn as cur:
+                    # 書き込みロックを取得してから登録前の最大rowidを取得（以降のrowidが今回の登録分）
+                    cur.execute('BEGIN IMMEDIATE;')
+                    max_rowid = cur.execute(f'SELECT IFNULL(MAX(rowid), 0) FROM {self._table_name};').fetchone()[0]
+
+                    # 他のプロセスが先に登録していた場合は一意インデックスにより無視される
+                    cur.executemany(
+                        f'INSERT OR IGNORE INTO {self._table_name} '
+                        '(datetime, disaster_text, text_hash, occurred_at, location, '
+                        'district_id, category_id, status_id, status_time) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);',
+                        [
+                            (registered_at.isoformat(' '), dinfo.disaster_text, info_fingerprint(dinfo))
+                            + _record_values(dinfo.record)
+                            for dinfo in disaster_text_info_list
+                        ]
+                    )
+
+                    # 通知メッセージをアウトボックスに追加
+                    token_keys = token_keys or []
+                    queued_at = registered_at.timestamp()
+                    if notify_list is None:
+                        cur.executemany(
+                            'INSERT INTO t_notify_outbox (token_key, message, created_at, next_attempt_at) '
+                            f'SELECT ?, disaster_text, ?, ? FROM {self._table_name} WHERE rowid > ? ORDER BY rowid;',
+                            [(key, queued_at, queued_at, max_rowid) for key in token_keys]
+                        )
+                    elif token_keys:
+                        notify_fps = list(dict.fromkeys(info_fingerprint(d) for d in notify_list))
+                        for i in range(0, len(notify_fps), QUERY_CHUNK_SIZE):
+                            chunk = notify_fps[i:i + QUERY_CHUNK_SIZE]
+                            placeholders = ', '.join('?' * len(chunk))
+                            cur.executemany(
+                                'INSERT INTO t_notify_outbox (token_key, message, created_at, next_attempt_at) '
+                                f'SELECT ?, disaster_text, ?, ? FROM {self._table_name} '
+                                f'WHERE rowid > ? AND text_hash IN ({placeholders}) ORDER BY rowid;',
+                                [(key, queued_at, queued_at, max_rowid, *chunk) for key in token_keys]
+                            )
+
+                    # 災害ごとの状態（登録と別に書くと、失敗時に状態が失われ次回以降の判定を誤るため）
+                    if incident_rows:
+                        cur.executemany(INCIDENT_UPSERT_SQL, incident_rows)
+        except Exception as err:
+            raise DbOperationError(err)
+
+        self.remember(disaster_text_info_list)
+
+    def remember(self, disaster_text_info_list: list[DisasterTextInfo]):
+        # 登録済みとなった災害情報をキャッシュに追加
+        for disaster_text_info in disaster_text_info_list:
+            self._remember(info_fingerprint(disaster_text_info))
+
+    def _remember(self, fp: bytes):
+        self._seen[fp] = None
+        self._seen.move_to_end(fp)
+        while len(self._seen) > self._cache_size:
+            self._seen.popitem(last=False)
+
+    def _get_city_id(self, conn: sqlite3.Connection) -> int:
+        # 都市名IDを取得（インスタンス内で一度だけ問い合わせる）
+        if self._city_id is None:
+            row = conn.execute('SELECT rowid FROM t_city_name WHERE city_name=?;', (self._city_name,)).fetchone()
+            if row is None:
+                raise DbOperationError('都市ID取得エラー')
+            self._city_id = row[0]
+        return self._city_id
+
+    def _select_registered(self, conn: sqlite3.Connection, city_id: int, fingerprint_list: list[bytes]) -> set[bytes]:
+        # 登録済みのフィンガープリントを取得（text_hash の一意インデックスを使用）
+        # 災害情報テーブルにないものは、アーカイブに移した災害情報のフィンガープリントからも探す
+        # （変数の上限を超えないように分割して問い合わせる）
+        registered: set[bytes] = set()
+        for i in range(0, len(fingerprint_list), QUERY_CHUNK_SIZE):
+            chunk = fingerprint_list[i:i + QUERY_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT text_hash FROM {self._table_name} WHERE text_hash IN ({placeholders});',
+                chunk
+            ).fetchall()
+            registered.update(row[0] for row in rows)
+
+            if (rest := [fp for fp in chunk if fp not in registered]):
+                placeholders = ', '.join('?' * len(rest))
+                rows = conn.execute(
+                    f'SELECT text_hash FROM t_recent_fingerprint WHERE city_id=? AND text_hash IN ({placeholders});',
+                    (city_id, *rest)
+                ).fetchall()
+                registered.update(row[0] for row in rows)
+        return registered
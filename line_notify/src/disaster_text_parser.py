@@ -0,0 +1,147 @@
+from typing import Final, Iterator
+import datetime
+import re
+
+from line_notify.src.errors import TextAnalysisError
+from line_notify.src.master_data import MasterDataLookup, get_master_data_lookup
+from line_notify.src.structures import DisasterTextType, DisasterTextInfo, DisasterRecord
+
+# Webページ内の区切り文字列
+CURRENT_BEGIN_MARKER: Final[str] = '↓現在発生している災害↓'
+CURRENT_END_MARKER: Final[str] = '↑現在発生している災害↑'
+PAST_BEGIN_MARKER: Final[str] = '↓過去の災害経過情報↓'
+PAST_END_MARKER: Final[str] = '↑過去の災害経過情報↑'
+
+# 各パターンは「月」から始め、リテラル前方一致による高速な検索を効かせる
+# （「月」の前の2桁の数字は _iter_entries で確認する）
+# 現在発生中の災害
+PAT_CURRENT: Final[re.Pattern] = re.compile(r'月\d\d日.+?出動しました。', re.DOTALL)
+
+# 終了した災害（鎮圧、鎮火、救助完了 / 消火不要）を1回の走査で抜き出す
+PAT_PAST: Final[re.Pattern] = re.compile(
+    r'月\d\d日.+?は(?:(?P<with_time>\d\d:\d\dに.+?しました。)|消火の必要はありませんでした。)'
+)
+
+# 災害情報1件分の解析（日付, 時刻, 場所, 災害種別名[, 状況の時刻, 状況]）
+# 場所に「に」「の」を含む地名があるため、出動は場所を最長一致とし、
+# 終了した災害は「の」を含まない災害種別名（先頭の「その他」を除く）の直前の「の」で区切る
+PAT_RECORD: Final[dict[DisasterTextType, re.Pattern]] = {
+    DisasterTextType.CURRENT: re.compile(
+        r'(\d\d)月(\d\d)日\s*(\d\d):(\d\d)\s*(.+)に(\S+?)のため消防車が(出動)しました。'
+    ),
+    DisasterTextType.PAST_WITH_TIME: re.compile(
+        r'(\d\d)月(\d\d)日\s*(\d\d):(\d\d)\s*(.+?)の((?:その他)?[^\sの]+?)は(\d\d):(\d\d)に(.+?)しました。'
+    ),
+    DisasterTextType.PAST: re.compile(
+        r'(\d\d)月(\d\d)日\s*(\d\d):(\d\d)\s*(.+?)の((?:その他)?[^\sの]+?)は(消火の必要はありません)でした。'
+    ),
+}
+
+
+def _iter_entries(pattern: re.Pattern, webpage_text: str, pos: int, endpos: int) -> Iterator[tuple[str, re.Match]]:
+    # 「dd月dd日」から始まる災害情報を先頭から順に返す
+    while (m := pattern.search(webpage_text, pos, endpos)) is not None:
+        start = m.start() - 2
+        if start >= pos and webpage_text[start:m.start()].isdigit():
+            yield webpage_text[start:m.end()], m
+            pos = m.end()
+        else:
+            pos = m.start() + 1
+
+
+def find_sections(webpage_text: str) -> tuple[int, int, int, int]:
+    # 現在発生中の災害、過去の災害経過情報の範囲（開始, 終了）を区切り文字列の位置から求める
+    current_begin = webpage_text.find(CURRENT_BEGIN_MARKER)
+    current_end = webpage_text.find(CURRENT_END_MARKER, current_begin + len(CURRENT_BEGIN_MARKER))
+    past_begin = webpage_text.find(PAST_BEGIN_MARKER, current_end + len(CURRENT_END_MARKER))
+    past_end = webpage_text.find(PAST_END_MARKER, past_begin + len(PAST_BEGIN_MARKER))
+    if -1 in (current_begin, current_end, past_begin, past_end):
+        raise TextAnalysisError("ダウンロードしたWebページのフォーマットが異なります。")
+    return (current_begin + len(CURRENT_BEGIN_MARKER), current_end, past_begin + len(PAST_BEGIN_MARKER), past_end)
+
+
+def parse_disaster_text(webpage_text: str) -> list[DisasterTextInfo]:
+    # 現在発生中の災害と終了した災害の一部（鎮圧、鎮火、消火不要、救助完了）を抜き出す
+    # （戻り値の順序は 現在発生中 → 時刻付きの終了 → 消火不要）
+    current_begin, current_end, past_begin, past_end = find_sections(webpage_text)
+
+    # 現在発生中の災害
+    disaster_text_list: list[DisasterTextInfo] = [
+        DisasterTextInfo(dtext, DisasterTextType.CURRENT)
+        for dtext, _ in _iter_entries(PAT_CURRENT, webpage_text, current_begin, current_end)
+    ]
+
+    # 終了した災害
+    past_without_time_list: list[DisasterTextInfo] = []
+    for dtext, m in _iter_entries(PAT_PAST, webpage_text, past_begin, past_end):
+        if m.group('with_time') is not None:
+            disaster_text_list.append(DisasterTextInfo(dtext, DisasterTextType.PAST_WITH_TIME))
+        else:
+            past_without_time_list.append(DisasterTextInfo(dtext, DisasterTextType.PAST))
+    disaster_text_list.extend(past_without_time_list)
+
+    return disaster_text_list
+
+
+def _infer_occurred_at(month: int, day: int, hour: int, minute: int, reference: datetime.datetime) -> datetime.datetime:
+    # ページには年がないため、基準日時より未来にならない年とする（年末年始の掲載分は前年）
+    occurred_at = datetime.datetime(reference.year, month, day, hour, minute)
+    if occurred_at > reference + datetime.timedelta(days=1):
+        occurred_at = occurred_at.replace(year=reference.year - 1)
+    return occurred_at
+
+
+def parse_disaster_record(
+    disaster_text_info: DisasterTextInfo,
+    city_name: str,
+    reference: datetime.datetime | None = None,
+    lookup: MasterDataLookup | None = None,
+) -> DisasterRecord:
+    # 災害情報文字列から日時、場所、地区/災害種別/災害状況のIDを取り出す
+    if reference is None:
+        reference = datetime.datetime.now()
+    if lookup is None:
+        lookup = get_master_data_lookup()
+
+    m = PAT_RECORD[disaster_text_info.disaster_text_type].fullmatch(disaster_text_info.disaster_text)
+    if m is None:
+        raise TextAnalysisError(f'災害情報の形式が異なります。({disaster_text_info.disaster_text})')
+
+    try:
+        month, day, hour, minute = (int(v) for v in m.group(1, 2, 3, 4))
+        occurred_at = _infer_occurred_at(month, day, hour, minute, reference)
+        status_time = None
+        if disaster_text_info.disaster_text_type == DisasterTextType.PAST_WITH_TIME:
+            status_time = datetime.time(int(m.group(7)), int(m.group(8)))
+    except ValueError:
+        raise TextAnalysisError(f'災害情報の日時が不正です。({disaster_text_info.disaster_text})')
+
+    if (status_id := lookup.status_id(m.group(m.lastindex))) is None:
+        raise TextAnalysisError(f'災害情報の状況が不明です。({disaster_text_info.disaster_text})')
+
+    location = ' '.join(m.group(5).split())
+    return DisasterRecord(
+        occurred_at=occurred_at,
+        location=location,
+        district_id=lookup.district_id(location, city_name),
+        category_id=lookup.category_id(m.group(6)),
+        status_id=status_id,
+        status_time=status_time,
+    )
+
+
+def attach_disaster_records(
+    disaster_text_info_list: list[DisasterTextInfo],
+    city_name: str,
+    reference: datetime.datetime | None = None,
+) -> list[DisasterTextInfo]:
+    # 各災害情報に解析結果を設定（解析できないものは record=None のまま）
+    if reference is None:
+        reference = datetime.datetime.now()
+    lookup: Final[MasterDataLookup] = get_master_data_lookup()
+    for disaster_text_info in disaster_text_info_list:
+        try:
+            disaster_text_info.record = parse_disaster_record(disaster_text_info, city_name, reference, lookup)
+        except TextAnalysisError:
+            disaster_text_info.record = None
+    return disaster_text_info_list
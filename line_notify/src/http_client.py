@@ -0,0 +1,87 @@
+from typing import Final
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT_DEFAULT: Final[float] = 3.05
+READ_TIMEOUT_DEFAULT: Final[float] = 10.0
+POOL_CONNECTIONS_DEFAULT: Final[int] = 4
+POOL_MAXSIZE_DEFAULT: Final[int] = 16
+MAX_RETRIES_DEFAULT: Final[int] = 3
+BACKOFF_FACTOR_DEFAULT: Final[float] = 0.5
+BACKOFF_JITTER_DEFAULT: Final[float] = 0.5
+RETRY_STATUS_LIST: Final[tuple[int, ...]] = (500, 502, 503, 504)
+
+
+class LnHttpClient:
+    """接続を再利用するHTTPクライアント（Webページ取得とLINE通知で共用する）
+
+    - ホストごとの接続数は pool_maxsize で制限する（上限到達時は空きを待つ）
+    - 接続/読み取りタイムアウトを必ず指定する
+    - 再試行回数に上限を設け、ジッター付きの指数バックオフで再試行する
+      （POSTはサーバーに届いていない接続エラーのみ再試行し、二重投稿を防ぐ）
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = CONNECT_TIMEOUT_DEFAULT,
+        read_timeout: float = READ_TIMEOUT_DEFAULT,
+        pool_connections: int = POOL_CONNECTIONS_DEFAULT,
+        pool_maxsize: int = POOL_MAXSIZE_DEFAULT,
+        max_retries: int = MAX_RETRIES_DEFAULT,
+        backoff_factor: float = BACKOFF_FACTOR_DEFAULT,
+        backoff_jitter: float = BACKOFF_JITTER_DEFAULT,
+    ):
+        self._timeout: Final[tuple[float, float]] = (connect_timeout, read_timeout)
+
+        # 再試行設定
+        retry: Final[Retry] = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            status_forcelist=RETRY_STATUS_LIST,
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+
+        # 接続プールを持つSessionを生成
+        adapter: Final[HTTPAdapter] = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+            max_retries=retry,
+        )
+        self._session: Final[requests.Session] = requests.Session()
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        return self._timeout
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self._timeout)
+        return self._session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self._timeout)
+        return self._session.post(url, **kwargs)
+
+    def close(self):
+        self._session.close()
+
+
+_http_client: LnHttpClient | None = None
+_http_client_lock: Final[threading.Lock] = threading.Lock()
+
+
+def get_http_client() -> LnHttpClient:
+    # プロセス内で共用するHTTPクライアントを取得（初回呼び出し時に生成）
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = LnHttpClient()
+        return _http_client
@@ -0,0 +1,220 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Final
+import contextlib
+import datetime
+import heapq
+import time
+
+from line_notify.src.disaster_store import BUSY_TIMEOUT_MS_DEFAULT, INCIDENT_UPSERT_SQL, QUERY_CHUNK_SIZE, connect
+from line_notify.src.errors import DbOperationError
+from line_notify.src.master_data import MasterDataLookup, get_master_data_lookup
+from line_notify.src.structures import DisasterRecord, DisasterTextInfo, IncidentTransition
+
+# 災害状況の進行順（現在の状態と同じか前の状況は状態変化とみなさない）
+STATUS_ORDER: Final[dict[str, int]] = {
+    '発生': 0,
+    '鎮圧': 1,
+    '鎮火': 2,
+    '救助完了': 2,
+    '消火不要': 2,
+}
+# 対応が終了した災害状況
+CLOSED_STATUSES: Final[frozenset[str]] = frozenset({'鎮火', '救助完了', '消火不要'})
+
+# 終了した災害をメモリに保持する時間[s]
+CLOSED_TTL_DEFAULT: Final[float] = 6 * 60 * 60
+# 終了しないまま（救急等）の災害をメモリに保持する時間（発生日時から）[s]
+OPEN_MAX_AGE_DEFAULT: Final[float] = 2 * 24 * 60 * 60
+
+
+def incident_key(city_name: str, record: DisasterRecord) -> str:
+    # 発生日時と場所から災害のキーを生成（同じ災害の状況が変わっても同じキー）
+    return f'{city_name}|{record.occurred_at:%Y-%m-%d %H:%M}|{record.location.replace(" ", "")}'
+
+
+def _chronological_key(disaster_text_info: DisasterTextInfo) -> tuple:
+    record: Final[DisasterRecord] = disaster_text_info.record
+    return (record.occurred_at, record.status_time or datetime.time.min)
+
+
+@dataclass(slots=True)
+class _IncidentState:
+    status_id: int
+    # メモリから取り除く時刻（UNIX時間[s]）
+    expires_at: float
+
+
+class IncidentTracker:
+    """災害ごとの状態（発生→鎮圧→鎮火 等）を管理し、状態が変化した災害情報のみを通知対象とする
+
+    対応中の災害はメモリ上の辞書に保持し（DBの t_incident と同期）、状態遷移は辞書の参照1回で判定する。
+    終了した災害、発生から時間の経った災害はメモリから取り除き、以降はDBに問い合わせる。
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        city_name: str,
+        lookup: MasterDataLookup | None = None,
+        closed_ttl: float = CLOSED_TTL_DEFAULT,
+        open_max_age: float = OPEN_MAX_AGE_DEFAULT,
+        busy_timeout_ms: int = BUSY_TIMEOUT_MS_DEFAULT,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._db_path: Final[Path] = db_path
+        self._city_name: Final[str] = city_name
+        self._lookup: Final[MasterDataLookup] = lookup if lookup is not None else get_master_data_lookup()
+        self._closed_ttl: Final[float] = closed_ttl
+        self._open_max_age: Final[float] = open_max_age
+        self._busy_timeout_ms: Final[int] = busy_timeout_ms
+        self._clock: Final[Callable[[], float]] = clock
+
+        # 災害状況ID→進行順、終了した災害状況ID
+        self._status_order: Final[dict[int, int]] = {
+            status_id: STATUS_ORDER.get(name, 0) for name, status_id in self._lookup.status_ids.items()
+        }
+        self._closed_status_ids: Final[frozenset[int]] = frozenset(
+            self._lookup.status_ids[name] for name in CLOSED_STATUSES if name in self._lookup.status_ids
+        )
+
+        self._states: dict[str, _IncidentState] = {}
+        # (expires_at, incident_key) のヒープ（期限切れの判定用）
+        self._expiry: list[tuple[float, str]] = []
+        self._loaded: bool = False
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def is_closed(self, status_id: int) -> bool:
+        return status_id in self._closed_status_ids
+
+    def plan(self, disaster_text_info_list: list[DisasterTextInfo]) -> list[IncidentTransition]:
+        # 新しい災害情報のうち、災害の状態が変化するもの（発生順）を返す
+        # （メモリ上の状態は commit() するまで変更しない）
+        self._expire()
+        parsed = sorted((d for d in disaster_text_info_list if d.record is not None), key=_chronological_key)
+        unparsed = [d for d in disaster_text_info_list if d.record is None]
+
+        keys: Final[list[str]] = [incident_key(self._city_name, d.record) for d in parsed]
+        try:
+            self._load_open()
+            self._load_states([key for key in keys if key not in self._states])
+        except DbOperationError:
+            raise
+        except Exception as err:
+            raise DbOperationError(err)
+
+        # 今回の災害情報による状態（同じ災害の状況が1回のポーリングで複数見つかる場合がある）
+        pending: dict[str, int] = {}
+        transitions: list[IncidentTransition] = []
+        for key, disaster_text_info in zip(keys, parsed):
+            status_id = disaster_text_info.record.status_id
+            current = pending.get(key)
+            if current is None and (state := self._states.get(key)) is not None:
+                current = state.status_id
+            if current is not None and self._status_order.get(status_id, 0) <= self._status_order.get(current, 0):
+                continue
+            pending[key] = status_id
+            transitions.append(
+                IncidentTransition(key, disaster_text_info, status_id, status_id in self._closed_status_ids)
+            )
+
+        # 解析できなかった災害情報は状態を判定できないため、全て通知対象とする
+        transitions.extend(IncidentTransition(None, disaster_text_info) for disaster_text_info in unparsed)
+        return transitions
+
+    def now(self) -> float:
+        # incident_rows、apply に渡す現在時刻（UNIX時間[s]）
+        return self._clock()
+
+    def incident_rows(self, transitions: list[IncidentTransition], now: float) -> list[tuple]:
+        # 状態変化を t_incident に反映する行（disaster_store.INCIDENT_UPSERT_SQL のパラメーター）
+        rows = []
+        for transition in transitions:
+            if transition.incident_key is None:
+                continue
+            record = transition.disaster_text_info.record
+            rows.append((
+                transition.incident_key,
+                self._lookup.city_ids[self._city_name],
+                record.occurred_at.isoformat(' '),
+                record.location,
+                record.category_id,
+                transition.status_id,
+                now,
+                now if transition.closed else None,
+            ))
+        return rows
+
+    def commit(self, transitions: list[IncidentTransition]):
+        # 状態変化をDBとメモリに反映（災害情報の登録と同じトランザクションで書く場合は
+        # DisasterTextStore.register に incident_rows を渡し、登録後に apply を呼ぶ）
+        now: Final[float] = self.now()
+        if rows := self.incident_rows(transitions, now):
+            try:
+                with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+                    with conn as cur:
+                        cur.executemany(INCIDENT_UPSERT_SQL, rows)
+            except Exception as err:
+                raise DbOperationError(err)
+        self.apply(transitions, now)
+
+    def apply(self, transitions: list[IncidentTransition], now: float):
+        # DBに書き込んだ状態変化をメモリに反映
+        for transition in transitions:
+            if transition.incident_key is not None:
+                self._set_state(
+                    transition.incident_key, transition.status_id,
+                    transition.disaster_text_info.record.occurred_at, now if transition.closed else None
+                )
+        self._expire()
+
+    def _set_state(self, key: str, status_id: int, occurred_at: datetime.datetime, closed_at: float | None):
+        # 終了した災害は終了から closed_ttl、対応中の災害は発生から open_max_age 経過でメモリから取り除く
+        if closed_at is not None:
+            expires_at = closed_at + self._closed_ttl
+        else:
+            expires_at = occurred_at.timestamp() + self._open_max_age
+        self._states[key] = _IncidentState(status_id, expires_at)
+        heapq.heappush(self._expiry, (expires_at, key))
+
+    def _expire(self):
+        # 期限切れの災害をメモリから取り除く（状態が更新された災害の古いヒープ要素は読み飛ばす）
+        now: Final[float] = self._clock()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry)
+            if (state := self._states.get(key)) is not None and state.expires_at == expires_at:
+                del self._states[key]
+
+    def _load_open(self):
+        # 対応中の災害をDBから読み込む（インスタンス内で一度だけ）
+        if self._loaded:
+            return
+        since: Final[datetime.datetime] = datetime.datetime.fromtimestamp(self._clock() - self._open_max_age)
+        with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+            rows = conn.execute(
+                'SELECT incident_key, status_id, occurred_at FROM t_incident '
+                'WHERE city_id=? AND closed_at IS NULL AND occurred_at>=?;',
+                (self._lookup.city_ids[self._city_name], since.isoformat(' '))
+            ).fetchall()
+        for key, status_id, occurred_at in rows:
+            self._set_state(key, status_id, datetime.datetime.fromisoformat(occurred_at), None)
+        self._loaded = True
+
+    def _load_states(self, keys: list[str]):
+        # メモリにない災害の状態をDBから読み込む（メモリから取り除いた災害が再びページに現れた場合）
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return
+        with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+            for i in range(0, len(keys), QUERY_CHUNK_SIZE):
+                chunk = keys[i:i + QUERY_CHUNK_SIZE]
+                placeholders = ', '.join('?' * len(chunk))
+                rows = conn.execute(
+                    'SELECT incident_key, status_id, occurred_at, closed_at FROM t_incident '
+                    f'WHERE incident_key IN ({placeholders});',
+                    chunk
+                ).fetchall()
+                for key, status_id, occurred_at, closed_at in rows:
+                    self._set_state(key, status_id, datetime.datetime.fromisoformat(occurred_at), closed_at)
@@ -1,35 +1,200 @@
-from dotenv import load_dotenv
+from dataclasses import dataclass, field
+from dotenv import dotenv_values
 from pathlib import Path
 from typing import Final
 import os
+import threading
+
+import yaml
 
 KEY_VARIABLE_DIR: Final[str] = 'LN_VARIABLE_DIR'
 KEY_LINE_TOKEN_NAGAOKA: Final[str] = 'LN_LINE_TOKEN_NAGAOKA'
 KEY_LINE_TOKEN_NIIGATA: Final[str] = 'LN_LINE_TOKEN_NIIGATA'
+# 接続先URL（未設定の場合は各クラスの既定値、負荷試験でローカルのサーバーに接続する場合に設定）
+KEY_SITE_URL_NAGAOKA: Final[str] = 'LN_SITE_URL_NAGAOKA'
+KEY_NOTIFY_URL: Final[str] = 'LN_NOTIFY_URL'
+# メトリクスの出力先（Prometheusテキスト形式のファイル、常駐時の /metrics のポート番号）
+# ファイル名には実行方法を付ける（line_notify.prom の場合 line_notify_cron.prom、line_notify_daemon.prom）
+KEY_METRICS_TEXTFILE: Final[str] = 'LN_METRICS_TEXTFILE'
+KEY_METRICS_PORT: Final[str] = 'LN_METRICS_PORT'
+# ログ出力（キューを経由して別スレッドでファイルに出力するか、loggerごとのレベル「名前=レベル」のカンマ区切り）
+KEY_LOG_QUEUE: Final[str] = 'LN_LOG_QUEUE'
+KEY_LOG_LEVELS: Final[str] = 'LN_LOG_LEVELS'
+# 取得したWebページの保存先（未設定の場合は variable_dir/archive）
+KEY_ARCHIVE_DIR: Final[str] = 'LN_ARCHIVE_DIR'
+# データDBに残す日数（常駐時、設定されている場合のみ古い災害情報を月ごとのアーカイブDBに移す）
+KEY_RETENTION_DAYS: Final[str] = 'LN_RETENTION_DAYS'
+# 通知をまとめて送信するまでの待ち時間[s]（未設定の場合は notify_dispatcher.COALESCE_WINDOW_DEFAULT）
+KEY_NOTIFY_COALESCE_WINDOW: Final[str] = 'LN_NOTIFY_COALESCE_WINDOW'
+
+# 環境変数で設定できるキー（.env より優先、値の変更も読み直しの対象）
+ENV_KEYS: Final[tuple[str, ...]] = (
+    KEY_VARIABLE_DIR, KEY_LINE_TOKEN_NAGAOKA, KEY_LINE_TOKEN_NIIGATA, KEY_SITE_URL_NAGAOKA, KEY_NOTIFY_URL,
+    KEY_METRICS_TEXTFILE, KEY_METRICS_PORT, KEY_LOG_QUEUE, KEY_LOG_LEVELS, KEY_ARCHIVE_DIR, KEY_RETENTION_DAYS,
+    KEY_NOTIFY_COALESCE_WINDOW,
+)
+
+
+def _parse_log_levels(value: str | None) -> dict[str, str]:
+    # 「ln.nagaoka=INFO,sqlalchemy.engine=WARNING」形式（形式が異なる項目は無視）
+    levels: dict[str, str] = {}
+    for item in (value or '').split(','):
+        name, sep, level = item.partition('=')
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _parse_seconds(value: str | None) -> float | None:
+    # 0以上の秒数（数値でない、負の値の場合はNone）
+    try:
+        seconds = float(value) if value else None
+    except ValueError:
+        return None
+    return seconds if seconds is not None and 0.0 <= seconds < float('inf') else None
+
+
+@dataclass(frozen=True)
+class LnConfigSnapshot:
+    variable_dir: Path | None = None
+    line_token_nagaoka: str | None = None
+    line_token_niigata: str | None = None
+    site_url_nagaoka: str | None = None
+    notify_url: str | None = None
+    metrics_textfile: Path | None = None
+    metrics_port: int | None = None
+    log_queue: bool = False
+    log_levels: dict = field(default_factory=dict)
+    archive_dir: Path | None = None
+    retention_days: int | None = None
+    notify_coalesce_window: float | None = None
+    # config.yaml の config セクション
+    settings: dict = field(default_factory=dict)
+
+
+def _stat_key(path: Path) -> tuple[int, int, int] | None:
+    # ファイルの変更検知用（存在しない場合はNone）
+    try:
+        st = path.stat()
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        return None
 
 
 class LnConfig:
     dotenv_path = Path(__file__).parent.parent / '.env'
+    config_yaml_path = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+    # 読み込み済みの設定と、読み込み時のファイル状態、環境変数の値
+    _snapshot: LnConfigSnapshot | None = None
+    _snapshot_key: tuple | None = None
+    _snapshot_lock: Final[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def snapshot(cls) -> LnConfigSnapshot:
+        # .env と config.yaml を読み込んだ設定を返す
+        # （ファイルの更新日時/サイズ、または環境変数の値が変わった場合のみ読み直す）
+        key = (
+            cls.dotenv_path, _stat_key(cls.dotenv_path), cls.config_yaml_path, _stat_key(cls.config_yaml_path),
+            tuple(os.environ.get(env_key) for env_key in ENV_KEYS),
+        )
+        snapshot = cls._snapshot
+        if snapshot is not None and key == cls._snapshot_key:
+            return snapshot
+
+        with cls._snapshot_lock:
+            if cls._snapshot is None or key != cls._snapshot_key:
+                cls._snapshot = cls._load()
+                cls._snapshot_key = key
+            return cls._snapshot
+
+    @classmethod
+    def _load(cls) -> LnConfigSnapshot:
+        # .env（環境変数に設定済みの値を優先）
+        dotenv_data = dotenv_values(cls.dotenv_path) if cls.dotenv_path.exists() else {}
+
+        def get_value(key: str) -> str | None:
+            value = os.environ.get(key, dotenv_data.get(key))
+            return value if value else None
+
+        # config.yaml（存在しない、または形式が異なる場合は空）
+        settings: dict = {}
+        try:
+            setting_data = yaml.safe_load(cls.config_yaml_path.read_text(encoding='utf-8'))
+            if isinstance(setting_data, dict) and isinstance(setting_data.get('config'), dict):
+                settings = setting_data['config']
+        except (OSError, yaml.YAMLError):
+            pass
+
+        # variable_dir は .env を優先し、未設定の場合は config.yaml の値を使用
+        variable_dir_s = get_value(KEY_VARIABLE_DIR) or settings.get('variable_dir')
+        metrics_textfile_s = get_value(KEY_METRICS_TEXTFILE)
+        metrics_port_s = get_value(KEY_METRICS_PORT)
+        archive_dir_s = get_value(KEY_ARCHIVE_DIR)
+        retention_days_s = get_value(KEY_RETENTION_DAYS)
+        return LnConfigSnapshot(
+            variable_dir=Path(variable_dir_s) if variable_dir_s else None,
+            line_token_nagaoka=get_value(KEY_LINE_TOKEN_NAGAOKA),
+            line_token_niigata=get_value(KEY_LINE_TOKEN_NIIGATA),
+            site_url_nagaoka=get_value(KEY_SITE_URL_NAGAOKA),
+            notify_url=get_value(KEY_NOTIFY_URL),
+            metrics_textfile=Path(metrics_textfile_s) if metrics_textfile_s else None,
+            metrics_port=int(metrics_port_s) if metrics_port_s and metrics_port_s.isdigit() else None,
+            log_queue=(get_value(KEY_LOG_QUEUE) or '').lower() in ('1', 'true', 'yes', 'on'),
+            log_levels=_parse_log_levels(get_value(KEY_LOG_LEVELS)),
+            archive_dir=Path(archive_dir_s) if archive_dir_s else None,
+            retention_days=int(retention_days_s) if retention_days_s and retention_days_s.isdigit() else None,
+            notify_coalesce_window=_parse_seconds(get_value(KEY_NOTIFY_COALESCE_WINDOW)),
+            settings=settings,
+        )
 
     @classmethod
     def getLnVariableDir(cls) -> Path | None:
         try:
-            load_dotenv(cls.dotenv_path)
-            varialble_dir_s = os.environ.get(KEY_VARIABLE_DIR)
-            if varialble_dir_s is None:
-                return None
-            else:
-                variable_dir_p = Path(varialble_dir_s)
-                return variable_dir_p
+            return cls.snapshot().variable_dir
         except Exception:
             return None
 
     @classmethod
     def getLnLineTokenNagaoka(cls) -> str | None:
-        load_dotenv(cls.dotenv_path)
-        return os.environ.get(KEY_LINE_TOKEN_NAGAOKA)
+        return cls.snapshot().line_token_nagaoka
 
     @classmethod
     def getLnLineTokenNiigata(cls) -> str | None:
-        load_dotenv(cls.dotenv_path)
-        return os.environ.get(KEY_LINE_TOKEN_NIIGATA)
+        return cls.snapshot().line_token_niigata
+
+    @classmethod
+    def getLnSiteUrlNagaoka(cls) -> str | None:
+        return cls.snapshot().site_url_nagaoka
+
+    @classmethod
+    def getLnNotifyUrl(cls) -> str | None:
+        return cls.snapshot().notify_url
+
+    @classmethod
+    def getLnMetricsTextfile(cls) -> Path | None:
+        return cls.snapshot().metrics_textfile
+
+    @classmethod
+    def getLnMetricsPort(cls) -> int | None:
+        return cls.snapshot().metrics_port
+
+    @classmethod
+    def getLnLogQueue(cls) -> bool:
+        return cls.snapshot().log_queue
+
+    @classmethod
+    def getLnLogLevels(cls) -> dict[str, str]:
+        return dict(cls.snapshot().log_levels)
+
+    @classmethod
+    def getLnArchiveDir(cls) -> Path | None:
+        return cls.snapshot().archive_dir
+
+    @classmethod
+    def getLnRetentionDays(cls) -> int | None:
+        return cls.snapshot().retention_days
+
+    @classmethod
+    def getLnNotifyCoalesceWindow(cls) -> float | None:
+        return cls.snapshot().notify_coalesce_window
@@ -0,0 +1,122 @@
+from logging import getLogger, Logger
+from typing import Callable, Final
+import asyncio
+import logging
+import signal
+
+from line_notify.src.city_poller import CitySource, MultiCityPoller
+from line_notify.src.ln_config import LnConfig
+from line_notify.src.ln_metrics import get_metrics_registry
+from line_notify.src.logger_initializer import stop_logger
+from line_notify.src.notify_dispatcher import NotifyDispatcher
+from line_notify.src.retention import FINGERPRINT_DAYS_DEFAULT, DataRetention
+from line_notify.src.run_lock import RunLock
+from line_notify.src.structures import OverlapPolicy, RunMode
+
+STOP_SIGNALS: Final[tuple[signal.Signals, ...]] = (signal.SIGTERM, signal.SIGINT)
+DISPATCHER_STOP_TIMEOUT: Final[float] = 30.0
+MAINTENANCE_INTERVAL_DEFAULT: Final[float] = 3600.0
+
+
+class LnDaemon:
+    """常駐してポーリングを繰り返す
+
+    初期化（設定、logger、DB移行）は起動時の1回のみ行い、以降はプロセス内で
+    MultiCityPoller によるポーリングと NotifyDispatcher による通知を続ける。
+    SIGTERM/SIGINT を受けると、実行中のポーリングと通知の完了を待って終了する。
+    maintenance を指定した場合は、maintenance_interval 秒ごとに別スレッドで実行する（保存期間の処理など）。
+    run_locks（取得元の名前 → 実行ロック）を指定した場合は、ポーリングごとにロックを取得し、
+    cron で起動した実行と同じ取得元のポーリングが重ならないようにする。
+    """
+
+    def __init__(
+        self,
+        sources: list[CitySource],
+        dispatchers: list[NotifyDispatcher],
+        logger: Logger | None = None,
+        maintenance: Callable[[], object] | None = None,
+        maintenance_interval: float = MAINTENANCE_INTERVAL_DEFAULT,
+        run_locks: dict[str, RunLock] | None = None,
+        overlap_policy: OverlapPolicy = OverlapPolicy.COALESCE,
+    ):
+        self._poller: Final[MultiCityPoller] = MultiCityPoller(
+            sources, logger=logger, overlap_policy=overlap_policy, run_locks=run_locks
+        )
+        self._dispatchers: Final[list[NotifyDispatcher]] = list(dispatchers)
+        self._logger: Final[Logger] = logger if logger is not None else getLogger('ln.daemon')
+        self._maintenance: Final[Callable[[], object] | None] = maintenance
+        self._maintenance_interval: Final[float] = maintenance_interval
+
+    def run(self):
+        try:
+            asyncio.run(self._run())
+        finally:
+            self._poller.shutdown()
+
+    def stop(self):
+        self._logger.info('Stop requested.')
+        self._poller.stop()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        for sig in STOP_SIGNALS:
+            loop.add_signal_handler(sig, self.stop)
+
+        for dispatcher in self._dispatchers:
+            dispatcher.start()
+        self._logger.info(f'Daemon started. (sources={[source.name for source in self._poller.sources]})')
+        maintenance_task = asyncio.create_task(self._maintenance_loop()) if self._maintenance is not None else None
+        try:
+            await self._poller.run()
+        finally:
+            if maintenance_task is not None:
+                maintenance_task.cancel()
+                await asyncio.gather(maintenance_task, return_exceptions=True)
+            for sig in STOP_SIGNALS:
+                loop.remove_signal_handler(sig)
+            for dispatcher in self._dispatchers:
+                dispatcher.stop(DISPATCHER_STOP_TIMEOUT)
+            self._logger.info('Daemon stopped.')
+
+    async def _maintenance_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self._maintenance)
+            except Exception:
+                self._logger.exception('Failed to run maintenance:')
+            await asyncio.sleep(self._maintenance_interval)
+
+
+def main():
+    # 長岡市の取得元で常駐を開始
+    from line_notify.src.nagaoka_main import NagaokaMain
+
+    nagaoka = NagaokaMain(RunMode.DAEMON)
+
+    # 保存期間を過ぎた災害情報をアーカイブDBに移す（日数が設定されている場合のみ）
+    maintenance = None
+    if (retention_days := LnConfig.getLnRetentionDays()) is not None:
+        maintenance = DataRetention(
+            nagaoka.data_db_path, retention_days=retention_days,
+            fingerprint_days=max(retention_days, FINGERPRINT_DAYS_DEFAULT), logger=getLogger('ln.nagaoka'),
+        ).run
+
+    # メトリクスの /metrics を公開（ポート番号が設定されている場合のみ）
+    metrics_server = None
+    if (metrics_port := LnConfig.getLnMetricsPort()) is not None:
+        metrics_server = get_metrics_registry().serve(metrics_port)
+    try:
+        LnDaemon(
+            [nagaoka], [nagaoka.dispatcher], logger=getLogger('ln.nagaoka'), maintenance=maintenance,
+            run_locks={nagaoka.name: nagaoka.run_lock},
+        ).run()
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        stop_logger()
+        logging.shutdown()
+
+
+if __name__ == '__main__':
+    main()
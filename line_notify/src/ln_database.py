@@ -1,31 +1,101 @@
 from pathlib import Path
 from typing import Final
 from contextlib import contextmanager
+import threading
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool
 
 from line_notify.src.ln_config import LnConfig
 
+DB_FILE_NAME: Final[str] = 'line_notify_data.db'
+POOL_SIZE_DEFAULT: Final[int] = 5
+BUSY_TIMEOUT_MS_DEFAULT: Final[int] = 5000
+CACHE_SIZE_KIB_DEFAULT: Final[int] = 8192
+MMAP_SIZE_DEFAULT: Final[int] = 64 * 1024 * 1024
 
-# データベースファイルパスを決定
-if (variable_dir_str := LnConfig.getLnVariableDir()) is None:
-    raise ValueError("variable directory is not defined.")
-db_file_path = Path(variable_dir_str) / 'db' / 'line_notify_data.db'
-db_file_path.parent.mkdir(exist_ok=True)
+# DBファイルパスごとのEngine, Session（初回取得時に生成）
+_engines: dict[Path, Engine] = {}
+_sessionmakers: dict[Path, sessionmaker] = {}
+_lock: Final[threading.Lock] = threading.Lock()
 
-# Engine, Session設定
-DB_URL: Final[str] = f'sqlite:///{db_file_path.as_posix()}'
-ENGINE = create_engine(DB_URL, echo=True)
-SESSION = sessionmaker(autocommit=False, autoflush=False, bind=ENGINE)
+
+def get_db_file_path() -> Path:
+    # データベースファイルパスを決定
+    if (variable_dir := LnConfig.getLnVariableDir()) is None:
+        raise ValueError("variable directory is not defined.")
+    return Path(variable_dir) / 'db' / DB_FILE_NAME
+
+
+def get_engine(
+    db_file_path: Path | None = None,
+    pool_size: int = POOL_SIZE_DEFAULT,
+    echo: bool = False,
+    cache_size_kib: int = CACHE_SIZE_KIB_DEFAULT,
+    mmap_size: int = MMAP_SIZE_DEFAULT,
+) -> Engine:
+    # DBファイルパスごとにEngineを生成し、以降は同じEngineを返す
+    # （pool_size などの設定は初回生成時のみ有効）
+    if db_file_path is None:
+        db_file_path = get_db_file_path()
+    key: Final[Path] = db_file_path.absolute()
+
+    with _lock:
+        if (engine := _engines.get(key)) is not None:
+            return engine
+
+        key.parent.mkdir(parents=True, exist_ok=True)
+        engine = create_engine(
+            f'sqlite:///{key.as_posix()}',
+            echo=echo,
+            poolclass=QueuePool,
+            pool_size=pool_size,
+            connect_args={'timeout': BUSY_TIMEOUT_MS_DEFAULT / 1000},
+        )
+
+        # sqlite 接続ごとのpragma（このEngineの接続のみに適用）
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragma(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS_DEFAULT}')
+            cursor.execute(f'PRAGMA cache_size={-int(cache_size_kib)}')
+            cursor.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+            # 外部キー制約を強制
+            cursor.execute('PRAGMA foreign_keys=ON')
+            cursor.close()
+
+        _engines[key] = engine
+        return engine
+
+
+def get_sessionmaker(db_file_path: Path | None = None) -> sessionmaker:
+    engine: Final[Engine] = get_engine(db_file_path)
+    key: Final[Path] = Path(engine.url.database)
+    with _lock:
+        if (session_maker := _sessionmakers.get(key)) is None:
+            session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            _sessionmakers[key] = session_maker
+        return session_maker
+
+
+def dispose_engines():
+    # 生成済みのEngineを全て破棄（テスト、終了処理用）
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _sessionmakers.clear()
 
 
 # sessionを取得する関数
 @contextmanager
-def session_factory():
-    session = SESSION()
+def session_factory(db_file_path: Path | None = None):
+    session = get_sessionmaker(db_file_path)()
     try:
         yield session
         session.commit()
@@ -38,11 +108,3 @@ def session_factory():
         raise err
     finally:
         session.close()
-
-
-# sqlite 外部キー制約を強制するpragma
-@event.listens_for(Engine, 'connect')
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    cursor = dbapi_connection.cursor()
-    cursor.execute('PRAGMA foreign_keys=ON')
-    cursor.close()
@@ -0,0 +1,304 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Final, Iterator
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+# 処理時間[s]、バイト数のヒストグラムの区切り
+LATENCY_BUCKETS: Final[tuple[float, ...]] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+BYTES_BUCKETS: Final[tuple[float, ...]] = tuple(float(1024 * 4 ** i) for i in range(8))
+
+CONTENT_TYPE: Final[str] = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: tuple[tuple[str, str], ...] = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ''
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')) for key, value in items
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """増加のみの値（ラベルの組み合わせごと）"""
+
+    kind: Final[str] = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        self.name: Final[str] = name
+        self.documentation: Final[str] = documentation
+        self._values: dict[tuple[tuple[str, str], ...], float] = {}
+        self._lock: Final[threading.Lock] = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(key)} {_format_value(value)}' for key, value in items]
+
+    def state(self) -> dict:
+        with self._lock:
+            return {'values': [[list(map(list, key)), value] for key, value in sorted(self._values.items())]}
+
+    def restore(self, state: dict):
+        # state の値で置き換える（state にないラベルの組み合わせはそのまま）
+        with self._lock:
+            for key, value in state['values']:
+                self._values[tuple((str(k), str(v)) for k, v in key)] = float(value)
+
+
+class Histogram:
+    """値の分布（ラベルの組み合わせごとに、区切りごとの件数、合計、件数を保持）"""
+
+    kind: Final[str] = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name: Final[str] = name
+        self.documentation: Final[str] = documentation
+        self._buckets: Final[tuple[float, ...]] = tuple(sorted(buckets))
+        # ラベル → [区切りごとの件数（累積前）..., +Infの件数], 合計
+        self._values: dict[tuple[tuple[str, str], ...], tuple[list[int], list[float]]] = {}
+        self._lock: Final[threading.Lock] = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            if (entry := self._values.get(key)) is None:
+                entry = ([0] * (len(self._buckets) + 1), [0.0])
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(tuple(sorted(labels.items())))
+            return sum(entry[0]) if entry is not None else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines: list[str] = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self._buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(key, (("le", _format_value(bound)),))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {cumulative}')
+        return lines
+
+    def state(self) -> dict:
+        with self._lock:
+            return {
+                'buckets': list(self._buckets),
+                'values': [
+                    [list(map(list, key)), list(counts), total[0]]
+                    for key, (counts, total) in sorted(self._values.items())
+                ],
+            }
+
+    def restore(self, state: dict):
+        # state の値で置き換える（区切りが異なる場合は何もしない）
+        if tuple(state['buckets']) != self._buckets:
+            return
+        with self._lock:
+            for key, counts, total in state['values']:
+                if len(counts) == len(self._buckets) + 1:
+                    self._values[tuple((str(k), str(v)) for k, v in key)] = ([int(c) for c in counts], [float(total)])
+
+
+def _replace_text(path: Path, text: str):
+    # 一時ファイルに書いてから置き換える（読み取り側が書き込み途中の内容を読まないように）
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+class MetricsRegistry:
+    """メトリクスの登録、Prometheusテキスト形式での出力"""
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._lock: Final[threading.Lock] = threading.Lock()
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(name, lambda: Counter(name, documentation), Counter)
+
+    def histogram(self, name: str, documentation: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, documentation, buckets), Histogram)
+
+    def _register(self, name, factory, kind):
+        # 同じ名前の場合は登録済みのメトリクスを返す
+        with self._lock:
+            if (metric := self._metrics.get(name)) is None:
+                metric = factory()
+                self._metrics[name] = metric
+            elif not isinstance(metric, kind):
+                raise ValueError(f'metric {name} is already registered as {metric.kind}.')
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines: list[str] = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: Path):
+        # node_exporter の textfile collector 用に一時ファイル経由で置き換える
+        _replace_text(path, self.render())
+
+    def save_state(self, path: Path):
+        # 全てのメトリクスの値をJSONで保存（1回で終了するプロセスが次回の起動で値を引き継ぐため）
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        state = {
+            metric.name: {'kind': metric.kind, 'documentation': metric.documentation, **metric.state()}
+            for metric in metrics
+        }
+        _replace_text(path, json.dumps(state, ensure_ascii=False))
+
+    def restore_state(self, path: Path) -> bool:
+        # save_state で保存した値で置き換える（ファイルがない、または読み取れない場合は False）
+        try:
+            state = json.loads(path.read_text(encoding='utf-8'))
+            for name, metric_state in state.items():
+                if metric_state['kind'] == Counter.kind:
+                    self.counter(name, metric_state['documentation']).restore(metric_state)
+                elif metric_state['kind'] == Histogram.kind:
+                    self.histogram(
+                        name, metric_state['documentation'], tuple(metric_state['buckets'])
+                    ).restore(metric_state)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return False
+        return True
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        # /metrics を返すHTTPサーバーをバックグラウンドで開始
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='ln-metrics', daemon=True).start()
+        return server
+
+
+class RunRecorder:
+    """1回のポーリングの処理時間、件数を記録する（レジストリにも同時に反映する）
+
+    処理時間は time.perf_counter（単調増加）で計測する。
+    """
+
+    def __init__(self, registry: MetricsRegistry, source: str):
+        self._source: Final[str] = source
+        self._stage_seconds: Final[Histogram] = registry.histogram(
+            'ln_stage_duration_seconds', 'Duration of each polling stage in seconds.'
+        )
+        self._page_bytes: Final[Histogram] = registry.histogram(
+            'ln_page_bytes', 'Bytes read from the disaster information page.', BYTES_BUCKETS
+        )
+        self._items: Final[Counter] = registry.counter('ln_items_total', 'Disaster entries by processing result.')
+        self._runs: Final[Counter] = registry.counter('ln_runs_total', 'Polling runs by result.')
+        self._started: Final[float] = time.perf_counter()
+        self._durations: dict[str, float] = {}
+        self._counts: dict[str, int] = {}
+        self._result: str | None = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._durations[name] = self._durations.get(name, 0.0) + elapsed
+            self._stage_seconds.observe(elapsed, source=self._source, stage=name)
+
+    def count(self, name: str, value: int = 1):
+        self._counts[name] = self._counts.get(name, 0) + value
+        self._items.inc(value, source=self._source, kind=name)
+
+    def observe_bytes(self, size: int):
+        self._counts['bytes'] = self._counts.get('bytes', 0) + size
+        self._page_bytes.observe(size, source=self._source)
+
+    def finish(self, result: str) -> str:
+        # 実行結果（changed/unchanged/error）を記録し、1行の要約を返す
+        if self._result is None:
+            self._result = result
+            total = time.perf_counter() - self._started
+            self._stage_seconds.observe(total, source=self._source, stage='total')
+            self._runs.inc(source=self._source, result=result)
+            self._durations['total'] = total
+        return self.summary()
+
+    def summary(self) -> str:
+        parts = [f'source={self._source}', f'result={self._result or "running"}']
+        parts.extend(f'{name}={seconds * 1000:.1f}ms' for name, seconds in self._durations.items())
+        parts.extend(f'{name}={value}' for name, value in self._counts.items())
+        return ' '.join(parts)
+
+
+def record_skipped_run(registry: MetricsRegistry, source: str, reason: str, count: int = 1):
+    # 他のポーリングが実行中のため行わなかった回を記録（ln_runs_total の result="skipped" と理由ごとの件数）
+    # reason: locked（他のプロセスが実行中）、stale（実行中のまま stale_after を超えている）、overrun（間隔の超過）
+    registry.counter('ln_runs_total', 'Polling runs by result.').inc(count, source=source, result='skipped')
+    registry.counter(
+        'ln_runs_skipped_total', 'Polling runs skipped because another run of the source was in flight.'
+    ).inc(count, source=source, reason=reason)
+
+
+_registry: MetricsRegistry | None = None
+_registry_lock: Final[threading.Lock] = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    # プロセス内で共用するレジストリを取得（初回呼び出し時に生成）
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
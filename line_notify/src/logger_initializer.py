@@ -1,14 +1,104 @@
-from logging import config
+from logging import config, Handler, LogRecord
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from jinja2 import Template, Environment, FileSystemLoader
+import atexit
+import logging
+import queue
+import threading
 import yaml
 from typing import Final
 
 from line_notify.src.ln_config import LnConfig
 
+# キュー経由で出力する場合のリスナー（ファイル等への出力を行うスレッド）
+_listener: QueueListener | None = None
+_listener_lock: Final[threading.Lock] = threading.Lock()
 
-def initialize_logger(template_dir: Path, log_output_dir: Path):
+
+class _RoutedQueueHandler(QueueHandler):
+    # キューに追加するレコードに、元のhandlerを持っていたlogger名を付与する
+    def __init__(self, log_queue: queue.SimpleQueue, route: str):
+        super().__init__(log_queue)
+        self._route: Final[str] = route
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        record = super().prepare(record)
+        record.ln_route = self._route
+        return record
+
+
+class _RoutingHandler(Handler):
+    # リスナースレッドで、レコードを元のloggerのhandlerに振り分ける（handlerのレベルも確認する）
+    def __init__(self, routes: dict[str, list[Handler]]):
+        super().__init__()
+        self._routes: Final[dict[str, list[Handler]]] = routes
+
+    def handle(self, record: LogRecord) -> bool:
+        for handler in self._routes.get(getattr(record, 'ln_route', ''), []):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def emit(self, record: LogRecord):
+        self.handle(record)
+
+    def close(self):
+        for handlers in self._routes.values():
+            for handler in handlers:
+                handler.close()
+        super().close()
+
+
+def _apply_levels(levels: dict[str, str | int]):
+    # loggerごとのレベルを設定（無効なレベルの場合は ValueError）
+    for name, level in levels.items():
+        logging.getLogger(name if name != 'root' else None).setLevel(level)
+
+
+def _start_queue_listener(setting_data: dict):
+    # dictConfig で生成したhandlerをリスナースレッドに移し、各loggerにはキューへの追加のみを行うhandlerを設定
+    global _listener
+    log_queue: Final[queue.SimpleQueue] = queue.SimpleQueue()
+    routes: dict[str, list[Handler]] = {}
+    logger_names = list(setting_data.get('loggers', {}).keys()) + ['root']
+    for name in logger_names:
+        logger = logging.getLogger(name if name != 'root' else None)
+        if not logger.handlers:
+            continue
+        routes[name] = list(logger.handlers)
+        for handler in routes[name]:
+            logger.removeHandler(handler)
+        logger.addHandler(_RoutedQueueHandler(log_queue, name))
+
+    _listener = QueueListener(log_queue, _RoutingHandler(routes))
+    _listener.start()
+
+
+def stop_logger():
+    # キュー経由の出力を停止（キューに残っているレコードを全て出力してからhandlerを閉じる）
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            return
+        listener, _listener = _listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def initialize_logger(
+    template_dir: Path,
+    log_output_dir: Path,
+    use_queue: bool | None = None,
+    levels: dict[str, str | int] | None = None,
+):
+    # use_queue: ファイル等への出力を別スレッドで行う（Noneの場合は LN_LOG_QUEUE の設定値）
+    # levels: loggerごとのレベル（Noneの場合は LN_LOG_LEVELS の設定値、ln.nagaoka=INFO でデバッグ出力を抑止）
     try:
+        # 前回初期化時のリスナーを停止
+        stop_logger()
+
         # ログ出力先ディレクトリを確認し、存在しない場合作成
         log_output_dir.mkdir(exist_ok=True)
 
@@ -22,6 +112,12 @@ def initialize_logger(template_dir: Path, log_output_dir: Path):
 
         # 設定をloggingモジュールに反映
         config.dictConfig(setting_data)
+        _apply_levels(levels if levels is not None else LnConfig.getLnLogLevels())
+
+        # キュー経由の出力に切り替え
+        if use_queue if use_queue is not None else LnConfig.getLnLogQueue():
+            with _listener_lock:
+                _start_queue_listener(setting_data)
 
     except Exception as err:
         print(f'Exception is occurred: {err}')
@@ -43,3 +139,7 @@ def initialize_logger_auto():
 
     except Exception as err:
         raise err
+
+
+# 終了時にキューに残っているレコードを出力
+atexit.register(stop_logger)
@@ -0,0 +1,96 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Final
+import sys
+import unicodedata
+
+import yaml
+
+MASTER_DATA_PATH: Final[Path] = Path(__file__).parent.parent / 'resource' / 'db_master_data.yaml'
+
+# 災害種別名に含まれる語と災害種別（先に一致したものを採用）
+CATEGORY_KEYWORDS: Final[tuple[tuple[str, str], ...]] = (
+    ('火災', '火災'),
+    ('救助', '救助'),
+    ('警戒', '警戒'),
+    ('救急', '救急'),
+)
+CATEGORY_OTHER: Final[str] = 'その他'
+
+# 状況を表す語と災害状況（先に一致したものを採用）
+STATUS_KEYWORDS: Final[tuple[tuple[str, str], ...]] = (
+    ('鎮圧', '鎮圧'),
+    ('鎮火', '鎮火'),
+    ('救助', '救助完了'),
+    ('消火の必要はありません', '消火不要'),
+    ('出動', '発生'),
+)
+
+# 道路上の場所を表す語（含まれる場合は 道路等（都市名） とする）
+ROAD_KEYWORDS: Final[tuple[str, ...]] = ('国道', '県道', '高速', '自動車道', 'バイパス', 'IC', 'インターチェンジ', 'JCT')
+
+
+def normalize_name(name: str) -> str:
+    # 名称、場所の照合用に正規化（ページの文字列と同じく NFKC、空白を除く）
+    return unicodedata.normalize('NFKC', name).replace(' ', '')
+
+
+class MasterDataLookup:
+    """マスターデータの名称からIDを引くための表
+
+    IDはリストの定義順に1から割り当てる（db_migration がマスターデータを登録した際のrowidと一致する）。
+    名称は sys.intern して保持する。
+    地区の照合はページの場所と同じく NFKC で正規化して行う（マスターデータの全角括弧とページの半角括弧を一致させる）。
+    """
+
+    def __init__(self, master_data: dict):
+        data: Final[dict] = master_data.get('data', {})
+        self.city_ids: Final[dict[str, int]] = self._build(data.get('city_name', []))
+        self.category_ids: Final[dict[str, int]] = self._build(data.get('disaster_category', []))
+        self.status_ids: Final[dict[str, int]] = self._build(data.get('disaster_status', []))
+        self.district_ids: Final[dict[str, int]] = self._build(data.get('district', []))
+
+        # 地区名は長いものから前方一致させる（「新潟市中央区」を「新潟市」より優先）
+        self._normalized_district_ids: Final[dict[str, int]] = {
+            normalize_name(name): district_id for name, district_id in self.district_ids.items()
+        }
+        self._district_prefixes: Final[list[tuple[str, int]]] = sorted(
+            self._normalized_district_ids.items(), key=lambda item: len(item[0]), reverse=True
+        )
+
+    @staticmethod
+    def _build(names: list[str]) -> dict[str, int]:
+        return {sys.intern(str(name)): i for i, name in enumerate(names, start=1)}
+
+    def category_id(self, category_text: str) -> int:
+        # 災害種別名（車両火災、救急活動 等）から災害種別IDを取得
+        for keyword, category_name in CATEGORY_KEYWORDS:
+            if keyword in category_text:
+                return self.category_ids[category_name]
+        return self.category_ids[CATEGORY_OTHER]
+
+    def status_id(self, status_text: str) -> int | None:
+        # 状況を表す文字列（鎮火、救助終了 等）から災害状況IDを取得
+        for keyword, status_name in STATUS_KEYWORDS:
+            if keyword in status_text:
+                return self.status_ids[status_name]
+        return None
+
+    def district_id(self, location: str, city_name: str) -> int:
+        # 場所から地区IDを取得
+        # （道路上の場所は 道路等（都市名）、どの地区にも一致しない場合は 市外（都市名））
+        compact_location = normalize_name(location)
+        if any(keyword in compact_location for keyword in ROAD_KEYWORDS):
+            if (road_id := self._normalized_district_ids.get(normalize_name(f'道路等（{city_name}）'))) is not None:
+                return road_id
+        for district_name, district_id in self._district_prefixes:
+            if compact_location.startswith(district_name):
+                return district_id
+        return self._normalized_district_ids[normalize_name(f'市外（{city_name}）')]
+
+
+@lru_cache(maxsize=None)
+def get_master_data_lookup(master_data_path: Path = MASTER_DATA_PATH) -> MasterDataLookup:
+    # マスターデータを読み込み、名称→ID表を生成（プロセス内で1回のみ）
+    master_data = yaml.safe_load(master_data_path.read_text(encoding='utf-8'))
+    return MasterDataLookup(master_data)
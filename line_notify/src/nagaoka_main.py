@@ -1,63 +1,254 @@
-import sqlite3
-import re
 import requests
 from requests import ConnectionError, HTTPError, Timeout, RequestException
-import unicodedata
-import datetime
 from logging import getLogger, Logger
-from typing import Final
+from typing import Final, Iterator
 from pathlib import Path
-import contextlib
 
-from line_notify.logger_initializer import initialize_logger
-from line_notify.errors import DownloadPageError, TextAnalysisError, DbOperationError, NotifyError
-from line_notify.structures import MainClassSetting, DisasterTextType, DisasterTextInfo
+from line_notify.src.logger_initializer import initialize_logger
+from line_notify.src.ln_config import LnConfig, LnConfigSnapshot
+from line_notify.src.errors import DownloadPageError
+from line_notify.src.structures import (
+    DisasterTextType, DisasterTextInfo, IncidentTransition, PageState, RunMode
+)
+from line_notify.src.page_state import PageStateStore
+from line_notify.src.disaster_text_parser import parse_disaster_text, attach_disaster_records
+from line_notify.src.disaster_store import DisasterTextStore
+from line_notify.src.page_sections import CHUNK_SIZE_DEFAULT, PageSectionReader, read_page_sections
+from line_notify.src.page_archive import PageArchive
+from line_notify.src.incident_tracker import IncidentTracker
+from line_notify.src.db_migration import DbMigration
+from line_notify.src.http_client import LnHttpClient, get_http_client
+from line_notify.src.notify_dispatcher import COALESCE_WINDOW_DEFAULT, NOTIFY_URL, NotifyDispatcher, default_token_resolver
+from line_notify.src.token_registry import TokenRegistry
+from line_notify.src.adaptive_interval import AdaptiveInterval
+from line_notify.src.ln_metrics import MetricsRegistry, RunRecorder, get_metrics_registry
+from line_notify.src.run_lock import RunLock, acquire_or_skip
 
 
 class NagaokaMain:
     SITE_URL: Final[str] = 'http://www.nagaoka-fd.com/fire/saigai/saigaipc.html'
-    NOTIFY_URL: Final[str] = 'https://notify-api.line.me/api/notify'
+    POLL_INTERVAL: Final[float] = 60.0
+    CITY_NAME: Final[str] = '長岡市'
 
-    def __init__(self):
+    name: Final[str] = 'nagaoka'
+
+    def __init__(self, mode: RunMode = RunMode.CRON):
         # ソフトウェア本体のパスを取得
         self._software_dir = Path(__file__).parent / '..'
         self._software_dir = Path.absolute(self._software_dir)
 
-        # 設定値を読み取り
-        setting_file_path: Final[Path] = self._software_dir / 'config' / 'config.yaml'
-        settings = MainClassSetting(setting_file_path)
-        self._variable_dir = settings.variable_dir
+        # 設定値を読み取り（.env、環境変数を優先し、未設定の場合は config.yaml の値）
+        settings: Final[LnConfigSnapshot] = LnConfig.snapshot()
+        if settings.variable_dir is None:
+            raise ValueError('variable directory is not defined.')
+        self._variable_dir: Final[Path] = settings.variable_dir
+        self._variable_dir.mkdir(parents=True, exist_ok=True)
 
         # loggerを初期化し取得
         log_dir: Final[Path] = self._variable_dir / 'log'
-        initialize_logger(self._software_dir, log_dir, 'line_notify_nagaoka')
-        self._logger: Final[Logger] = getLogger('server_logger')
+        template_dir: Final[Path] = self._software_dir / 'resource' / 'templates'
+        initialize_logger(template_dir, log_dir)
+        self._logger: Final[Logger] = getLogger('ln.nagaoka')
 
         # DBへのパスを取得
         self._master_db_path: Final[Path] = self._variable_dir / 'db' / 'line_notify_admin.db'
-        self._data_db_path: Final[Path] = self._variable_dir / 'db' / 'line_notify_admin.db'
+        self._data_db_path: Final[Path] = self._variable_dir / 'db' / 'line_notify_data.db'
+
+        # データDBのスキーマを最新化
+        DbMigration(self._data_db_path).migrate()
+
+        # 重複判定
+        self._disaster_store: Final[DisasterTextStore] = DisasterTextStore(
+            self._data_db_path, NagaokaMain.CITY_NAME, 't_disaster_text_nagaoka'
+        )
+
+        # 災害ごとの状態（状態が変化した災害情報のみ通知）
+        self._incident_tracker: Final[IncidentTracker] = IncidentTracker(self._data_db_path, NagaokaMain.CITY_NAME)
+
+        # 前回取得したWebページの状態（条件付きGET、変更検知用）
+        self._page_state_store: Final[PageStateStore] = PageStateStore(
+            self._variable_dir / 'cache' / 'nagaoka_page_state.json'
+        )
+        self._pending_page_state: PageState | None = None
+
+        # 取得したWebページの保存先（変更があった場合のみ、同じ本文は1度だけ保存）
+        self._page_archive: Final[PageArchive] = PageArchive(
+            LnConfig.getLnArchiveDir() or self._variable_dir / 'archive'
+        )
+
+        # 接続先URL（.env、環境変数で変更できる）
+        self._site_url: Final[str] = LnConfig.getLnSiteUrlNagaoka() or NagaokaMain.SITE_URL
+
+        # Webページ取得、LINE通知で共用するHTTPクライアント
+        self._http_client: Final[LnHttpClient] = get_http_client()
+
+        # 通知先トークン（t_token に 'nagaoka'、'nagaoka.<グループ名>' で登録、未登録の場合は .env の設定値）
+        self._token_registry: Final[TokenRegistry] = TokenRegistry(
+            self._data_db_path, fallback=default_token_resolver
+        )
+
+        # LINE通知（アウトボックスの送信、送信先URL、まとめて送信するまでの待ち時間は .env、環境変数で変更できる）
+        coalesce_window: float | None = LnConfig.getLnNotifyCoalesceWindow()
+        self._dispatcher: Final[NotifyDispatcher] = NotifyDispatcher(
+            self._data_db_path, token_resolver=self._token_registry.resolve, http_client=self._http_client,
+            notify_url=LnConfig.getLnNotifyUrl() or NOTIFY_URL,
+            coalesce_window=COALESCE_WINDOW_DEFAULT if coalesce_window is None else coalesce_window,
+            logger=self._logger
+        )
+
+        # 処理ごとの時間、件数（Prometheusテキスト形式のファイルに出力）
+        # ファイルは実行方法ごとに分け（line_notify_cron.prom 等）、cron と常駐プロセスが互いに上書きしないようにする
+        # cron で起動した場合は、値を保存して次回の起動で引き継ぐ（カウンター、ヒストグラムを累積値とするため）
+        metrics_textfile: Final[Path] = (
+            LnConfig.getLnMetricsTextfile() or self._variable_dir / 'metrics' / 'line_notify.prom'
+        )
+        self._metrics: Final[MetricsRegistry] = get_metrics_registry()
+        self._metrics_textfile: Final[Path] = metrics_textfile.with_name(
+            f'{metrics_textfile.stem}_{mode.name.lower()}{metrics_textfile.suffix}'
+        )
+        self._metrics_state_path: Final[Path] = self._variable_dir / 'cache' / f'{mode.name.lower()}_metrics.json'
+        self._run: RunRecorder | None = None
+
+        # 実行ロック（cron の起動が前回の実行や常駐プロセスと重なった場合は実行しない）
+        self._run_lock: Final[RunLock] = RunLock(self._variable_dir / 'lock' / f'{NagaokaMain.name}.lock')
+
+        # ポーリング間隔[s]（ページの状態に応じて変化）
+        self._adaptive_interval: Final[AdaptiveInterval] = AdaptiveInterval(normal_interval=NagaokaMain.POLL_INTERVAL)
 
     def main(self):
+        # 他のプロセスが実行中の場合は、メトリクスのファイルも更新しない（保持しているプロセスが更新する）
+        if not acquire_or_skip(self._run_lock, NagaokaMain.name, self._metrics, self._logger):
+            return
+        # 前回までの値を引き継ぐ（ロックを保持している間のみ読み書きする）
+        self._metrics.restore_state(self._metrics_state_path)
         try:
-            webpage_text: Final[str] = self._download_page()
-            disaster_text_info_list = [
-                dtext for dtext in self._trim_disaster_text(webpage_text) if self._is_new_disaster_text(dtext)
-            ]
+            try:
+                # 前回から変更なしの場合は解析、登録を行わない
+                webpage_text: Final[str | None] = self.fetch()
+                if webpage_text is not None:
+                    self._process(self.parse(webpage_text))
+            finally:
+                # 登録した災害情報と、前回までに再送待ちとなった通知を送信
+                # （ページの変更の有無、取得の成否にかかわらず、ロックを保持している間に毎回行う）
+                self._flush_outbox()
+            self._finish_run('changed')
+
+        except Exception:
+            self._logger.exception('Failed to run:')
+            self._finish_run('error')
+        finally:
+            self._save_metrics_state()
+            self._run_lock.release()
 
-            for disaster_text_info in disaster_text_info_list:
-                # 通知処理
-                self._register_disaster_text(disaster_text_info)
+    @property
+    def dispatcher(self) -> NotifyDispatcher:
+        return self._dispatcher
 
+    @property
+    def data_db_path(self) -> Path:
+        return self._data_db_path
+
+    @property
+    def run_lock(self) -> RunLock:
+        return self._run_lock
+
+    @property
+    def interval(self) -> float:
+        return self._adaptive_interval.value
+
+    # ---- CitySource（city_poller.MultiCityPoller から呼び出される処理） ----
+    def fetch(self) -> str | None:
+        # Webページを取得（変更がない場合はNone）
+        self._run = RunRecorder(self._metrics, NagaokaMain.name)
+        try:
+            webpage_text = self._download_page()
         except Exception:
-            pass
+            self._finish_run('error')
+            raise
+        if webpage_text is None:
+            self._adaptive_interval.update(changed=False)
+            self._finish_run('unchanged')
+        return webpage_text
+
+    def parse(self, webpage_text: str) -> list[DisasterTextInfo]:
+        # 災害情報を抜き出し、日時、地区/災害種別/災害状況のIDに解析
+        run: Final[RunRecorder] = self._current_run()
+        try:
+            with run.stage('parse'):
+                disaster_text_info_list = attach_disaster_records(
+                    self._trim_disaster_text(webpage_text), NagaokaMain.CITY_NAME
+                )
+        except Exception:
+            self._finish_run('error')
+            raise
+        run.count('parsed', len(disaster_text_info_list))
+        return disaster_text_info_list
+
+    def process(self, disaster_text_info_list: list[DisasterTextInfo]):
+        # 登録まで行い、今回のポーリングの記録を終える（通知は常駐中のディスパッチャーが行う）
+        try:
+            self._process(disaster_text_info_list)
+        except Exception:
+            self._finish_run('error')
+            raise
+        self._finish_run('changed')
+
+    def _process(self, disaster_text_info_list: list[DisasterTextInfo]):
+        # ページが変化したため、現在発生中の災害の有無に応じてポーリング間隔を更新
+        self._adaptive_interval.update(
+            changed=True,
+            active=any(dinfo.disaster_text_type == DisasterTextType.CURRENT for dinfo in disaster_text_info_list),
+        )
 
-    def _download_page(self) -> str:
-        # ダウンロード実行
+        # 未登録の災害情報を登録
+        run: Final[RunRecorder] = self._current_run()
+        with run.stage('dedup'):
+            new_disaster_text_info_list = self._filter_new_disaster_text(disaster_text_info_list)
+        run.count('new', len(new_disaster_text_info_list))
+
+        # 災害の状態が変化したものを通知対象として登録
+        with run.stage('register'):
+            transitions = self._incident_tracker.plan(new_disaster_text_info_list)
+            self._register_disaster_text(new_disaster_text_info_list, transitions)
+        run.count('notified', len(transitions))
+
+        # 全ての処理が成功した場合のみ、今回のページ状態を保存
+        self._commit_page_state()
+
+        # バックグラウンドで送信中のディスパッチャーに通知（送信完了は待たない）
+        if transitions:
+            self._dispatcher.wakeup()
+
+    def _download_page(self) -> str | None:
+        # 前回取得時の検証子を使って条件付きGETを行う
+        page_state: Final[PageState] = self._page_state_store.load()
+        headers: dict[str, str] = {}
+        if page_state.etag:
+            headers['If-None-Match'] = page_state.etag
+        if page_state.last_modified:
+            headers['If-Modified-Since'] = page_state.last_modified
+
+        # ダウンロード実行（本文は災害情報の区間の終わりまでチャンク単位で読み込む）
+        run: Final[RunRecorder] = self._current_run()
         res: requests.Response = requests.Response()
         try:
-            res = requests.get(NagaokaMain.SITE_URL)
-            self._logger.debug(f'{res.status_code=}')
-            res.raise_for_status()
+            with run.stage('download'), self._http_client.get(self._site_url, headers=headers, stream=True) as res:
+                self._logger.debug(f'{res.status_code=}')
+                res.raise_for_status()
+
+                # 304 Not Modified の場合は変更なし
+                if res.status_code == 304:
+                    self._logger.debug('webpage is not modified. (304)')
+                    return None
+
+                chunks: Final[Iterator[bytes]] = res.iter_content(CHUNK_SIZE_DEFAULT)
+                reader: Final[PageSectionReader] = read_page_sections(chunks, keep_raw=True)
+
+                # 終了の区切り文字列より後の残り（ページは小さい）は読み捨てる
+                # （読み切ってから閉じると接続はセッションのプールに戻り、次回のポーリングで再利用される。
+                #   読み残したまま閉じると接続は破棄される）
+                for _ in chunks:
+                    pass
         except ConnectionError:
             self._logger.exception('ConnectionError:')
             raise DownloadPageError('Faild to download webpage. (ConnectionError)')
@@ -70,110 +261,99 @@ class NagaokaMain:
         except RequestException:
             self._logger.exception('RequestException:')
             raise DownloadPageError('Faild to download webpage. (RequestException)')
+        run.observe_bytes(reader.size)
 
-        # ダウンロード成功時のテキスト整形処理
-        res.encoding = 'sjis'
-        text_data: str = unicodedata.normalize('NFKC', res.text)
-        text_data = re.sub(r'\u3000', ' ', text_data)
-        return text_data
-
-    def _trim_disaster_text(self, webpage_text: str) -> list[DisasterTextInfo]:
-        # 現在発生中の災害と終了した災害の一部（鎮圧、鎮火、消火不要、救助完了）を抜き出す
-        disaster_text_list: list[DisasterTextInfo] = []
-
-        # webpage_text をcurrentとpastに分解
-        PAT = re.compile(
-            r'.+↓現在発生している災害↓(.+)↑現在発生している災害↑.+↓過去の災害経過情報↓(.+)↑過去の災害経過情報↑.+',
-            re.DOTALL
+        # 読み込んだ範囲のダイジェストが前回と同じ場合も変更なし
+        digest: Final[str] = reader.digest
+        self._pending_page_state = PageState(
+            etag=res.headers.get('ETag'),
+            last_modified=res.headers.get('Last-Modified'),
+            digest=digest,
         )
-        m = PAT.match(webpage_text)
-        if not m:
-            raise TextAnalysisError("ダウンロードしたWebページのフォーマットが異なります。")
-
-        # 災害情報の文字列を抜き出す
-        disaster_text_list.extend(self._trim_disaster_text_current(m.group(1)))
-        disaster_text_list.extend(self._trim_disaster_text_past(m.group(2)))
-        return disaster_text_list
-
-    def _trim_disaster_text_current(self, webpage_text_current: str) -> list[DisasterTextInfo]:
-        # 現在発生中の災害を抜き出す
-        info_list = re.findall(r'(\d\d月\d\d日.+?出動しました。)', webpage_text_current, re.DOTALL)
-        return [DisasterTextInfo(dinfo, DisasterTextType.CURRENT) for dinfo in info_list]
-
-    def _trim_disaster_text_past(self, webpage_text_past: str) -> list[DisasterTextInfo]:
-        # 終了した災害の一部（鎮圧、鎮火、消火不要、救助完了）を抜き出す
-        disaster_list_past: list[DisasterTextInfo] = []
-
-        # 鎮圧、鎮火、救助完了
-        info_list = re.findall(r'(\d\d月\d\d日.+?は\d\d:\d\dに.+?しました。)', webpage_text_past)
-        disaster_list_past.extend([DisasterTextInfo(dinfo, DisasterTextType.PAST_WITH_TIME) for dinfo in info_list])
-
-        # 消火不要
-        info_list = re.findall(r'(\d\d月\d\d日.+?は消火の必要はありませんでした。)', webpage_text_past)
-        disaster_list_past.extend([DisasterTextInfo(dinfo, DisasterTextType.PAST) for dinfo in info_list])
+        if digest == page_state.digest:
+            self._logger.debug('webpage is not modified. (same digest)')
+            self._commit_page_state()
+            return None
+        self._archive_page(reader)
 
-        return disaster_list_past
+        # 災害情報の区間のみを文字列に変換、整形（区切り文字列が見つからない場合は TextAnalysisError）
+        with run.stage('decode'):
+            return reader.text()
 
-    def _is_new_disaster_text(self, disaster_text_info: DisasterTextInfo) -> bool:
+    def _archive_page(self, reader: PageSectionReader):
+        # 変換前のバイト列を保存（失敗してもポーリングは継続する）
         try:
-            # データ用DBに接続
-            with contextlib.closing(sqlite3.connect(self._data_db_path)) as conn:
-                # 都市名IDを取得
-                city_id = -1
-                with conn as cur:
-                    city_id = cur.execute(
-                        'SELECT rowid FROM t_city_name WHERE city_name=?;',
-                        ('長岡市',)
-                    ).fetchone()[0]
-                if city_id == -1:
-                    raise DbOperationError('都市ID取得エラー')
+            with self._current_run().stage('archive'):
+                self._page_archive.put(NagaokaMain.name, reader.raw, digest=reader.digest)
+        except Exception:
+            self._logger.exception('Failed to archive webpage:')
 
-                # 登録済みであるかを確認
+    def _flush_outbox(self):
+        # 送信時刻に達した未送信の通知を送信（1回で終了するため、まとめる時間は待たない）
+        # （ページに変更があり、ポーリングの記録中の場合は notify の時間として記録する）
+        if (run := self._run) is None:
+            self._dispatcher.dispatch_pending(flush=True)
+            return
+        with run.stage('notify'):
+            self._dispatcher.dispatch_pending(flush=True)
 
-            # 登録済みであるか問い合わせ
-            # sql_tmpl = 'SELECT COUNT(*) FROM t_disaster_text_nagaoka WHERE disaster_text = ?;'
+    def _current_run(self) -> RunRecorder:
+        # 実行中のポーリングの記録（fetch を経由せずに呼び出された場合は新たに開始）
+        if self._run is None:
+            self._run = RunRecorder(self._metrics, NagaokaMain.name)
+        return self._run
 
-            return True
+    def _finish_run(self, result: str):
+        # ポーリングの記録を終え、要約をログに出力してメトリクスのファイルを更新
+        if (run := self._run) is None:
+            return
+        self._run = None
+        self._logger.info(run.finish(result))
+        self._write_metrics()
 
-        except Exception as err:
-            raise err
+    def _write_metrics(self):
+        try:
+            self._metrics.write_textfile(self._metrics_textfile)
+        except OSError:
+            self._logger.exception('Failed to write metrics:')
 
-    def _register_disaster_text(self, disaster_text_info: DisasterTextInfo):
+    def _save_metrics_state(self):
         try:
-            # データ管理用DBに接続
-            conn: Final[sqlite3.Connection] = sqlite3.connect(self._data_db_path)
-            cursor: Final[sqlite3.Cursor] = conn.cursor()
+            self._metrics.save_state(self._metrics_state_path)
+        except OSError:
+            self._logger.exception('Failed to save metrics:')
 
-            # 登録
-            sql_tmpl = 'INSERT INTO t_disaster_text_nagaoka (datetime, disaster_text) VALUES (?, ?);'
-            values = (datetime.datetime.now(), disaster_text_info.disaster_text,)
-            cursor.execute(sql_tmpl, values)
+    def _commit_page_state(self):
+        # ダウンロード時に取得したページ状態を保存
+        if self._pending_page_state is None:
+            return
+        try:
+            self._page_state_store.save(self._pending_page_state)
+        except OSError:
+            self._logger.exception('Failed to save page state:')
+        self._pending_page_state = None
 
-            # DBから切断
-            conn.commit()
-            conn.close()
+    def _trim_disaster_text(self, webpage_text: str) -> list[DisasterTextInfo]:
+        # 現在発生中の災害と終了した災害の一部（鎮圧、鎮火、消火不要、救助完了）を抜き出す
+        return parse_disaster_text(webpage_text)
 
-        except Exception as err:
-            raise DbOperationError(err)
+    def _filter_new_disaster_text(self, disaster_text_info_list: list[DisasterTextInfo]) -> list[DisasterTextInfo]:
+        # 1ページ分の災害情報のうち、未登録のものをまとめて判定
+        return self._disaster_store.filter_new(disaster_text_info_list)
 
-    def _notify_to_line(self, access_token: str, message: str):
-        # メッセージの投稿を実行
-        res: requests.Response = requests.Response()
-        try:
-            headers = {'Authorization': f'Bearer {access_token}'}
-            payload = {'message': message}
-            res = requests.post(NagaokaMain.NOTIFY_URL, headers=headers, params=payload)
-            self._logger.debug(f'{res.status_code=}')
-            res.raise_for_status()
-        except ConnectionError:
-            self._logger.exception('ConnectionError:')
-            raise NotifyError('Faild to post message. (ConnectionError)')
-        except HTTPError:
-            self._logger.exception(f'HTTPError, response={res}:')
-            raise NotifyError(f'Faild to post message. (HTTPError, status_code={res.status_code})')
-        except Timeout:
-            self._logger.exception('Timeout:')
-            raise NotifyError('Faild to post message. (Timeout)')
-        except RequestException:
-            self._logger.exception('RequestException:')
-            raise NotifyError('Faild to post message. (RequestException)')
+    def _register_disaster_text(
+        self,
+        disaster_text_info_list: list[DisasterTextInfo],
+        transitions: list[IncidentTransition],
+    ):
+        # 新しい災害情報を1トランザクションでまとめて登録し、状態が変化したものの通知を
+        # 通知先のトークンごとにアウトボックスに追加（災害ごとの状態も同じトランザクションで更新する）
+        now: Final[float] = self._incident_tracker.now()
+        self._disaster_store.register(
+            disaster_text_info_list,
+            notify_list=[transition.disaster_text_info for transition in transitions],
+            token_keys=self._token_registry.recipients(NagaokaMain.name),
+            incident_rows=self._incident_tracker.incident_rows(transitions, now),
+        )
+        # 登録が成功した場合のみメモリ上の状態を更新
+        self._incident_tracker.apply(transitions, now)
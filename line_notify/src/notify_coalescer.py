@@ -0,0 +1,33 @@
+from typing import Final
+
+from line_notify.src.structures import OutboxMessage
+
+# LINE Notify のメッセージ最大文字数
+MESSAGE_MAX_LENGTH: Final[int] = 1000
+MESSAGE_SEPARATOR: Final[str] = '\n'
+TRUNCATED_SUFFIX: Final[str] = '…'
+
+
+def coalesce_messages(
+    messages: list[OutboxMessage], max_length: int = MESSAGE_MAX_LENGTH
+) -> list[list[OutboxMessage]]:
+    # 1トークン分のメッセージを古い順に、最大文字数に収まる範囲でまとめる
+    groups: list[list[OutboxMessage]] = []
+    length = 0
+    for message in sorted(messages, key=lambda m: m.outbox_id):
+        message_length = min(len(message.message), max_length)
+        if groups and length + len(MESSAGE_SEPARATOR) + message_length <= max_length:
+            groups[-1].append(message)
+            length += len(MESSAGE_SEPARATOR) + message_length
+        else:
+            groups.append([message])
+            length = message_length
+    return groups
+
+
+def build_message(group: list[OutboxMessage], max_length: int = MESSAGE_MAX_LENGTH) -> str:
+    # まとめたメッセージを1つの通知メッセージにする（単独で最大文字数を超える場合は切り詰める）
+    text = MESSAGE_SEPARATOR.join(message.message for message in group)
+    if len(text) > max_length:
+        text = text[:max_length - len(TRUNCATED_SUFFIX)] + TRUNCATED_SUFFIX
+    return text
@@ -0,0 +1,356 @@
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger, Logger
+from pathlib import Path
+from typing import Callable, Final
+import contextlib
+import random
+import threading
+import time
+
+import requests
+from requests import RequestException
+
+from line_notify.src.disaster_store import connect
+from line_notify.src.errors import DbOperationError
+from line_notify.src.http_client import LnHttpClient, get_http_client
+from line_notify.src.ln_config import LnConfig
+from line_notify.src.ln_metrics import MetricsRegistry, get_metrics_registry
+from line_notify.src.notify_coalescer import coalesce_messages, build_message, MESSAGE_MAX_LENGTH
+from line_notify.src.structures import DeliveryResult, OutboxMessage
+
+NOTIFY_URL: Final[str] = 'https://notify-api.line.me/api/notify'
+MAX_WORKERS_DEFAULT: Final[int] = 16
+MAX_ATTEMPTS_DEFAULT: Final[int] = 5
+BACKOFF_BASE_DEFAULT: Final[float] = 2.0
+BACKOFF_MAX_DEFAULT: Final[float] = 300.0
+CLAIM_LEASE_DEFAULT: Final[float] = 60.0
+CLAIM_LIMIT_DEFAULT: Final[int] = 1000
+POLL_INTERVAL_DEFAULT: Final[float] = 1.0
+COALESCE_WINDOW_DEFAULT: Final[float] = 5.0
+
+# 再試行しても成功しないステータス（メッセージ不正、トークン不正など）
+NO_RETRY_STATUS: Final[tuple[int, ...]] = (400, 401, 403)
+# トークンが不正、または無効化された（同じトークンの残りのメッセージも送信しない）
+INVALID_TOKEN_STATUS: Final[tuple[int, ...]] = (401, 403)
+# レート制限（試行回数に数えず、リセット時刻まで延期する）
+RATE_LIMITED_STATUS: Final[int] = 429
+
+
+def default_token_resolver(token_key: str) -> str | None:
+    # アウトボックスのトークン名からLINEアクセストークンを取得
+    getters: dict[str, Callable[[], str | None]] = {
+        'nagaoka': LnConfig.getLnLineTokenNagaoka,
+        'niigata': LnConfig.getLnLineTokenNiigata,
+    }
+    getter = getters.get(token_key)
+    return getter() if getter is not None else None
+
+
+class NotifyDispatcher:
+    """アウトボックス（t_notify_outbox）の未送信メッセージをLINE Notifyへ送信する
+
+    - トークンごとに1つのワーカーが古い順に送信し、複数トークンは並行して送信する
+      （ワーカー数は max_workers まで、多数のトークンへの同報でも1往復程度の時間で送信する）
+    - 応答の X-RateLimit-Remaining / X-RateLimit-Reset を記録し、
+      残り回数が0のトークンはリセット時刻まで送信を延期する
+    - 429（レート制限）はリセット時刻（不明な場合はバックオフ）まで延期し、試行回数には数えない
+      （レート制限が続いても通知を破棄しないため）
+    - 通信エラー、サーバーエラーはジッター付きの指数バックオフで再試行し、上限回数に達したら failed_at を記録する
+      （トークン不正などの再試行しても成功しないエラーは直ちに failed_at を記録する）
+    - 最も古い未送信メッセージの登録から coalesce_window 秒経過するまで待ち、
+      その間に登録されたメッセージを最大文字数に収まる範囲で1通にまとめて送信する
+    - 送信対象の行は next_attempt_at をリース期間だけ先に進めてから送信し、
+      複数のディスパッチャーが同じ行を重複して送信しないようにする
+      （1通ごとに送信前にリースを延長し、延長できない（他のディスパッチャーが取得した）場合は残りを送信しない）
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        token_resolver: Callable[[str], str | None] = default_token_resolver,
+        http_client: LnHttpClient | None = None,
+        notify_url: str = NOTIFY_URL,
+        max_workers: int = MAX_WORKERS_DEFAULT,
+        max_attempts: int = MAX_ATTEMPTS_DEFAULT,
+        backoff_base: float = BACKOFF_BASE_DEFAULT,
+        backoff_max: float = BACKOFF_MAX_DEFAULT,
+        claim_lease: float = CLAIM_LEASE_DEFAULT,
+        coalesce_window: float = COALESCE_WINDOW_DEFAULT,
+        max_message_length: int = MESSAGE_MAX_LENGTH,
+        logger: Logger | None = None,
+        clock: Callable[[], float] = time.time,
+        metrics: MetricsRegistry | None = None,
+    ):
+        self._db_path: Final[Path] = db_path
+        self._token_resolver: Final[Callable[[str], str | None]] = token_resolver
+        self._http_client: Final[LnHttpClient] = http_client if http_client is not None else get_http_client()
+        self._notify_url: Final[str] = notify_url
+        metrics = metrics if metrics is not None else get_metrics_registry()
+        self._post_seconds = metrics.histogram('ln_notify_post_duration_seconds', 'Duration of LINE Notify requests.')
+        self._posts = metrics.counter('ln_notify_posts_total', 'LINE Notify requests by response status.')
+        self._max_workers: Final[int] = max_workers
+        self._max_attempts: Final[int] = max_attempts
+        self._backoff_base: Final[float] = backoff_base
+        self._backoff_max: Final[float] = backoff_max
+        self._claim_lease: Final[float] = claim_lease
+        self._coalesce_window: Final[float] = coalesce_window
+        self._max_message_length: Final[int] = max_message_length
+        self._logger: Final[Logger] = logger if logger is not None else getLogger('ln.notify')
+        self._clock: Final[Callable[[], float]] = clock
+
+        # トークンごとのレート制限（送信を再開できる時刻、連続した429の回数）
+        self._blocked_until: dict[str, float] = {}
+        self._rate_limited_count: dict[str, int] = {}
+        self._blocked_until_lock: Final[threading.Lock] = threading.Lock()
+
+        self._thread: threading.Thread | None = None
+        self._stop_event: Final[threading.Event] = threading.Event()
+        self._wakeup_event: Final[threading.Event] = threading.Event()
+
+    def dispatch_pending(self, flush: bool = False) -> int:
+        # 送信時刻に達した未送信メッセージを送信し、送信に成功したメッセージ件数を返す
+        # flush=True の場合は coalesce_window を待たずに送信する（1回のポーリングで終了する場合など）
+        return sum(result.delivered for result in self.dispatch(flush))
+
+    def dispatch(self, flush: bool = False) -> list[DeliveryResult]:
+        # dispatch_pending と同じ送信を行い、トークンごとの送信結果を返す（トークン名順）
+        messages, lease_until = self._claim(0.0 if flush else self._coalesce_window)
+        if not messages:
+            return []
+
+        # トークンごとにまとめ、トークン単位で並行して送信
+        lanes: dict[str, list[OutboxMessage]] = {}
+        for message in messages:
+            lanes.setdefault(message.token_key, []).append(message)
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(lanes)), thread_name_prefix='ln-notify') as pool:
+            results = sorted(
+                pool.map(lambda lane: self._send_lane(lane, lease_until), lanes.values()),
+                key=lambda result: result.token_key
+            )
+
+        if (failed := [result.token_key for result in results if result.failed]):
+            self._logger.warning(f'Failed to deliver to some tokens. (token_key={failed})')
+        return results
+
+    def start(self, poll_interval: float = POLL_INTERVAL_DEFAULT):
+        # バックグラウンドでアウトボックスの送信を開始
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(poll_interval,), name='ln-dispatcher', daemon=True)
+        self._thread.start()
+
+    def wakeup(self):
+        # 待機中のディスパッチャーに直ちに送信させる（登録直後の呼び出し用）
+        self._wakeup_event.set()
+
+    def stop(self, timeout: float | None = None):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wakeup_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self, poll_interval: float):
+        while not self._stop_event.is_set():
+            try:
+                self.dispatch_pending()
+            except Exception:
+                self._logger.exception('Failed to dispatch notifications:')
+            self._wakeup_event.wait(poll_interval)
+            self._wakeup_event.clear()
+
+    def _claim(self, coalesce_window: float) -> tuple[list[OutboxMessage], float]:
+        # 送信対象の行のnext_attempt_atをリース期間だけ進めて取得し、(行, リースの期限) を返す
+        # （最も古い未送信メッセージが coalesce_window 秒より新しいトークンは、まとめるために待つ）
+        now = self._clock()
+        lease_until = now + self._claim_lease
+        try:
+            with contextlib.closing(connect(self._db_path)) as conn:
+                with conn as cur:
+                    rows = cur.execute(
+                        'UPDATE t_notify_outbox SET next_attempt_at=? WHERE outbox_id IN ('
+                        'SELECT outbox_id FROM t_notify_outbox '
+                        'WHERE delivered_at IS NULL AND failed_at IS NULL AND next_attempt_at<=? '
+                        'AND token_key IN ('
+                        'SELECT token_key FROM t_notify_outbox WHERE delivered_at IS NULL AND failed_at IS NULL '
+                        'GROUP BY token_key HAVING MIN(created_at)<=?'
+                        ') '
+                        'ORDER BY outbox_id LIMIT ?'
+                        ') RETURNING outbox_id, token_key, message, attempts;',
+                        (lease_until, now, now - coalesce_window, CLAIM_LIMIT_DEFAULT)
+                    ).fetchall()
+        except Exception as err:
+            raise DbOperationError(err)
+        return sorted((OutboxMessage(*row) for row in rows), key=lambda m: m.outbox_id), lease_until
+
+    def _renew_lease(self, messages: list[OutboxMessage], lease_until: float) -> float | None:
+        # 取得時のリースのままの行のみ期限を延長し、新しい期限を返す
+        # （期限切れの後に他のディスパッチャーが取得した行が1つでもある場合は延長せずNone）
+        renewed_until = self._clock() + self._claim_lease
+        try:
+            with contextlib.closing(connect(self._db_path)) as conn:
+                with conn as cur:
+                    cur.execute('BEGIN IMMEDIATE;')
+                    count = sum(
+                        cur.execute(
+                            'UPDATE t_notify_outbox SET next_attempt_at=? WHERE outbox_id=? AND next_attempt_at=? '
+                            'AND delivered_at IS NULL AND failed_at IS NULL;',
+                            (renewed_until, message.outbox_id, lease_until)
+                        ).rowcount
+                        for message in messages
+                    )
+                    if count != len(messages):
+                        cur.rollback()
+                        return None
+        except Exception as err:
+            raise DbOperationError(err)
+        return renewed_until
+
+    def _send_lane(self, messages: list[OutboxMessage], lease_until: float) -> DeliveryResult:
+        # 1トークン分のメッセージを古い順にまとめて送信
+        delivered = 0
+        failed = 0
+        last_error: str | None = None
+        token_key = messages[0].token_key
+        access_token = self._token_resolver(token_key)
+        if access_token is None:
+            last_error = f'access token is not defined. ({token_key})'
+            self._mark_failed(messages, last_error)
+            return DeliveryResult(token_key, failed=len(messages), last_error=last_error)
+
+        groups: Final[list[list[OutboxMessage]]] = coalesce_messages(messages, self._max_message_length)
+        for i, group in enumerate(groups):
+            # レート制限中の場合は残りをリセット時刻まで延期
+            blocked_until = self._get_blocked_until(token_key)
+            if blocked_until > self._clock():
+                self._reschedule([m for rest in groups[i:] for m in rest], blocked_until)
+                last_error = 'rate limited'
+                break
+
+            # 送信前に残りの行のリースを延長（長いレーンの途中でリースが切れて重複送信されないように）
+            rest_messages = [m for rest in groups[i:] for m in rest]
+            if (renewed_until := self._renew_lease(rest_messages, lease_until)) is None:
+                self._logger.warning(f'Lease expired, leaving the rest to another dispatcher. (token_key={token_key})')
+                last_error = 'lease expired'
+                break
+            lease_until = renewed_until
+
+            attempts = max(message.attempts for message in group)
+            result = self._post(token_key, access_token, build_message(group, self._max_message_length))
+            if result is None:
+                self._mark_delivered(group)
+                delivered += len(group)
+                continue
+
+            # 送信失敗（後続のメッセージも順序を保つため延期）
+            error, status_code = result
+            last_error = error
+            if status_code == RATE_LIMITED_STATUS:
+                # レート制限は試行回数を増やさずにリセット時刻まで延期
+                self._reschedule([m for rest in groups[i:] for m in rest], self._get_blocked_until(token_key), error)
+                break
+            if status_code in INVALID_TOKEN_STATUS:
+                # 同じトークンでは送信できないため、残りも送信せずに失敗とする
+                rest_messages = [m for rest in groups[i:] for m in rest]
+                self._mark_failed(rest_messages, error)
+                failed += len(rest_messages)
+                break
+            if status_code in NO_RETRY_STATUS or attempts + 1 >= self._max_attempts:
+                self._mark_failed(group, error)
+                failed += len(group)
+                continue
+            retry_at = max(self._clock() + self._backoff(attempts), self._get_blocked_until(token_key))
+            self._mark_retry(group, error, retry_at)
+            self._reschedule([m for rest in groups[i + 1:] for m in rest], retry_at)
+            break
+
+        return DeliveryResult(
+            token_key, delivered=delivered, failed=failed, deferred=len(messages) - delivered - failed,
+            last_error=last_error,
+        )
+
+    def _post(self, token_key: str, access_token: str, message: str) -> tuple[str, int | None] | None:
+        # 送信し、成功時はNone、失敗時は (エラー内容, ステータスコード（通信エラーの場合はNone）) を返す
+        try:
+            headers = {'Authorization': f'Bearer {access_token}'}
+            payload = {'message': message}
+            start = time.perf_counter()
+            res: requests.Response = self._http_client.post(self._notify_url, headers=headers, params=payload)
+            self._post_seconds.observe(time.perf_counter() - start, token_key=token_key)
+            self._posts.inc(token_key=token_key, status=str(res.status_code))
+            self._logger.debug(f'{res.status_code=}')
+        except RequestException as err:
+            self._posts.inc(token_key=token_key, status=type(err).__name__)
+            self._logger.warning(f'Failed to post message. ({type(err).__name__}, token_key={token_key})')
+            return (type(err).__name__, None)
+
+        self._update_rate_limit(token_key, res)
+        with self._blocked_until_lock:
+            if res.status_code != RATE_LIMITED_STATUS:
+                self._rate_limited_count.pop(token_key, None)
+            else:
+                # リセット時刻が不明な場合は、連続した429の回数に応じたバックオフ
+                count = self._rate_limited_count.get(token_key, 0)
+                self._rate_limited_count[token_key] = count + 1
+                self._blocked_until[token_key] = max(
+                    self._blocked_until.get(token_key, 0.0), self._clock() + self._backoff(count)
+                )
+        if res.ok:
+            return None
+        self._logger.warning(f'Failed to post message. (status_code={res.status_code}, token_key={token_key})')
+        return (f'HTTPError, status_code={res.status_code}', res.status_code)
+
+    def _update_rate_limit(self, token_key: str, res: requests.Response):
+        # レート制限ヘッダーから送信再開時刻を記録
+        try:
+            remaining = int(res.headers['X-RateLimit-Remaining'])
+            reset = float(res.headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        with self._blocked_until_lock:
+            self._blocked_until[token_key] = reset if remaining <= 0 else 0.0
+
+    def _get_blocked_until(self, token_key: str) -> float:
+        with self._blocked_until_lock:
+            return self._blocked_until.get(token_key, 0.0)
+
+    def _backoff(self, attempts: int) -> float:
+        # ジッター付き指数バックオフ[s]
+        return min(self._backoff_max, self._backoff_base * (2 ** attempts)) * random.uniform(0.5, 1.0)
+
+    def _execute(self, sql: str, params_list: list[tuple]):
+        try:
+            with contextlib.closing(connect(self._db_path)) as conn:
+                with conn as cur:
+                    cur.executemany(sql, params_list)
+        except Exception as err:
+            raise DbOperationError(err)
+
+    def _mark_delivered(self, messages: list[OutboxMessage]):
+        self._execute(
+            'UPDATE t_notify_outbox SET delivered_at=?, attempts=attempts+1, last_error=NULL WHERE outbox_id=?;',
+            [(self._clock(), message.outbox_id) for message in messages]
+        )
+
+    def _mark_retry(self, messages: list[OutboxMessage], error: str, retry_at: float):
+        self._execute(
+            'UPDATE t_notify_outbox SET attempts=attempts+1, next_attempt_at=?, last_error=? WHERE outbox_id=?;',
+            [(retry_at, error, message.outbox_id) for message in messages]
+        )
+
+    def _mark_failed(self, messages: list[OutboxMessage], error: str):
+        self._logger.error(f'Give up posting message. ({error}, outbox_id={[m.outbox_id for m in messages]})')
+        self._execute(
+            'UPDATE t_notify_outbox SET failed_at=?, attempts=attempts+1, last_error=? WHERE outbox_id=?;',
+            [(self._clock(), error, message.outbox_id) for message in messages]
+        )
+
+    def _reschedule(self, messages: list[OutboxMessage], next_attempt_at: float, error: str | None = None):
+        # 送信しなかったメッセージを延期（試行回数は増やさない、error を指定した場合は last_error に記録）
+        if messages:
+            self._execute(
+                'UPDATE t_notify_outbox SET next_attempt_at=?, last_error=IFNULL(?, last_error) WHERE outbox_id=?;',
+                [(next_attempt_at, error, message.outbox_id) for message in messages]
+            )
@@ -0,0 +1,162 @@
+from pathlib import Path
+from typing import Callable, Final
+import contextlib
+import hashlib
+import lzma
+import os
+import sqlite3
+import time
+import zlib
+
+from line_notify.src.disaster_store import BUSY_TIMEOUT_MS_DEFAULT, connect
+from line_notify.src.errors import DbOperationError
+
+INDEX_FILE_NAME: Final[str] = 'archive_index.db'
+OBJECTS_DIR_NAME: Final[str] = 'objects'
+
+# 圧縮方式（方式名 → (拡張子, 圧縮, 展開)）
+COMPRESSORS: Final[dict[str, tuple[str, Callable[[bytes], bytes], Callable[[bytes], bytes]]]] = {
+    'lzma': ('.xz', lambda data: lzma.compress(data, preset=6), lzma.decompress),
+    'zlib': ('.zz', lambda data: zlib.compress(data, 9), zlib.decompress),
+}
+COMPRESSION_DEFAULT: Final[str] = 'lzma'
+
+
+def page_digest(raw: bytes) -> str:
+    # 保存するバイト列のダイジェスト（page_sections.PageSectionReader.digest と同じ値）
+    return hashlib.sha256(raw).hexdigest()
+
+
+class PageArchive:
+    """取得したWebページ（変換、整形前のバイト列）の保存先
+
+    - 本文はダイジェストをファイル名として1度だけ圧縮して保存する（objects/<先頭2文字>/<ダイジェスト>.xz）
+    - 取得日時とダイジェストの対応は archive_index.db に記録し、期間を指定して取り出す
+    - 同じ本文を再び取得した場合は、取得日時の記録のみを追加する
+    """
+
+    def __init__(
+        self,
+        archive_dir: Path,
+        compression: str = COMPRESSION_DEFAULT,
+        busy_timeout_ms: int = BUSY_TIMEOUT_MS_DEFAULT,
+    ):
+        if compression not in COMPRESSORS:
+            raise ValueError(f'unknown compression. ({compression})')
+        self._archive_dir: Final[Path] = archive_dir
+        self._compression: Final[str] = compression
+        self._busy_timeout_ms: Final[int] = busy_timeout_ms
+        self._initialized: bool = False
+
+    @property
+    def archive_dir(self) -> Path:
+        return self._archive_dir
+
+    def put(self, source: str, raw: bytes, fetched_at: float | None = None, digest: str | None = None) -> str:
+        # 取得したWebページを保存し、ダイジェストを返す
+        if fetched_at is None:
+            fetched_at = time.time()
+        if digest is None:
+            digest = page_digest(raw)
+
+        try:
+            with contextlib.closing(self._connect()) as conn:
+                with conn as cur:
+                    # 保存済みの本文は書き込まない（ファイルが失われていた場合のみ書き直す）
+                    stored = cur.execute('SELECT compression FROM t_page_object WHERE digest=?;', (digest,)).fetchone()
+                    if stored is None or not self._object_path(digest, stored[0]).exists():
+                        stored_size = self._write_object(digest, raw)
+                        cur.execute(
+                            'INSERT OR REPLACE INTO t_page_object (digest, compression, size, stored_size) '
+                            'VALUES (?, ?, ?, ?);',
+                            (digest, self._compression, len(raw), stored_size)
+                        )
+                    cur.execute(
+                        'INSERT INTO t_page_snapshot (source, fetched_at, digest) VALUES (?, ?, ?);',
+                        (source, fetched_at, digest)
+                    )
+        except OSError:
+            raise
+        except Exception as err:
+            raise DbOperationError(err)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        # ダイジェストに対応する本文（存在しない場合は KeyError）
+        try:
+            with contextlib.closing(self._connect()) as conn:
+                row = conn.execute('SELECT compression FROM t_page_object WHERE digest=?;', (digest,)).fetchone()
+        except Exception as err:
+            raise DbOperationError(err)
+        if row is None:
+            raise KeyError(digest)
+        return COMPRESSORS[row[0]][2](self._object_path(digest, row[0]).read_bytes())
+
+    def snapshots(
+        self, source: str, since: float | None = None, until: float | None = None
+    ) -> list[tuple[float, str]]:
+        # 期間内（since <= 取得日時 < until）に取得したページの (取得日時, ダイジェスト)、取得日時順
+        try:
+            with contextlib.closing(self._connect()) as conn:
+                return conn.execute(
+                    'SELECT fetched_at, digest FROM t_page_snapshot '
+                    'WHERE source=? AND fetched_at>=? AND fetched_at<? ORDER BY fetched_at, snapshot_id;',
+                    (source, since if since is not None else float('-inf'),
+                     until if until is not None else float('inf'))
+                ).fetchall()
+        except Exception as err:
+            raise DbOperationError(err)
+
+    def stats(self) -> dict[str, int]:
+        # 取得回数、保存した本文の数、展開後/保存時のバイト数
+        try:
+            with contextlib.closing(self._connect()) as conn:
+                snapshots = conn.execute('SELECT COUNT(*) FROM t_page_snapshot;').fetchone()[0]
+                objects, size, stored_size = conn.execute(
+                    'SELECT COUNT(*), IFNULL(SUM(size), 0), IFNULL(SUM(stored_size), 0) FROM t_page_object;'
+                ).fetchone()
+        except Exception as err:
+            raise DbOperationError(err)
+        return {'snapshots': snapshots, 'objects': objects, 'size': size, 'stored_size': stored_size}
+
+    def _object_path(self, digest: str, compression: str) -> Path:
+        return self._archive_dir / OBJECTS_DIR_NAME / digest[:2] / f'{digest}{COMPRESSORS[compression][0]}'
+
+    def _write_object(self, digest: str, raw: bytes) -> int:
+        # 一時ファイルに書き込んでから置き換え、書き込み途中のファイルが読まれないようにする
+        path = self._object_path(digest, self._compression)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = COMPRESSORS[self._compression][1](raw)
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def _connect(self) -> sqlite3.Connection:
+        # 索引DBに接続（初回接続時にテーブルを作成）
+        self._archive_dir.mkdir(parents=True, exist_ok=True)
+        conn = connect(self._archive_dir / INDEX_FILE_NAME, self._busy_timeout_ms)
+        if not self._initialized:
+            with conn as cur:
+                cur.execute(
+                    'CREATE TABLE IF NOT EXISTS t_page_object (\n'
+                    'digest TEXT PRIMARY KEY,\n'
+                    'compression TEXT NOT NULL,\n'
+                    'size INTEGER NOT NULL,\n'
+                    'stored_size INTEGER NOT NULL\n'
+                    ') WITHOUT ROWID;'
+                )
+                cur.execute(
+                    'CREATE TABLE IF NOT EXISTS t_page_snapshot (\n'
+                    'snapshot_id INTEGER PRIMARY KEY,\n'
+                    'source TEXT NOT NULL,\n'
+                    'fetched_at REAL NOT NULL,\n'
+                    'digest TEXT NOT NULL\n'
+                    ');'
+                )
+                cur.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_t_page_snapshot_source_fetched_at '
+                    'ON t_page_snapshot (source, fetched_at);'
+                )
+            self._initialized = True
+        return conn
@@ -0,0 +1,131 @@
+from typing import Final, Iterable
+import hashlib
+import unicodedata
+
+from line_notify.src.disaster_text_parser import (
+    CURRENT_BEGIN_MARKER, CURRENT_END_MARKER, PAST_BEGIN_MARKER, PAST_END_MARKER
+)
+from line_notify.src.errors import TextAnalysisError
+
+# Webページの文字コード
+PAGE_ENCODING: Final[str] = 'sjis'
+CHUNK_SIZE_DEFAULT: Final[int] = 4096
+
+# 区切り文字列（Shift_JISのバイト列）
+MARKERS: Final[tuple[bytes, bytes, bytes, bytes]] = tuple(
+    marker.encode(PAGE_ENCODING)
+    for marker in (CURRENT_BEGIN_MARKER, CURRENT_END_MARKER, PAST_BEGIN_MARKER, PAST_END_MARKER)
+)
+
+
+def normalize_section(section: bytes) -> str:
+    # 区間のバイト列を文字列に変換して整形（NFKC、全角空白を半角空白に置換）
+    text = section.decode(PAGE_ENCODING, errors='replace')
+    return unicodedata.normalize('NFKC', text).replace('　', ' ')
+
+
+class PageSectionReader:
+    """Webページの本文を先頭から順に読み、災害情報の2つの区間のみを取り出す
+
+    「↑過去の災害経過情報↑」が見つかった時点で読み込みを終了し、
+    文字列への変換、正規化は2つの区間のみに対して行う。
+    ダイジェストは読み込んだ範囲（ページ先頭から終了の区切り文字列まで）のバイト列から求める。
+    keep_raw=True の場合は同じ範囲のバイト列を保持する（page_archive.PageArchive への保存用）。
+    """
+
+    def __init__(self, keep_raw: bool = False):
+        self._hasher = hashlib.sha256()
+        self._raw: bytearray | None = bytearray() if keep_raw else None
+        self._buffer: bytearray = bytearray()
+        self._size: int = 0
+        # 区切り文字列を探し終えた位置（_buffer 内）、開始の区切り文字列が見つかったか
+        self._searched: int = 0
+        self._begun: bool = False
+        self._past_end: int = -1
+
+    @property
+    def completed(self) -> bool:
+        return self._past_end >= 0
+
+    @property
+    def size(self) -> int:
+        # 読み込んだバイト数
+        return self._size
+
+    @property
+    def digest(self) -> str:
+        return self._hasher.hexdigest()
+
+    @property
+    def raw(self) -> bytes:
+        # ダイジェストを求めた範囲のバイト列（keep_raw=True の場合のみ）
+        if self._raw is None:
+            raise ValueError('raw bytes are not kept.')
+        return bytes(self._raw)
+
+    def _update(self, data: bytes):
+        self._hasher.update(data)
+        if self._raw is not None:
+            self._raw += data
+
+    def feed(self, chunk: bytes) -> bool:
+        # 本文の一部を追加し、終了の区切り文字列まで読み込んだ場合はTrueを返す
+        if self.completed:
+            return True
+        self._buffer += chunk
+        self._size += len(chunk)
+
+        if not self._begun:
+            # 開始の区切り文字列より前（HTMLのヘッダー等）は保持しない
+            found = self._buffer.find(MARKERS[0], self._searched)
+            if found < 0:
+                keep = len(MARKERS[0]) - 1
+                if len(self._buffer) > keep:
+                    del self._buffer[:len(self._buffer) - keep]
+                self._searched = 0
+                self._update(chunk)
+                return False
+            del self._buffer[:found]
+            self._begun = True
+            self._searched = len(MARKERS[0])
+
+        found = self._buffer.find(MARKERS[3], self._searched)
+        if found < 0:
+            self._searched = max(self._searched, len(self._buffer) - len(MARKERS[3]) + 1)
+            self._update(chunk)
+            return False
+
+        # 終了の区切り文字列より後のバイト列はダイジェストに含めない
+        self._past_end = found
+        overrun: Final[int] = len(self._buffer) - (found + len(MARKERS[3]))
+        self._update(chunk[:len(chunk) - overrun])
+        del self._buffer[found + len(MARKERS[3]):]
+        return True
+
+    def sections(self) -> tuple[str, str]:
+        # 現在発生中の災害、過去の災害経過情報の区間の文字列
+        if not self.completed:
+            raise TextAnalysisError("ダウンロードしたWebページのフォーマットが異なります。")
+        buffer: Final[bytes] = bytes(self._buffer)
+        current_end = buffer.find(MARKERS[1], len(MARKERS[0]))
+        past_begin = buffer.find(MARKERS[2], current_end + len(MARKERS[1])) if current_end >= 0 else -1
+        if past_begin < 0 or past_begin + len(MARKERS[2]) > self._past_end:
+            raise TextAnalysisError("ダウンロードしたWebページのフォーマットが異なります。")
+        return (
+            normalize_section(buffer[len(MARKERS[0]):current_end]),
+            normalize_section(buffer[past_begin + len(MARKERS[2]):self._past_end]),
+        )
+
+    def text(self) -> str:
+        # 2つの区間を区切り文字列で囲んだ文字列（disaster_text_parser.parse_disaster_text の入力）
+        current, past = self.sections()
+        return f'{CURRENT_BEGIN_MARKER}{current}{CURRENT_END_MARKER}\n{PAST_BEGIN_MARKER}{past}{PAST_END_MARKER}'
+
+
+def read_page_sections(chunks: Iterable[bytes], keep_raw: bool = False) -> PageSectionReader:
+    # 本文を終了の区切り文字列まで読み込む（以降のチャンクは読まない）
+    reader = PageSectionReader(keep_raw)
+    for chunk in chunks:
+        if chunk and reader.feed(chunk):
+            break
+    return reader
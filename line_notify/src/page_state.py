@@ -0,0 +1,31 @@
+from dataclasses import asdict
+from pathlib import Path
+import json
+
+from line_notify.src.structures import PageState
+
+
+class PageStateStore:
+    """前回取得したWebページの検証子（ETag, Last-Modified）とダイジェストを保存する"""
+
+    def __init__(self, state_file_path: Path):
+        self._state_file_path: Path = state_file_path
+
+    def load(self) -> PageState:
+        # 保存済みの状態を読み取り（存在しない、または壊れている場合は空の状態を返す）
+        try:
+            state_data = json.loads(self._state_file_path.read_text(encoding='utf-8'))
+            return PageState(
+                etag=state_data.get('etag'),
+                last_modified=state_data.get('last_modified'),
+                digest=state_data.get('digest'),
+            )
+        except (OSError, ValueError, AttributeError):
+            return PageState()
+
+    def save(self, page_state: PageState):
+        # 一時ファイルに書き込んでから置き換え、書き込み途中の状態が読まれないようにする
+        self._state_file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._state_file_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(asdict(page_state)), encoding='utf-8')
+        tmp_path.replace(self._state_file_path)
@@ -0,0 +1,241 @@
+from logging import getLogger, Logger
+from pathlib import Path
+from typing import Callable, Final
+import contextlib
+import datetime
+import sqlite3
+import time
+
+from line_notify.src.archive_db import archive_db_path, archive_db_paths
+from line_notify.src.db_migration import DISASTER_TEXT_TABLE_CITIES
+from line_notify.src.disaster_store import BUSY_TIMEOUT_MS_DEFAULT, connect
+from line_notify.src.errors import DbOperationError
+from line_notify.src.structures import RetentionResult
+
+RETENTION_DAYS_DEFAULT: Final[int] = 90
+FINGERPRINT_DAYS_DEFAULT: Final[int] = 180
+TIME_BUDGET_DEFAULT: Final[float] = 5.0
+# 1回の PRAGMA incremental_vacuum で解放するページ数
+VACUUM_STEP_PAGES: Final[int] = 256
+# アウトボックス、災害ごとの状態を1回の DELETE で削除する行数
+PRUNE_BATCH_ROWS: Final[int] = 5000
+
+
+def _create_archive_fts(conn: sqlite3.Connection, table_name: str):
+    # アーカイブDB（archive として ATTACH 済み）の全文検索用インデックス（disaster_search.DisasterSearch）
+    # データDBと同じく災害情報テーブルを外部コンテンツとし、以降のコピーはトリガーで索引に追加する
+    # （インデックスのないアーカイブDBに作成した場合は、コピー済みの行も索引に追加する）
+    fts_name = f'{table_name}_fts'
+    if conn.execute('SELECT 1 FROM archive.sqlite_master WHERE name=?;', (fts_name,)).fetchone() is not None:
+        return
+    conn.execute(
+        f'CREATE VIRTUAL TABLE archive.{fts_name} USING fts5('
+        f"disaster_text, content='{table_name}', content_rowid='rowid', tokenize='trigram');"
+    )
+    conn.execute(f"INSERT INTO archive.{fts_name} ({fts_name}) VALUES ('rebuild');")
+    conn.execute(
+        f'CREATE TRIGGER IF NOT EXISTS archive.tr_{table_name}_fts_insert AFTER INSERT ON {table_name} '
+        f'BEGIN INSERT INTO {fts_name} (rowid, disaster_text) VALUES (new.rowid, new.disaster_text); END;'
+    )
+
+
+def _next_month(month: str) -> str:
+    year, mon = (int(value) for value in month.split('-'))
+    return f'{year + mon // 12:04}-{mon % 12 + 1:02}'
+
+
+class DataRetention:
+    """データDBの保存期間の管理
+
+    - 登録から retention_days 日を過ぎた災害情報を月ごとのアーカイブDBに移す（1か月分を1トランザクション）
+    - 移した災害情報のフィンガープリントは fingerprint_days 日まで t_recent_fingerprint に残し、重複判定に使う
+    - 送信済み/送信失敗から retention_days 日を過ぎたアウトボックスの行、
+      終了から retention_days 日を過ぎた災害ごとの状態（t_incident）は削除する
+    - 削除で空いたページは PRAGMA incremental_vacuum で少しずつ解放する（auto_vacuum=INCREMENTAL のDBのみ）
+    - 各処理は time_budget 秒で打ち切り、残りは次回に行う
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        archive_dir: Path | None = None,
+        retention_days: int = RETENTION_DAYS_DEFAULT,
+        fingerprint_days: int = FINGERPRINT_DAYS_DEFAULT,
+        busy_timeout_ms: int = BUSY_TIMEOUT_MS_DEFAULT,
+        logger: Logger | None = None,
+        clock: Callable[[], datetime.datetime] = datetime.datetime.now,
+    ):
+        if fingerprint_days < retention_days:
+            raise ValueError('fingerprint_days must be longer than retention_days.')
+        self._db_path: Final[Path] = db_path
+        self._archive_dir: Final[Path] = archive_dir if archive_dir is not None else db_path.parent / 'archive'
+        self._retention_days: Final[int] = retention_days
+        self._fingerprint_days: Final[int] = fingerprint_days
+        self._busy_timeout_ms: Final[int] = busy_timeout_ms
+        self._logger: Final[Logger] = logger if logger is not None else getLogger('ln.retention')
+        self._clock: Final[Callable[[], datetime.datetime]] = clock
+
+    @property
+    def archive_dir(self) -> Path:
+        return self._archive_dir
+
+    def run(self, time_budget: float = TIME_BUDGET_DEFAULT) -> RetentionResult:
+        # アーカイブへの移動、フィンガープリントの削除、空きページの解放を time_budget 秒以内で行う
+        deadline: Final[float] = time.monotonic() + time_budget
+        now: Final[datetime.datetime] = self._clock()
+        result = RetentionResult(moved={})
+        try:
+            with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+                conn.isolation_level = None
+                result.completed = self._move_expired(conn, now, deadline, result.moved)
+                result.pruned_fingerprints = self._prune_fingerprints(conn, now)
+                prune_completed = self._prune_delivery_state(conn, now, deadline, result)
+                vacuumed, vacuum_completed = self._incremental_vacuum(conn, deadline)
+                result.vacuumed_pages = vacuumed
+                result.completed = result.completed and prune_completed and vacuum_completed
+        except Exception as err:
+            raise DbOperationError(err)
+        if (result.moved or result.pruned_fingerprints or result.pruned_outbox or result.pruned_incidents
+                or result.vacuumed_pages):
+            self._logger.info(f'Retention: {result}')
+        return result
+
+    def convert_to_incremental(self):
+        # 既存のDBを auto_vacuum=INCREMENTAL に変更（VACUUM によりDB全体を書き直すため、停止中に1回だけ行う）
+        try:
+            with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+                conn.isolation_level = None
+                if conn.execute('PRAGMA auto_vacuum;').fetchone()[0] != 2:
+                    conn.execute('PRAGMA auto_vacuum=INCREMENTAL;')
+                    conn.execute('VACUUM;')
+        except Exception as err:
+            raise DbOperationError(err)
+
+    def archives(self) -> list[Path]:
+        # 作成済みのアーカイブDB（古い順）
+        return archive_db_paths(self._archive_dir)
+
+    def _move_expired(
+        self, conn: sqlite3.Connection, now: datetime.datetime, deadline: float, moved: dict[str, int]
+    ) -> bool:
+        # 保存期間を過ぎた災害情報を月ごとに移す（時間切れの場合は False）
+        cutoff: Final[str] = (now - datetime.timedelta(days=self._retention_days)).isoformat(' ')
+        fingerprint_cutoff: Final[str] = (now - datetime.timedelta(days=self._fingerprint_days)).isoformat(' ')
+        for table_name, city_name in DISASTER_TEXT_TABLE_CITIES.items():
+            # 登録日時のインデックスで対象の月を求める
+            months = [row[0] for row in conn.execute(
+                f'SELECT DISTINCT substr(datetime, 1, 7) FROM {table_name} WHERE datetime<? ORDER BY 1;', (cutoff,)
+            )]
+            if not months:
+                continue
+            city_id = conn.execute('SELECT rowid FROM t_city_name WHERE city_name=?;', (city_name,)).fetchone()[0]
+            columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table_name});')]
+            for month in months:
+                if time.monotonic() >= deadline:
+                    return False
+                count = self._move_month(conn, table_name, city_id, columns, month, cutoff, fingerprint_cutoff)
+                moved[month] = moved.get(month, 0) + count
+        return True
+
+    def _move_month(
+        self,
+        conn: sqlite3.Connection,
+        table_name: str,
+        city_id: int,
+        columns: list[str],
+        month: str,
+        cutoff: str,
+        fingerprint_cutoff: str,
+    ) -> int:
+        # 1か月分をアーカイブDBにコピーし、フィンガープリントを残して削除
+        # （WALモードでは2つのDBへの書き込みはDBごとにのみ不可分のため、コピー済みの行は INSERT OR IGNORE で無視し、
+        #   途中で中断した場合も次回の実行で同じ結果になるようにする）
+        path = archive_db_path(self._archive_dir, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        column_list = ', '.join(columns)
+        where = 'datetime>=? AND datetime<?'
+        params = (month, min(_next_month(month), cutoff))
+
+        conn.execute('ATTACH DATABASE ? AS archive;', (str(path),))
+        try:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS archive.{table_name} AS SELECT * FROM main.{table_name} WHERE 0;')
+            conn.execute(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_{table_name}_text_hash ON {table_name} (text_hash);'
+            )
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS archive.idx_{table_name}_occurred_at ON {table_name} (occurred_at);'
+            )
+            _create_archive_fts(conn, table_name)
+            conn.execute('BEGIN IMMEDIATE;')
+            try:
+                conn.execute(
+                    f'INSERT OR IGNORE INTO archive.{table_name} ({column_list}) '
+                    f'SELECT {column_list} FROM main.{table_name} WHERE {where};',
+                    params
+                )
+                conn.execute(
+                    'INSERT OR REPLACE INTO main.t_recent_fingerprint (city_id, text_hash, registered_at) '
+                    f'SELECT ?, text_hash, datetime FROM main.{table_name} WHERE {where} AND datetime>=?;',
+                    (city_id, *params, fingerprint_cutoff)
+                )
+                count = conn.execute(f'DELETE FROM main.{table_name} WHERE {where};', params).rowcount
+                conn.execute('COMMIT;')
+            except Exception:
+                conn.execute('ROLLBACK;')
+                raise
+        finally:
+            conn.execute('DETACH DATABASE archive;')
+        return count
+
+    def _prune_fingerprints(self, conn: sqlite3.Connection, now: datetime.datetime) -> int:
+        # 重複判定に使わなくなったフィンガープリントを削除
+        fingerprint_cutoff = (now - datetime.timedelta(days=self._fingerprint_days)).isoformat(' ')
+        conn.execute('BEGIN IMMEDIATE;')
+        count = conn.execute(
+            'DELETE FROM t_recent_fingerprint WHERE registered_at<?;', (fingerprint_cutoff,)
+        ).rowcount
+        conn.execute('COMMIT;')
+        return count
+
+    def _prune_delivery_state(
+        self, conn: sqlite3.Connection, now: datetime.datetime, deadline: float, result: RetentionResult
+    ) -> bool:
+        # 送信を終えたアウトボックスの行と終了した災害の状態を PRUNE_BATCH_ROWS 行ずつ削除（時間切れの場合は False）
+        # （時刻はいずれもUNIX時間[s]、未送信の行と対応中の災害は削除しない）
+        cutoff: Final[float] = (now - datetime.timedelta(days=self._retention_days)).timestamp()
+        for sql, params, field in (
+            (
+                'DELETE FROM t_notify_outbox WHERE outbox_id IN (SELECT outbox_id FROM t_notify_outbox '
+                'WHERE delivered_at<? OR failed_at<? LIMIT ?);',
+                (cutoff, cutoff, PRUNE_BATCH_ROWS),
+                'pruned_outbox',
+            ),
+            (
+                'DELETE FROM t_incident WHERE incident_key IN (SELECT incident_key FROM t_incident '
+                'WHERE closed_at<? LIMIT ?);',
+                (cutoff, PRUNE_BATCH_ROWS),
+                'pruned_incidents',
+            ),
+        ):
+            while True:
+                if time.monotonic() >= deadline:
+                    return False
+                conn.execute('BEGIN IMMEDIATE;')
+                count = conn.execute(sql, params).rowcount
+                conn.execute('COMMIT;')
+                setattr(result, field, getattr(result, field) + count)
+                if count < PRUNE_BATCH_ROWS:
+                    break
+        return True
+
+    def _incremental_vacuum(self, conn: sqlite3.Connection, deadline: float) -> tuple[int, bool]:
+        # 空きページを VACUUM_STEP_PAGES ずつ解放し、(解放したページ数, 全て解放したか) を返す
+        if conn.execute('PRAGMA auto_vacuum;').fetchone()[0] != 2:
+            return 0, True
+        vacuumed = 0
+        while (free_pages := conn.execute('PRAGMA freelist_count;').fetchone()[0]) > 0:
+            if time.monotonic() >= deadline:
+                return vacuumed, False
+            conn.execute(f'PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});').fetchall()
+            vacuumed += min(free_pages, VACUUM_STEP_PAGES)
+        return vacuumed, True
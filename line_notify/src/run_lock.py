@@ -0,0 +1,131 @@
+from dataclasses import asdict
+from logging import Logger
+from pathlib import Path
+from typing import Callable, Final
+import fcntl
+import json
+import os
+import socket
+import time
+
+from line_notify.src.ln_metrics import MetricsRegistry, record_skipped_run
+from line_notify.src.structures import RunLockHolder
+
+# 保持時間がこれを超えたロックは停止の疑いがある（stale）とみなす[s]
+STALE_AFTER_DEFAULT: Final[float] = 600.0
+
+
+class RunLock:
+    """取得元ごとの実行ロック（ロックファイルの fcntl.flock）
+
+    - acquire はブロックせず、他のプロセスが保持している場合は False を返す
+    - 取得したプロセスはロックファイルに pid、ホスト名、取得日時を書き、解放時に空にする
+    - 保持したままプロセスが終了した場合はOSがロックを解放するため、次の取得で回復する
+      （ロックファイルが空でない場合は前回の異常終了として recovered に残す）
+    - stale_after 秒を超えて保持されているロックは is_stale で判定する（停止したポーリングの検知用）
+    """
+
+    def __init__(
+        self,
+        lock_path: Path,
+        stale_after: float = STALE_AFTER_DEFAULT,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._lock_path: Final[Path] = lock_path
+        self._stale_after: Final[float] = stale_after
+        self._clock: Final[Callable[[], float]] = clock
+        self._fd: int | None = None
+        self._recovered: RunLockHolder | None = None
+
+    @property
+    def lock_path(self) -> Path:
+        return self._lock_path
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    @property
+    def recovered(self) -> RunLockHolder | None:
+        # 直前の acquire で見つかった、解放されずに終了したプロセスの情報
+        return self._recovered
+
+    def acquire(self) -> bool:
+        # ロックを取得（他のプロセスが保持している場合は False）
+        if self._fd is not None:
+            raise RuntimeError(f'{self._lock_path} is already locked by this instance.')
+        self._lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except BaseException:
+            os.close(fd)
+            raise
+
+        # ロックファイルは置き換えずに書き換える（flock はファイルの実体に対して行われるため）
+        self._recovered = _parse_holder(os.pread(fd, 4096, 0))
+        holder = RunLockHolder(pid=os.getpid(), host=socket.gethostname(), acquired_at=self._clock())
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, json.dumps(asdict(holder)).encode('utf-8'), 0)
+        self._fd = fd
+        return True
+
+    def release(self):
+        # ロックファイルを空にしてから解放（取得していない場合は何もしない）
+        if (fd := self._fd) is None:
+            return
+        self._fd = None
+        try:
+            os.ftruncate(fd, 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def holder(self) -> RunLockHolder | None:
+        # ロックファイルに書かれた保持者（保持されていない、または読み取れない場合は None）
+        try:
+            return _parse_holder(self._lock_path.read_bytes())
+        except OSError:
+            return None
+
+    def held_for(self, holder: RunLockHolder) -> float:
+        # 保持者がロックを取得してからの経過時間[s]
+        return self._clock() - holder.acquired_at
+
+    def is_stale(self, holder: RunLockHolder) -> bool:
+        return self.held_for(holder) > self._stale_after
+
+
+def _parse_holder(data: bytes) -> RunLockHolder | None:
+    if not data:
+        return None
+    try:
+        holder_data = json.loads(data.decode('utf-8'))
+        return RunLockHolder(
+            pid=int(holder_data['pid']), host=str(holder_data['host']), acquired_at=float(holder_data['acquired_at'])
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def acquire_or_skip(lock: RunLock, source: str, registry: MetricsRegistry, logger: Logger) -> bool:
+    # ロックを取得し、取得できない場合は実行しなかった回としてメトリクスに記録
+    # （保持時間が stale_after を超えている場合は、停止したポーリングの疑いとして警告する）
+    if lock.acquire():
+        if (recovered := lock.recovered) is not None:
+            logger.warning(f'Recovered run lock left by pid {recovered.pid} on {recovered.host}. ({source})')
+        return True
+    holder = lock.holder()
+    if holder is not None and lock.is_stale(holder):
+        logger.warning(
+            f'Run lock is stale: held by pid {holder.pid} on {holder.host} for '
+            f'{lock.held_for(holder):.0f}s. Skipped. ({source})'
+        )
+        record_skipped_run(registry, source, 'stale')
+    else:
+        logger.info(f'Another run is in progress. Skipped. ({source})')
+        record_skipped_run(registry, source, 'locked')
+    return False
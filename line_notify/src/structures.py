@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from enum import Enum, auto
 from pathlib import Path
+import datetime
 import yaml
 import os
 
@@ -11,10 +12,101 @@ class DisasterTextType(Enum):
     PAST_WITH_TIME = auto()
 
 
+class RunMode(Enum):
+    # 実行方法（CRON: cron で1回ずつ起動、DAEMON: ln_daemon で常駐）
+    CRON = auto()
+    DAEMON = auto()
+
+
+class OverlapPolicy(Enum):
+    # ポーリングが間隔を超えた場合の扱い（SKIP: 超過中の回は実行しない、COALESCE: 超過中の回を1回にまとめて直ちに実行）
+    SKIP = auto()
+    COALESCE = auto()
+
+
+@dataclass(frozen=True, slots=True)
+class DisasterRecord:
+    # 災害情報文字列を解析した結果（IDは db_master_data.yaml のマスターデータのrowid）
+    occurred_at: datetime.datetime
+    location: str
+    district_id: int
+    category_id: int
+    status_id: int
+    # 鎮圧、鎮火、救助完了の時刻（それ以外はNone）
+    status_time: datetime.time | None = None
+
+
 @dataclass
 class DisasterTextInfo:
     disaster_text: str
     disaster_text_type: DisasterTextType
+    record: DisasterRecord | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class IncidentTransition:
+    # 災害（出動から鎮火等まで）の状態変化（incident_key がNoneの場合は解析できなかった災害情報）
+    incident_key: str | None
+    disaster_text_info: DisasterTextInfo
+    status_id: int | None = None
+    closed: bool = False
+
+
+@dataclass
+class OutboxMessage:
+    outbox_id: int
+    token_key: str
+    message: str
+    attempts: int
+
+
+@dataclass(frozen=True, slots=True)
+class DeliveryResult:
+    # 1トークン分の送信結果（NotifyDispatcher.dispatch の戻り値、件数はアウトボックスの行数）
+    token_key: str
+    delivered: int = 0
+    failed: int = 0
+    deferred: int = 0
+    last_error: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    # 災害情報の検索結果（registered_at は登録日時、occurred_at は解析できなかった場合None）
+    # archive はアーカイブDBの月（YYYY-MM、データDBの場合None）、rowid はそのDB内の rowid
+    rowid: int
+    registered_at: str
+    occurred_at: str | None
+    disaster_text: str
+    archive: str | None = None
+
+
+@dataclass
+class RetentionResult:
+    # 保存期間の処理結果（moved は月（YYYY-MM）ごとのアーカイブに移した行数）
+    moved: dict[str, int]
+    pruned_fingerprints: int = 0
+    # 送信済み/送信失敗から保存期間を過ぎたアウトボックスの行、終了から保存期間を過ぎた災害ごとの状態
+    pruned_outbox: int = 0
+    pruned_incidents: int = 0
+    vacuumed_pages: int = 0
+    # 時間内に全ての処理を終えたか（False の場合は次回に続きを行う）
+    completed: bool = True
+
+
+@dataclass(frozen=True, slots=True)
+class RunLockHolder:
+    # 実行ロックを保持しているプロセス（ロックファイルに書かれた情報、日時はUNIX時間）
+    pid: int
+    host: str
+    acquired_at: float
+
+
+@dataclass
+class PageState:
+    etag: str | None = None
+    last_modified: str | None = None
+    digest: str | None = None
 
 
 class MainClassSetting:
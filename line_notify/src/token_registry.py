@@ -0,0 +1,81 @@
+from pathlib import Path
+from typing import Callable, Final
+import contextlib
+import threading
+import time
+
+from line_notify.src.disaster_store import BUSY_TIMEOUT_MS_DEFAULT, connect
+from line_notify.src.errors import DbOperationError
+
+# t_token の変更を確認する最短の間隔[s]（1回のポーリング内では読み込み済みのトークンを使う）
+REFRESH_INTERVAL_DEFAULT: Final[float] = 1.0
+
+# 通知先のトークン名の区切り（'nagaoka' と 'nagaoka.<グループ名>' が長岡市の通知先）
+GROUP_SEPARATOR: Final[str] = '.'
+
+
+class TokenRegistry:
+    """データDBの t_token に登録された通知先トークン
+
+    トークンの一覧はプロセス内にキャッシュし、t_token_version（t_token のトリガーで更新）が
+    変化した場合のみ読み込み直す。変更の確認は refresh_interval 秒に1回とする。
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        fallback: Callable[[str], str | None] | None = None,
+        refresh_interval: float = REFRESH_INTERVAL_DEFAULT,
+        busy_timeout_ms: int = BUSY_TIMEOUT_MS_DEFAULT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        # fallback: t_token に登録されていないトークン名のアクセストークンを取得（.env の設定値など）
+        self._db_path: Final[Path] = db_path
+        self._fallback: Final[Callable[[str], str | None] | None] = fallback
+        self._refresh_interval: Final[float] = refresh_interval
+        self._busy_timeout_ms: Final[int] = busy_timeout_ms
+        self._clock: Final[Callable[[], float]] = clock
+        self._tokens: dict[str, str] = {}
+        self._version: int | None = None
+        self._checked_at: float | None = None
+        self._lock: Final[threading.Lock] = threading.Lock()
+
+    def tokens(self) -> dict[str, str]:
+        # トークン名 → アクセストークン（t_token が変更されていた場合は読み込み直す）
+        with self._lock:
+            now = self._clock()
+            if self._checked_at is None or now - self._checked_at >= self._refresh_interval:
+                self._refresh()
+                self._checked_at = now
+            return self._tokens
+
+    def recipients(self, source: str) -> list[str]:
+        # 通知元（'nagaoka' など）の通知先トークン名（t_token に登録がない場合は通知元の名前のみ）
+        prefix = source + GROUP_SEPARATOR
+        keys = sorted(key for key in self.tokens() if key == source or key.startswith(prefix))
+        return keys if keys else [source]
+
+    def resolve(self, token_key: str) -> str | None:
+        # トークン名からアクセストークンを取得（NotifyDispatcher の token_resolver）
+        if (token := self.tokens().get(token_key)):
+            return token
+        return self._fallback(token_key) if self._fallback is not None else None
+
+    def invalidate(self):
+        # 次回の参照時に t_token を読み込み直す
+        with self._lock:
+            self._version = None
+            self._checked_at = None
+
+    def _refresh(self):
+        try:
+            with contextlib.closing(connect(self._db_path, self._busy_timeout_ms)) as conn:
+                version = conn.execute('SELECT version FROM t_token_version WHERE id=1;').fetchone()[0]
+                if version == self._version:
+                    return
+                rows = conn.execute('SELECT token_key, token_value FROM t_token;').fetchall()
+        except Exception as err:
+            raise DbOperationError(err)
+        # 参照中の辞書は変更せず置き換える（送信中のワーカーに影響しない）
+        self._tokens = {key: value for key, value in rows if value}
+        self._version = version
@@ -0,0 +1,30 @@
+import pytest
+
+from line_notify.src.adaptive_interval import AdaptiveInterval
+
+
+def test_update():
+    now = [0.0]
+    interval = AdaptiveInterval(active_interval=10, normal_interval=60, quiet_interval=300, quiet_after=600,
+                                clock=lambda: now[0])
+    assert interval.value == 60
+
+    # 現在発生中の災害がある間は短い間隔
+    assert interval.update(changed=True, active=True) == 10
+    now[0] = 100
+    assert interval.update(changed=False) == 10
+
+    # 災害が終了した直後は通常の間隔
+    assert interval.update(changed=True, active=False) == 10
+    now[0] = 200
+    assert interval.update(changed=False) == 60
+
+    # 静かな状態が続いた場合は長い間隔
+    now[0] = 800
+    assert interval.update(changed=False) == 300
+    assert interval.update(changed=True) == 10
+
+
+def test_illegal_setting():
+    with pytest.raises(ValueError):
+        AdaptiveInterval(active_interval=120, normal_interval=60)
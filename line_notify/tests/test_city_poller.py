@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from line_notify.src.city_poller import MultiCityPoller
+from line_notify.src.ln_metrics import MetricsRegistry
+from line_notify.src.run_lock import RunLock
+from line_notify.src.structures import DisasterTextInfo, DisasterTextType, OverlapPolicy
+
+
+class DummySource:
+    def __init__(self, name: str, interval: float = 0.01, fetch_wait: float = 0.0, webpage_text: str | None = 'text'):
+        self.name = name
+        self.interval = interval
+        self._fetch_wait = fetch_wait
+        self._webpage_text = webpage_text
+        self.fetch_count = 0
+        self.processed: list[list[DisasterTextInfo]] = []
+        self.process_threads: set[str] = set()
+
+    def fetch(self) -> str | None:
+        self.fetch_count += 1
+        time.sleep(self._fetch_wait)
+        return self._webpage_text
+
+    def parse(self, webpage_text: str) -> list[DisasterTextInfo]:
+        return [DisasterTextInfo(f'{self.name}:{webpage_text}', DisasterTextType.CURRENT)]
+
+    def process(self, disaster_text_info_list: list[DisasterTextInfo]):
+        self.process_threads.add(threading.current_thread().name)
+        self.processed.append(disaster_text_info_list)
+
+
+def test_run_once_concurrent():
+    # 取得は都市ごとに同時に行われ、都市数分の待ち時間が直列に積み上がらない
+    sources = [DummySource(f'city{i}', fetch_wait=0.2) for i in range(4)]
+    poller = MultiCityPoller(sources)
+    try:
+        started = time.monotonic()
+        asyncio.run(poller.run_once())
+        assert time.monotonic() - started < 0.6
+    finally:
+        poller.shutdown()
+
+    for source in sources:
+        assert source.processed == [[DisasterTextInfo(f'{source.name}:text', DisasterTextType.CURRENT)]]
+
+
+def test_run_once_not_modified():
+    # 変更なし（None）の場合はパイプラインに流さない
+    source = DummySource('city', webpage_text=None)
+    poller = MultiCityPoller([source])
+    try:
+        asyncio.run(poller.run_once())
+    finally:
+        poller.shutdown()
+    assert source.processed == []
+
+
+def test_run_and_stop():
+    fast = DummySource('fast', interval=0.01)
+    slow = DummySource('slow', interval=10.0)
+    poller = MultiCityPoller([fast, slow])
+
+    async def run_for_a_while():
+        task = asyncio.create_task(poller.run())
+        await asyncio.sleep(0.2)
+        poller.stop()
+        await asyncio.wait_for(task, timeout=1.0)
+
+    try:
+        asyncio.run(run_for_a_while())
+    finally:
+        poller.shutdown()
+
+    # 取得元ごとの間隔でポーリングされ、処理は1つのパイプラインスレッドで行われる
+    assert fast.fetch_count > slow.fetch_count == 1
+    assert len(fast.process_threads | slow.process_threads) == 1
+
+
+def test_source_name_duplicated():
+    with pytest.raises(ValueError):
+        MultiCityPoller([DummySource('city'), DummySource('city')])
+
+
+class SlowProcessSource(DummySource):
+    def __init__(self, name: str, process_wait: float):
+        super().__init__(name, interval=0.0)
+        self._process_wait = process_wait
+        self.processing = False
+        self.overlapped = False
+
+    def fetch(self) -> str | None:
+        self.overlapped = self.overlapped or self.processing
+        return super().fetch()
+
+    def process(self, disaster_text_info_list: list[DisasterTextInfo]):
+        self.processing = True
+        time.sleep(self._process_wait)
+        super().process(disaster_text_info_list)
+        self.processing = False
+
+
+def run_for(poller: MultiCityPoller, seconds: float):
+    async def run_for_a_while():
+        task = asyncio.create_task(poller.run())
+        await asyncio.sleep(seconds)
+        poller.stop()
+        await asyncio.wait_for(task, timeout=1.0)
+
+    try:
+        asyncio.run(run_for_a_while())
+    finally:
+        poller.shutdown()
+
+
+def test_one_in_flight_per_source():
+    # 登録が遅い場合も、同じ取得元の次の取得は登録の完了まで始めない
+    source = SlowProcessSource('slow', process_wait=0.05)
+    run_for(MultiCityPoller([source]), 0.3)
+    assert source.fetch_count >= 2
+    assert not source.overlapped
+
+
+@pytest.mark.parametrize('policy, skipped_per_run', [(OverlapPolicy.SKIP, 2), (OverlapPolicy.COALESCE, 1)])
+def test_overrun(policy, skipped_per_run):
+    # 間隔（0.1s）を超えたポーリング（0.25s）の間の回は、SKIP では全て、COALESCE では1回にまとめて行わない
+    source = DummySource('city', interval=0.1, fetch_wait=0.25)
+    registry = MetricsRegistry()
+    run_for(MultiCityPoller([source], overlap_policy=policy, metrics=registry), 0.6)
+
+    skipped = registry.counter('ln_runs_skipped_total', '').value(source='city', reason='overrun')
+    assert skipped == skipped_per_run * source.fetch_count
+    assert registry.counter('ln_runs_total', '').value(source='city', result='skipped') == skipped
+
+
+def test_run_locks(tmp_path):
+    # 他のプロセスが同じ取得元のロックを保持している場合はポーリングしない
+    source = DummySource('city')
+    registry = MetricsRegistry()
+    other = RunLock(tmp_path / 'city.lock')
+    assert other.acquire()
+    lock = RunLock(tmp_path / 'city.lock')
+    poller = MultiCityPoller([source], run_locks={'city': lock}, metrics=registry)
+    try:
+        asyncio.run(poller.run_once())
+        assert source.fetch_count == 0
+        assert registry.counter('ln_runs_skipped_total', '').value(source='city', reason='locked') == 1
+
+        # 解放後はポーリングし、完了後にロックを解放する
+        other.release()
+        asyncio.run(poller.run_once())
+        assert len(source.processed) == 1
+        assert not lock.locked
+    finally:
+        poller.shutdown()
@@ -0,0 +1,95 @@
+import contextlib
+import sqlite3
+
+import pytest
+import yaml
+
+from line_notify.src.db_migration import DbMigration, MASTER_DATA_PATH
+from line_notify.src.errors import DbOperationError
+
+
+def test_migrate(tmp_path):
+    db_path = tmp_path / 'db' / 'line_notify_data.db'
+    migration = DbMigration(db_path)
+    assert migration.migrate() == migration.target_version()
+    assert migration.current_version() == migration.target_version()
+
+    # マスターデータが定義順に登録されている
+    master_data = yaml.safe_load(MASTER_DATA_PATH.read_text(encoding='utf-8'))
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        rows = conn.execute('SELECT rowid, city_name FROM t_city_name ORDER BY rowid;').fetchall()
+        assert [name for _, name in rows] == master_data['data']['city_name']
+        assert conn.execute('SELECT rowid FROM t_city_name WHERE city_name=?;', ('長岡市',)).fetchone()[0] == 2
+        districts = conn.execute('SELECT district_name FROM t_district ORDER BY rowid;').fetchall()
+        assert [name for name, in districts] == master_data['data']['district']
+
+        # 重複判定は text_hash の一意インデックスを使用する
+        plan = conn.execute(
+            'EXPLAIN QUERY PLAN SELECT text_hash FROM t_disaster_text_nagaoka WHERE text_hash IN (?);', (b'x',)
+        ).fetchall()
+        assert 'idx_t_disaster_text_nagaoka_text_hash' in str(plan)
+
+
+def test_migrate_twice(tmp_path):
+    # 適用済みの場合は何もしない（マスターデータも重複しない）
+    db_path = tmp_path / 'line_notify_data.db'
+    DbMigration(db_path).migrate()
+    DbMigration(db_path).migrate()
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t_city_name;').fetchone()[0] == 2
+
+
+def test_migrate_undefined_version(tmp_path):
+    master_data = yaml.safe_load(MASTER_DATA_PATH.read_text(encoding='utf-8'))
+    master_data['admin']['system']['db_version'] = 999
+    master_data_path = tmp_path / 'db_master_data.yaml'
+    master_data_path.write_text(yaml.safe_dump(master_data, allow_unicode=True), encoding='utf-8')
+
+    with pytest.raises(DbOperationError):
+        DbMigration(tmp_path / 'line_notify_data.db', master_data_path).migrate()
+
+
+def migrate_to(db_path, tmp_path, version: int):
+    # 指定したバージョンまで移行
+    master_data = yaml.safe_load(MASTER_DATA_PATH.read_text(encoding='utf-8'))
+    master_data['admin']['system']['db_version'] = version
+    master_data_path = tmp_path / f'db_master_data_v{version}.yaml'
+    master_data_path.write_text(yaml.safe_dump(master_data, allow_unicode=True), encoding='utf-8')
+    DbMigration(db_path, master_data_path).migrate()
+
+
+def test_migrate_fts_rebuild(tmp_path):
+    # 全文検索用インデックスの作成前に登録した行も索引に追加される
+    db_path = tmp_path / 'line_notify_data.db'
+    migrate_to(db_path, tmp_path, 5)
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        with conn as cur:
+            cur.execute(
+                'INSERT INTO t_disaster_text_nagaoka (datetime, disaster_text, text_hash) VALUES (?, ?, ?);',
+                ('2023-12-21 15:20:00', '寺泊で車両火災', b'x')
+            )
+
+    DbMigration(db_path).migrate()
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT rowid FROM t_disaster_text_nagaoka_fts WHERE t_disaster_text_nagaoka_fts MATCH '\"車両火災\"';"
+        ).fetchall()
+    assert rows == [(1,)]
+
+
+def test_migrate_daily_backfill(tmp_path):
+    # 日別の件数の作成前に登録した行も集計される
+    db_path = tmp_path / 'line_notify_data.db'
+    migrate_to(db_path, tmp_path, 6)
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        with conn as cur:
+            cur.executemany(
+                'INSERT INTO t_disaster_text_nagaoka (datetime, disaster_text, text_hash, occurred_at, '
+                'district_id, category_id, status_id) VALUES (?, ?, ?, ?, ?, ?, ?);',
+                [('2023-12-21 15:20:00', f'text_{i}', bytes([i]), '2023-12-21 15:00:00', 11, 1, 1) for i in range(3)]
+            )
+
+    DbMigration(db_path).migrate()
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        rows = conn.execute('SELECT * FROM t_disaster_daily;').fetchall()
+    assert rows == [(2, '2023-12-21', 11, 1, 1, 3)]
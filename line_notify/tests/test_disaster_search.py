@@ -0,0 +1,109 @@
+import contextlib
+import datetime
+import sqlite3
+
+import pytest
+
+from line_notify.src.db_migration import DbMigration
+from line_notify.src.disaster_search import DisasterSearch
+from line_notify.src.disaster_store import DisasterTextStore
+from line_notify.src.disaster_text_parser import attach_disaster_records
+from line_notify.src.archive_db import archive_db_path
+from line_notify.src.retention import DataRetention
+from line_notify.src.structures import DisasterTextInfo, DisasterTextType
+
+DISASTER_TEXTS = (
+    '12月08日 01:06 長岡市 与板町与板 に車両火災のため消防車が出動しました。',
+    '12月08日 09:30 長岡市 与板町与板 に建物火災のため消防車が出動しました。',
+    '12月09日 10:15 長岡市 寺泊 に車両火災のため消防車が出動しました。',
+    '12月10日 22:40 長岡市 与板町与板 に救急活動のため消防車が出動しました。',
+    '12月11日 08:00 長岡市 宮栄 に車両火災のため消防車が出動しました。',
+)
+
+
+@pytest.fixture
+def data_db_path(tmp_path):
+    db_path = tmp_path / 'line_notify_data.db'
+    DbMigration(db_path).migrate()
+    store = DisasterTextStore(db_path, '長岡市', 't_disaster_text_nagaoka')
+    disaster_text_info_list = attach_disaster_records(
+        [DisasterTextInfo(dtext, DisasterTextType.CURRENT) for dtext in DISASTER_TEXTS], '長岡市',
+        datetime.datetime(2023, 12, 31)
+    )
+    for dinfo in disaster_text_info_list:
+        store.register([dinfo])
+    yield db_path
+
+
+def texts(hits) -> list[str]:
+    return [hit.disaster_text[:12] for hit in hits]
+
+
+def test_search_terms(data_db_path):
+    search = DisasterSearch(data_db_path, 't_disaster_text_nagaoka')
+    # 3文字以上は全文検索、2文字以下は LIKE で絞り込む（新しい順）
+    assert texts(search.search(['車両火災'])) == ['12月11日 08:00', '12月09日 10:15', '12月08日 01:06']
+    assert texts(search.search(['車両火災', '与板'])) == ['12月08日 01:06']
+    assert texts(search.search(['与板'])) == ['12月10日 22:40', '12月08日 09:30', '12月08日 01:06']
+    assert search.search(['ガス漏れ']) == []
+    assert search.count(['車両火災']) == 3
+
+
+def test_search_conditions(data_db_path):
+    search = DisasterSearch(data_db_path, 't_disaster_text_nagaoka')
+    since, until = datetime.datetime(2023, 12, 8, 12), datetime.datetime(2023, 12, 11)
+    assert texts(search.search([], since=since, until=until)) == ['12月10日 22:40', '12月09日 10:15']
+    assert texts(search.search(['与板'], category='救急')) == ['12月10日 22:40']
+    assert search.count([], category='火災', status='発生', district='長岡市') == 4
+
+    with pytest.raises(ValueError):
+        search.search([], category='未定義')
+
+
+def test_search_pagination(data_db_path):
+    search = DisasterSearch(data_db_path, 't_disaster_text_nagaoka')
+    for terms in ([], ['火災']):
+        first = search.search(terms, limit=2)
+        second = search.search(terms, limit=2, before=first[-1].rowid)
+        assert [hit.rowid for hit in first + second] == [hit.rowid for hit in search.search(terms, limit=4)]
+
+
+def test_search_index_sync(data_db_path):
+    # 削除した行は索引からも削除される
+    search = DisasterSearch(data_db_path, 't_disaster_text_nagaoka')
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        with conn as cur:
+            cur.execute("DELETE FROM t_disaster_text_nagaoka WHERE disaster_text LIKE '%宮栄%';")
+        assert conn.execute(
+            "SELECT COUNT(*) FROM t_disaster_text_nagaoka_fts WHERE t_disaster_text_nagaoka_fts MATCH '\"宮栄 \"';"
+        ).fetchone()[0] == 0
+    assert search.count(['車両火災']) == 2
+
+
+def test_search_archives(data_db_path):
+    # 保存期間を過ぎてアーカイブDBに移した災害情報も、データDBの後に検索される
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        with conn as cur:
+            cur.execute("UPDATE t_disaster_text_nagaoka SET datetime='2024-01-01 00:00:00' WHERE rowid<=3;")
+    retention = DataRetention(data_db_path, retention_days=90, clock=lambda: datetime.datetime(2024, 6, 1))
+    assert retention.run().moved == {'2024-01': 3}
+
+    search = DisasterSearch(data_db_path, 't_disaster_text_nagaoka')
+    assert texts(search.search(['車両火災'])) == ['12月11日 08:00', '12月09日 10:15', '12月08日 01:06']
+    assert texts(search.search(['与板'])) == ['12月10日 22:40', '12月08日 09:30', '12月08日 01:06']
+    assert search.count(['車両火災']) == 3
+
+    # ページ送りはアーカイブDBの月と rowid で続きを取得する
+    hits = search.search(['車両火災'], limit=2)
+    assert [hit.archive for hit in hits] == [None, '2024-01']
+    hits = search.search(['車両火災'], limit=2, before=hits[-1].rowid, before_archive=hits[-1].archive)
+    assert texts(hits) == ['12月08日 01:06']
+    with pytest.raises(ValueError):
+        search.search(['車両火災'], before=1, before_archive='2023-01')
+
+    # 全文検索用インデックスのないアーカイブDBは LIKE で絞り込む
+    with contextlib.closing(sqlite3.connect(archive_db_path(retention.archive_dir, '2024-01'))) as conn:
+        with conn as cur:
+            cur.execute('DROP TRIGGER tr_t_disaster_text_nagaoka_fts_insert;')
+            cur.execute('DROP TABLE t_disaster_text_nagaoka_fts;')
+    assert search.count(['車両火災', '与板']) == 1
@@ -0,0 +1,106 @@
+import contextlib
+import datetime
+import sqlite3
+
+import pytest
+
+from line_notify.src.db_migration import DbMigration
+from line_notify.src.disaster_stats import DisasterStats
+from line_notify.src.disaster_store import DisasterTextStore
+from line_notify.src.disaster_text_parser import attach_disaster_records
+from line_notify.src.retention import DataRetention
+from line_notify.src.structures import DisasterTextInfo, DisasterTextType
+
+DISASTER_TEXTS = (
+    '11月30日 23:50 長岡市 与板町与板 に車両火災のため消防車が出動しました。',
+    '12月08日 01:06 長岡市 与板町与板 に車両火災のため消防車が出動しました。',
+    '12月08日 09:30 長岡市 与板町与板 に建物火災のため消防車が出動しました。',
+    '12月08日 10:15 長岡市 寺泊 に救急活動のため消防車が出動しました。',
+    '12月08日 08:00 長岡市 宮栄 の建物火災は09:10に鎮火しました。',
+    '解析できない災害情報',
+)
+
+
+@pytest.fixture
+def data_db_path(tmp_path):
+    db_path = tmp_path / 'line_notify_data.db'
+    DbMigration(db_path).migrate()
+    store = DisasterTextStore(db_path, '長岡市', 't_disaster_text_nagaoka')
+    store.register(attach_disaster_records(
+        [
+            DisasterTextInfo(dtext, DisasterTextType.PAST_WITH_TIME if '鎮火' in dtext else DisasterTextType.CURRENT)
+            for dtext in DISASTER_TEXTS
+        ],
+        '長岡市',
+        datetime.datetime(2023, 12, 31)
+    ))
+    yield db_path
+
+
+def select_daily(db_path) -> list[tuple]:
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        return conn.execute('SELECT * FROM t_disaster_daily ORDER BY day, district_id, category_id, status_id;').fetchall()
+
+
+def test_daily_updated_on_register(data_db_path):
+    # 登録と同じトランザクションで日別の件数に加算される（解析できなかったものは対象外）
+    assert select_daily(data_db_path) == [
+        (2, '2023-11-30', 11, 1, 1, 1),
+        (2, '2023-12-08', 11, 1, 1, 2),
+        (2, '2023-12-08', 11, 1, 3, 1),
+        (2, '2023-12-08', 11, 4, 1, 1),
+    ]
+
+
+def test_report(data_db_path):
+    stats = DisasterStats(data_db_path)
+    assert stats.report('長岡市', ['month']) == [{'month': '2023-11', 'count': 1}, {'month': '2023-12', 'count': 4}]
+    assert stats.report('長岡市', ['category', 'status'], since=datetime.date(2023, 12, 1)) == [
+        {'category': '救急', 'status': '発生', 'count': 1},
+        {'category': '火災', 'status': '発生', 'count': 2},
+        {'category': '火災', 'status': '鎮火', 'count': 1},
+    ]
+    assert stats.report('長岡市', [], until=datetime.date(2023, 12, 1)) == [{'count': 1}]
+    assert stats.report('新潟市', ['district']) == []
+
+    with pytest.raises(ValueError):
+        stats.report('長岡市', ['unknown'])
+
+
+def test_rebuild(data_db_path):
+    expected = select_daily(data_db_path)
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        with conn as cur:
+            cur.execute('DELETE FROM t_disaster_daily;')
+            cur.execute("INSERT INTO t_disaster_daily VALUES (2, '2023-12-08', 11, 1, 1, 99);")
+
+    # 期間を指定した場合はその期間のみ作り直す
+    stats = DisasterStats(data_db_path)
+    assert stats.rebuild('長岡市', since=datetime.date(2023, 12, 1)) == 3
+    assert select_daily(data_db_path) == expected[1:]
+    assert stats.rebuild() == 4
+    assert select_daily(data_db_path) == expected
+
+    with pytest.raises(ValueError):
+        stats.rebuild('上越市')
+
+
+def test_rebuild_includes_archives(data_db_path):
+    # 保存期間を過ぎてアーカイブDBに移した災害情報も数える（同じ日、地区などの行は合算）
+    expected = select_daily(data_db_path)
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        with conn as cur:
+            cur.execute(
+                "UPDATE t_disaster_text_nagaoka SET datetime='2024-01-01 00:00:00' WHERE occurred_at<'2023-12-08 09:00';"
+            )
+    result = DataRetention(data_db_path, retention_days=90, clock=lambda: datetime.datetime(2024, 6, 1)).run()
+    assert result.moved == {'2024-01': 3}
+
+    stats = DisasterStats(data_db_path)
+    assert stats.rebuild() == 4
+    assert select_daily(data_db_path) == expected
+    assert stats.rebuild('長岡市', since=datetime.date(2023, 12, 1)) == 3
+    assert select_daily(data_db_path) == expected
+
+    # アーカイブDBの場所が異なる場合は数えない
+    assert DisasterStats(data_db_path, archive_dir=data_db_path.parent / 'none').rebuild() == 2
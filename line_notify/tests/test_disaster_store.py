@@ -0,0 +1,179 @@
+import contextlib
+import datetime
+import sqlite3
+
+import pytest
+
+from line_notify.src.db_migration import DbMigration
+from line_notify.src.disaster_store import DisasterTextStore, fingerprint
+from line_notify.src.disaster_text_parser import attach_disaster_records
+from line_notify.src.errors import DbOperationError
+from line_notify.src.structures import DisasterTextInfo, DisasterTextType, DisasterRecord
+
+
+@pytest.fixture
+def data_db_path(tmp_path):
+    # テスト用のデータDBを作成
+    db_path = tmp_path / 'line_notify_data.db'
+    DbMigration(db_path).migrate()
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        with conn as cur:
+            cur.execute(
+                'INSERT INTO t_disaster_text_nagaoka (datetime, disaster_text, text_hash) VALUES (?, ?, ?);',
+                ('2023-12-21 15:20:00', 'registered', fingerprint('registered'))
+            )
+    yield db_path
+
+
+def create_info_list(*disaster_texts: str) -> list[DisasterTextInfo]:
+    return [DisasterTextInfo(dtext, DisasterTextType.CURRENT) for dtext in disaster_texts]
+
+
+def test_filter_new(data_db_path):
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    # 登録済みとページ内の重複を取り除く
+    ret = store.filter_new(create_info_list('new_1', 'registered', 'new_2', 'new_1'))
+    assert ret == create_info_list('new_1', 'new_2')
+
+
+def test_filter_new_single_connection(data_db_path, mocker):
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    connect = mocker.spy(sqlite3, 'connect')
+    store.filter_new(create_info_list(*[f'new_{i}' for i in range(1200)]))
+    assert connect.call_count == 1
+
+
+def test_filter_new_cache(data_db_path, mocker):
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    assert store.filter_new(create_info_list('registered', 'new_1')) == create_info_list('new_1')
+    store.remember(create_info_list('new_1'))
+
+    # キャッシュ済みの災害情報のみの場合はDBに接続しない
+    connect = mocker.spy(sqlite3, 'connect')
+    assert store.filter_new(create_info_list('registered', 'new_1')) == []
+    connect.assert_not_called()
+
+
+def test_filter_new_cache_size(data_db_path):
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka', cache_size=2)
+    store.remember(create_info_list('a', 'b', 'c'))
+    assert store.filter_new(create_info_list('a', 'b', 'c')) == create_info_list('a')
+
+
+def test_filter_new_city_not_found(data_db_path):
+    store = DisasterTextStore(data_db_path, '上越市', 't_disaster_text_nagaoka')
+    with pytest.raises(DbOperationError):
+        store.filter_new(create_info_list('new_1'))
+
+
+def test_register(data_db_path):
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    store.register(create_info_list('new_1', 'new_2'))
+    assert store.filter_new(create_info_list('new_1', 'new_2', 'new_3')) == create_info_list('new_3')
+
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        assert conn.execute('PRAGMA journal_mode;').fetchone()[0] == 'wal'
+        rows = conn.execute('SELECT disaster_text FROM t_disaster_text_nagaoka ORDER BY rowid;').fetchall()
+    assert rows == [('registered',), ('new_1',), ('new_2',)]
+
+
+def test_register_already_registered(data_db_path):
+    # 他のプロセスが登録済みの災害情報は無視される
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    store.register(create_info_list('registered', 'new_1'))
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t_disaster_text_nagaoka;').fetchone()[0] == 2
+
+
+def test_fingerprint_normalized():
+    # 全角/半角、空白の違いは同じ災害情報として扱う
+    assert fingerprint('12月21日　15:19 長岡市  二日町') == fingerprint('12月21日 15:19 長岡市 二日町')
+    assert len(fingerprint('a')) == 16
+
+
+def test_filter_new_later_year(data_db_path):
+    # 同じ文字列でも発生年（登録時に推定）が異なる場合は新しい災害情報として扱う
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    dtext = '12月08日 01:06 長岡市 与板町与板 に車両火災のため消防車が出動しました。'
+    info_2023, info_2024 = (
+        attach_disaster_records(create_info_list(dtext), '長岡市', datetime.datetime(year, 12, 31))
+        for year in (2023, 2024)
+    )
+    store.register(info_2023)
+    assert store.filter_new(info_2023) == []
+    assert store.filter_new(info_2024) == info_2024
+    store.register(info_2024)
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t_disaster_text_nagaoka;').fetchone()[0] == 3
+
+
+def test_register_rollback(data_db_path):
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        with conn as cur:
+            cur.execute(
+                'CREATE TRIGGER tr_abort BEFORE INSERT ON t_disaster_text_nagaoka '
+                "WHEN NEW.disaster_text = 'abort' BEGIN SELECT RAISE(ABORT, 'abort'); END;"
+            )
+
+    # 途中で失敗した場合は1件も登録されない
+    with pytest.raises(DbOperationError):
+        store.register(create_info_list('new_1', 'abort'))
+    assert store.filter_new(create_info_list('new_1')) == create_info_list('new_1')
+
+
+def test_register_record(data_db_path):
+    # 解析結果は整数IDの列に登録される
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    record = DisasterRecord(datetime.datetime(2023, 12, 8, 1, 6), '長岡市 小国町横沢', 11, 1, 3, datetime.time(1, 31))
+    store.register([DisasterTextInfo('x', DisasterTextType.PAST_WITH_TIME, record)])
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        row = conn.execute(
+            'SELECT occurred_at, location, district_id, category_id, status_id, status_time '
+            "FROM t_disaster_text_nagaoka WHERE disaster_text='x';"
+        ).fetchone()
+    assert row == ('2023-12-08 01:06:00', '長岡市 小国町横沢', 11, 1, 3, '01:31')
+
+
+def test_register_notify_list(data_db_path):
+    # notify_list を指定した場合は、そのうち新たに登録したもののみアウトボックスに追加
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    store.register(create_info_list('new_1', 'new_2', 'registered'), token_keys=['nagaoka'],
+                   notify_list=create_info_list('new_2', 'registered'))
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        rows = conn.execute('SELECT message FROM t_notify_outbox;').fetchall()
+    assert rows == [('new_2',)]
+
+
+def test_register_token_keys(data_db_path):
+    # token_keys を指定した場合は、通知先のトークンごとにアウトボックスに追加
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    store.register(create_info_list('new_1', 'new_2', 'registered'), token_keys=['nagaoka', 'nagaoka.brigade_1'])
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        rows = conn.execute('SELECT token_key, message FROM t_notify_outbox ORDER BY outbox_id;').fetchall()
+    assert rows == [
+        ('nagaoka', 'new_1'), ('nagaoka', 'new_2'), ('nagaoka.brigade_1', 'new_1'), ('nagaoka.brigade_1', 'new_2'),
+    ]
+
+
+def test_register_incident_rows(data_db_path):
+    # 災害ごとの状態は災害情報、アウトボックスと同じトランザクションで更新され、失敗時は全てロールバックされる
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    incident_row = ('長岡市|2023-12-08 01:06|長岡市小国町横沢', 2, '2023-12-08 01:06:00', '長岡市 小国町横沢', 1, 1, 0.0, None)
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        with conn as cur:
+            cur.execute(
+                'CREATE TRIGGER tr_abort BEFORE INSERT ON t_incident '
+                "WHEN NEW.location = 'abort' BEGIN SELECT RAISE(ABORT, 'abort'); END;"
+            )
+    with pytest.raises(DbOperationError):
+        store.register(create_info_list('new_1'), token_keys=['nagaoka'],
+                       incident_rows=[incident_row, incident_row[:3] + ('abort',) + incident_row[4:]])
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        counts = [conn.execute(f'SELECT COUNT(*) FROM {table};').fetchone()[0]
+                  for table in ('t_disaster_text_nagaoka', 't_notify_outbox', 't_incident')]
+    assert counts == [1, 0, 0]
+
+    store.register(create_info_list('new_1'), token_keys=['nagaoka'], incident_rows=[incident_row])
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        assert conn.execute('SELECT incident_key, status_id FROM t_incident;').fetchall() == [(incident_row[0], 1)]
@@ -0,0 +1,119 @@
+import datetime
+import re
+from pathlib import Path
+
+import pytest
+
+from line_notify.src.disaster_text_parser import parse_disaster_text, parse_disaster_record, attach_disaster_records
+from line_notify.src.errors import TextAnalysisError
+from line_notify.src.master_data import get_master_data_lookup
+from line_notify.src.structures import DisasterTextInfo, DisasterTextType, DisasterRecord
+
+
+test_input_dir = Path(__file__).parent.parent.parent / 'test' / 'test_resource' / 'input'
+
+
+def test_parse_disaster_text_1():
+    testdata_in = (test_input_dir / 'webtext_2.txt').read_text(encoding='utf-8')
+
+    # 正解データ
+    dataset = (
+        ('12月21日 15:19 長岡市 二日町 に車両火災のため消防車が出動しました。', DisasterTextType.CURRENT),
+        ('12月21日 15:01 長岡市 与板町与板 にガス漏れ警戒のため消防車が出動しました。', DisasterTextType.CURRENT),
+        ('12月21日 13:48 長岡市 中島 6丁目に救急活動のため消防車が出動しました。', DisasterTextType.CURRENT),
+        ('12月21日 11:50 長岡市 小国町千谷沢 の救助活動は12:05に救助終了しました。', DisasterTextType.PAST_WITH_TIME),
+        ('12月08日 01:06 長岡市 小国町横沢 の建物火災は01:31に鎮火しました。', DisasterTextType.PAST_WITH_TIME),
+        ('12月08日 01:06 長岡市 小国町横沢 の建物火災は01:28に鎮圧しました。', DisasterTextType.PAST_WITH_TIME),
+        ('12月16日 08:39 長岡市 寺泊 薮田の病院火災は消火の必要はありませんでした。', DisasterTextType.PAST),
+    )
+    expect = [DisasterTextInfo(*arg) for arg in dataset]
+    assert expect == parse_disaster_text(testdata_in)
+
+
+def test_parse_disaster_text_2():
+    testdata_in = (test_input_dir / 'webtext_3.txt').read_text(encoding='utf-8')
+
+    # 正解データ（現在発生中の災害なし）
+    dataset = (
+        ('12月21日 11:50 長岡市 小国町千谷沢 の救助活動は12:05に救助終了しました。', DisasterTextType.PAST_WITH_TIME),
+        ('12月08日 01:06 長岡市 小国町横沢 の建物火災は01:31に鎮火しました。', DisasterTextType.PAST_WITH_TIME),
+        ('12月08日 01:06 長岡市 小国町横沢 の建物火災は01:28に鎮圧しました。', DisasterTextType.PAST_WITH_TIME),
+        ('12月16日 08:39 長岡市 寺泊 薮田の病院火災は消火の必要はありませんでした。', DisasterTextType.PAST),
+    )
+    expect = [DisasterTextInfo(*arg) for arg in dataset]
+    assert expect == parse_disaster_text(testdata_in)
+
+
+def test_parse_disaster_text_month_without_digits():
+    # 「dd月dd日」形式でない「月」は無視する
+    testdata_in = (
+        '↓現在発生している災害↓ 今月01日 12月21日 15:19 長岡市 二日町 に車両火災のため消防車が出動しました。'
+        '↑現在発生している災害↑↓過去の災害経過情報↓↑過去の災害経過情報↑'
+    )
+    expect = [DisasterTextInfo('12月21日 15:19 長岡市 二日町 に車両火災のため消防車が出動しました。', DisasterTextType.CURRENT)]
+    assert expect == parse_disaster_text(testdata_in)
+
+
+def test_parse_disaster_text_format_error():
+    # webpage_text の内容が想定と異なる場合にExceptionが発生することを確認
+    with pytest.raises(TextAnalysisError, match=re.escape('ダウンロードしたWebページのフォーマットが異なります。')):
+        parse_disaster_text('')
+    with pytest.raises(TextAnalysisError):
+        parse_disaster_text('↑過去の災害経過情報↑↓過去の災害経過情報↓↑現在発生している災害↑↓現在発生している災害↓')
+
+
+def test_parse_disaster_record():
+    lookup = get_master_data_lookup()
+    reference = datetime.datetime(2023, 12, 22, 9, 0)
+
+    # 現在発生中
+    record = parse_disaster_record(
+        DisasterTextInfo('12月21日 13:48 長岡市 中島 6丁目に救急活動のため消防車が出動しました。', DisasterTextType.CURRENT),
+        '長岡市', reference
+    )
+    assert record == DisasterRecord(
+        datetime.datetime(2023, 12, 21, 13, 48), '長岡市 中島 6丁目',
+        lookup.district_ids['長岡市'], lookup.category_ids['救急'], lookup.status_ids['発生'],
+    )
+
+    # 鎮火（場所に「の」を含む）
+    record = parse_disaster_record(
+        DisasterTextInfo('12月08日 01:06 長岡市 上の原町 の建物火災は01:31に鎮火しました。', DisasterTextType.PAST_WITH_TIME),
+        '長岡市', reference
+    )
+    assert (record.location, record.category_id, record.status_id, record.status_time) == (
+        '長岡市 上の原町', lookup.category_ids['火災'], lookup.status_ids['鎮火'], datetime.time(1, 31)
+    )
+
+    # 消火不要
+    record = parse_disaster_record(
+        DisasterTextInfo('12月16日 08:39 長岡市 寺泊 薮田の病院火災は消火の必要はありませんでした。', DisasterTextType.PAST),
+        '長岡市', reference
+    )
+    assert (record.location, record.status_id) == ('長岡市 寺泊 薮田', lookup.status_ids['消火不要'])
+
+    # 災害種別名に「の」を含む
+    record = parse_disaster_record(
+        DisasterTextInfo('12月16日 08:39 長岡市 上の原町 5丁目のその他火災は消火の必要はありませんでした。', DisasterTextType.PAST),
+        '長岡市', reference
+    )
+    assert (record.location, record.category_id) == ('長岡市 上の原町 5丁目', lookup.category_ids['火災'])
+
+
+def test_parse_disaster_record_year():
+    # 基準日時より未来となる日付は前年
+    record = parse_disaster_record(
+        DisasterTextInfo('12月31日 23:50 長岡市 二日町 に車両火災のため消防車が出動しました。', DisasterTextType.CURRENT),
+        '長岡市', datetime.datetime(2024, 1, 1, 0, 10)
+    )
+    assert record.occurred_at == datetime.datetime(2023, 12, 31, 23, 50)
+
+
+def test_attach_disaster_records():
+    testdata_in = (test_input_dir / 'webtext_2.txt').read_text(encoding='utf-8')
+    info_list = attach_disaster_records(parse_disaster_text(testdata_in), '長岡市', datetime.datetime(2023, 12, 22))
+    assert all(dinfo.record is not None for dinfo in info_list)
+
+    # 解析できない文字列は record=None
+    info_list = attach_disaster_records([DisasterTextInfo('不明', DisasterTextType.CURRENT)], '長岡市')
+    assert info_list[0].record is None
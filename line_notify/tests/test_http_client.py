@@ -0,0 +1,29 @@
+import requests
+
+from line_notify.src.http_client import LnHttpClient, get_http_client, RETRY_STATUS_LIST
+
+
+def test_timeout_default(mocker):
+    # タイムアウト指定がない場合は既定の (connect, read) タイムアウトを付与
+    client = LnHttpClient(connect_timeout=1.0, read_timeout=2.0)
+    get = mocker.patch('requests.Session.get', return_value=requests.Response())
+    post = mocker.patch('requests.Session.post', return_value=requests.Response())
+    client.get('http://example.com/')
+    client.post('https://example.com/', timeout=5.0)
+    assert get.call_args.kwargs['timeout'] == (1.0, 2.0)
+    assert post.call_args.kwargs['timeout'] == 5.0
+
+
+def test_adapter_setting():
+    client = LnHttpClient(pool_maxsize=3, max_retries=2)
+    adapter = client._session.get_adapter('https://notify-api.line.me/api/notify')
+    assert adapter._pool_maxsize == 3
+    assert adapter._pool_block is True
+    assert adapter.max_retries.total == 2
+    assert adapter.max_retries.status_forcelist == RETRY_STATUS_LIST
+    # POSTは読み取りエラー、ステータスによる再試行の対象外
+    assert 'POST' not in adapter.max_retries.allowed_methods
+
+
+def test_get_http_client_shared():
+    assert get_http_client() is get_http_client()
@@ -0,0 +1,122 @@
+import contextlib
+import datetime
+import sqlite3
+
+import pytest
+
+from line_notify.src.db_migration import DbMigration
+from line_notify.src.incident_tracker import IncidentTracker, incident_key
+from line_notify.src.master_data import get_master_data_lookup
+from line_notify.src.structures import DisasterTextInfo, DisasterTextType, DisasterRecord
+
+OCCURRED_AT = datetime.datetime(2023, 12, 8, 1, 6)
+NOW = OCCURRED_AT.timestamp() + 3600
+
+
+class FakeClock:
+    def __init__(self, now: float = NOW):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def data_db_path(tmp_path):
+    db_path = tmp_path / 'line_notify_data.db'
+    DbMigration(db_path).migrate()
+    yield db_path
+
+
+def create_info(status_name: str, location: str = '長岡市 小国町横沢', status_time: datetime.time | None = None,
+                occurred_at: datetime.datetime = OCCURRED_AT) -> DisasterTextInfo:
+    lookup = get_master_data_lookup()
+    record = DisasterRecord(occurred_at, location, 11, lookup.category_ids['火災'],
+                            lookup.status_ids[status_name], status_time)
+    return DisasterTextInfo(f'{location} {status_name} {status_time}', DisasterTextType.PAST_WITH_TIME, record)
+
+
+def test_incident_key():
+    info = create_info('発生')
+    assert incident_key('長岡市', info.record) == '長岡市|2023-12-08 01:06|長岡市小国町横沢'
+
+
+def test_plan_chronological(data_db_path):
+    tracker = IncidentTracker(data_db_path, '長岡市', clock=FakeClock())
+    fire_out = create_info('鎮火', status_time=datetime.time(1, 31))
+    under_control = create_info('鎮圧', status_time=datetime.time(1, 28))
+
+    # ページ上の順序（新しい順）に関係なく発生順に遷移する
+    transitions = tracker.plan([fire_out, under_control])
+    assert [t.disaster_text_info for t in transitions] == [under_control, fire_out]
+    assert [t.closed for t in transitions] == [False, True]
+
+
+def test_plan_no_state_change(data_db_path):
+    tracker = IncidentTracker(data_db_path, '長岡市', clock=FakeClock())
+    tracker.commit(tracker.plan([create_info('鎮圧', status_time=datetime.time(1, 28))]))
+
+    # 同じか前の状況は状態変化とみなさない
+    assert tracker.plan([create_info('発生')]) == []
+    assert tracker.plan([create_info('鎮圧', status_time=datetime.time(1, 29))]) == []
+    assert len(tracker.plan([create_info('鎮火', status_time=datetime.time(1, 31))])) == 1
+
+
+def test_plan_not_committed(data_db_path):
+    # commit() するまで状態は変わらない
+    tracker = IncidentTracker(data_db_path, '長岡市', clock=FakeClock())
+    assert len(tracker.plan([create_info('発生')])) == 1
+    assert len(tracker.plan([create_info('発生')])) == 1
+
+
+def test_plan_unparsed(data_db_path):
+    # 解析できなかった災害情報は通知対象
+    tracker = IncidentTracker(data_db_path, '長岡市', clock=FakeClock())
+    info = DisasterTextInfo('unknown', DisasterTextType.CURRENT)
+    transitions = tracker.plan([info])
+    assert [(t.incident_key, t.disaster_text_info) for t in transitions] == [(None, info)]
+    tracker.commit(transitions)
+    assert len(tracker) == 0
+
+
+def test_commit_persisted(data_db_path):
+    clock = FakeClock()
+    tracker = IncidentTracker(data_db_path, '長岡市', clock=clock)
+    tracker.commit(tracker.plan([create_info('発生'), create_info('発生', location='長岡市 大手通')]))
+    tracker.commit(tracker.plan([create_info('鎮火', status_time=datetime.time(1, 31))]))
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        rows = conn.execute('SELECT location, status_id, closed_at FROM t_incident ORDER BY location;').fetchall()
+    lookup = get_master_data_lookup()
+    assert rows == [('長岡市 大手通', lookup.status_ids['発生'], None),
+                    ('長岡市 小国町横沢', lookup.status_ids['鎮火'], NOW)]
+
+    # 別のインスタンス（再起動後）でも状態を引き継ぐ
+    restarted = IncidentTracker(data_db_path, '長岡市', clock=clock)
+    assert restarted.plan([create_info('発生', location='長岡市 大手通')]) == []
+    assert len(restarted) == 1
+    assert restarted.plan([create_info('鎮圧', status_time=datetime.time(1, 28))]) == []
+
+
+def test_closed_expired(data_db_path):
+    clock = FakeClock()
+    tracker = IncidentTracker(data_db_path, '長岡市', closed_ttl=60, clock=clock)
+    tracker.commit(tracker.plan([create_info('発生'), create_info('発生', location='長岡市 大手通')]))
+    tracker.commit(tracker.plan([create_info('鎮火', status_time=datetime.time(1, 31))]))
+    assert len(tracker) == 2
+
+    # 終了した災害は一定時間後にメモリから取り除く（DBからは参照できる）
+    clock.now += 61
+    assert tracker.plan([]) == []
+    assert len(tracker) == 1
+    assert tracker.plan([create_info('救助完了', status_time=datetime.time(1, 40))]) == []
+
+
+def test_open_expired(data_db_path):
+    # 終了しないままの災害も発生から一定時間後にメモリから取り除く
+    clock = FakeClock()
+    tracker = IncidentTracker(data_db_path, '長岡市', open_max_age=7200, clock=clock)
+    tracker.commit(tracker.plan([create_info('発生')]))
+    assert len(tracker) == 1
+    clock.now += 3601
+    tracker.plan([])
+    assert len(tracker) == 0
@@ -35,3 +35,97 @@ def test_dotenv(create_dotenv):
     assert Path('/x/y/z') == src.ln_config.LnConfig.getLnVariableDir()
     assert 'YYY' == src.ln_config.LnConfig.getLnLineTokenNagaoka()
     assert 'ZZZ' == src.ln_config.LnConfig.getLnLineTokenNiigata()
+
+
+def test_snapshot_cached(create_dotenv, mocker):
+    # ファイルが変更されていない場合は読み直さない
+    load = mocker.spy(src.ln_config.LnConfig, '_load')
+    snapshot = src.ln_config.LnConfig.snapshot()
+    assert src.ln_config.LnConfig.getLnLineTokenNagaoka() == 'YYY'
+    assert src.ln_config.LnConfig.snapshot() is snapshot
+    assert load.call_count <= 1
+
+
+def test_snapshot_reload(create_dotenv):
+    assert 'YYY' == src.ln_config.LnConfig.getLnLineTokenNagaoka()
+
+    # トークンが更新された場合は再起動せずに反映される
+    dotenv_path = Path(__file__).parent.parent / '.env'
+    dotenv_path.write_text(
+        'LN_VARIABLE_DIR=/x/y/z\n'
+        'LN_LINE_TOKEN_NAGAOKA=YYYY\n'
+        'LN_LINE_TOKEN_NIIGATA=ZZZ\n'
+    )
+    assert 'YYYY' == src.ln_config.LnConfig.getLnLineTokenNagaoka()
+
+
+def test_snapshot_env_override(create_dotenv, mocker):
+    # 環境変数の値は .env より優先し、設定、変更、削除した場合も再起動せずに反映される
+    load = mocker.spy(src.ln_config.LnConfig, '_load')
+    assert 'YYY' == src.ln_config.LnConfig.getLnLineTokenNagaoka()
+    mocker.patch.dict(os.environ, {'LN_LINE_TOKEN_NAGAOKA': 'ENV'})
+    assert 'ENV' == src.ln_config.LnConfig.getLnLineTokenNagaoka()
+    os.environ['LN_LINE_TOKEN_NAGAOKA'] = 'ENV2'
+    assert 'ENV2' == src.ln_config.LnConfig.getLnLineTokenNagaoka()
+    del os.environ['LN_LINE_TOKEN_NAGAOKA']
+    assert 'YYY' == src.ln_config.LnConfig.getLnLineTokenNagaoka()
+
+    # 変わっていない場合は読み直さない
+    count = load.call_count
+    assert 'YYY' == src.ln_config.LnConfig.getLnLineTokenNagaoka()
+    assert load.call_count == count
+
+
+def test_snapshot_config_yaml(create_empty_dotenv, tmp_path, mocker):
+    # variable_dir が .env にない場合は config.yaml の値を使用
+    config_yaml_path = tmp_path / 'config.yaml'
+    config_yaml_path.write_text('config:\n  variable_dir: /a/b/c\n  poll_interval: 30\n', encoding='utf-8')
+    mocker.patch.object(src.ln_config.LnConfig, 'config_yaml_path', config_yaml_path)
+
+    snapshot = src.ln_config.LnConfig.snapshot()
+    assert snapshot.variable_dir == Path('/a/b/c')
+    assert snapshot.settings['poll_interval'] == 30
+
+
+def test_endpoint_urls(create_empty_dotenv, mocker):
+    # 接続先URLは未設定の場合None（呼び出し側の既定値を使用）、環境変数で変更できる
+    assert src.ln_config.LnConfig.getLnSiteUrlNagaoka() is None
+    assert src.ln_config.LnConfig.getLnNotifyUrl() is None
+
+    mocker.patch.dict(os.environ, {'LN_SITE_URL_NAGAOKA': 'http://127.0.0.1:8080/saigai.html',
+                                   'LN_NOTIFY_URL': 'http://127.0.0.1:8080/api/notify'})
+    mocker.patch.object(src.ln_config.LnConfig, '_snapshot', None)
+    assert src.ln_config.LnConfig.getLnSiteUrlNagaoka() == 'http://127.0.0.1:8080/saigai.html'
+    assert src.ln_config.LnConfig.getLnNotifyUrl() == 'http://127.0.0.1:8080/api/notify'
+
+
+def test_log_settings(create_empty_dotenv, mocker):
+    mocker.patch.dict(os.environ, {'LN_LOG_QUEUE': 'true', 'LN_LOG_LEVELS': 'ln.nagaoka=info, sqlalchemy.engine=WARNING,bad'})
+    mocker.patch.object(src.ln_config.LnConfig, '_snapshot', None)
+    assert src.ln_config.LnConfig.getLnLogQueue() is True
+    assert src.ln_config.LnConfig.getLnLogLevels() == {'ln.nagaoka': 'INFO', 'sqlalchemy.engine': 'WARNING'}
+
+
+def test_archive_dir(create_empty_dotenv, mocker):
+    mocker.patch.object(src.ln_config.LnConfig, '_snapshot', None)
+    assert src.ln_config.LnConfig.getLnArchiveDir() is None
+    mocker.patch.dict(os.environ, {'LN_ARCHIVE_DIR': '/var/ln/archive'})
+    mocker.patch.object(src.ln_config.LnConfig, '_snapshot', None)
+    assert src.ln_config.LnConfig.getLnArchiveDir() == Path('/var/ln/archive')
+
+
+def test_retention_days(create_empty_dotenv, mocker):
+    mocker.patch.object(src.ln_config.LnConfig, '_snapshot', None)
+    assert src.ln_config.LnConfig.getLnRetentionDays() is None
+    mocker.patch.dict(os.environ, {'LN_RETENTION_DAYS': '90'})
+    mocker.patch.object(src.ln_config.LnConfig, '_snapshot', None)
+    assert src.ln_config.LnConfig.getLnRetentionDays() == 90
+
+
+def test_notify_coalesce_window(create_empty_dotenv, mocker):
+    # 未設定、数値でない、負の値の場合はNone（呼び出し側の既定値を使用）
+    mocker.patch.object(src.ln_config.LnConfig, '_snapshot', None)
+    assert src.ln_config.LnConfig.getLnNotifyCoalesceWindow() is None
+    for value, expected in (('2.5', 2.5), ('0', 0.0), ('abc', None), ('-1', None), ('inf', None)):
+        mocker.patch.dict(os.environ, {'LN_NOTIFY_COALESCE_WINDOW': value})
+        assert src.ln_config.LnConfig.getLnNotifyCoalesceWindow() == expected
@@ -0,0 +1,66 @@
+import os
+import signal
+import threading
+
+from line_notify.src.ln_daemon import LnDaemon
+from line_notify.src.structures import DisasterTextInfo
+
+
+class DummySource:
+    name = 'dummy'
+    interval = 0.01
+
+    def __init__(self):
+        self.fetch_count = 0
+
+    def fetch(self) -> str | None:
+        self.fetch_count += 1
+        if self.fetch_count == 3:
+            # 3回目のポーリングで終了を要求
+            os.kill(os.getpid(), signal.SIGTERM)
+        return None
+
+    def parse(self, webpage_text: str) -> list[DisasterTextInfo]:
+        return []
+
+    def process(self, disaster_text_info_list: list[DisasterTextInfo]):
+        pass
+
+
+class DummyDispatcher:
+    def __init__(self):
+        self.started = threading.Event()
+        self.stopped = threading.Event()
+
+    def start(self):
+        self.started.set()
+
+    def stop(self, timeout: float | None = None):
+        self.stopped.set()
+
+
+def test_run_until_sigterm():
+    source = DummySource()
+    dispatcher = DummyDispatcher()
+    previous_handler = signal.getsignal(signal.SIGTERM)
+
+    # SIGTERMで正常に終了し、ディスパッチャーも停止する
+    LnDaemon([source], [dispatcher]).run()
+    assert source.fetch_count == 3
+    assert dispatcher.started.is_set() and dispatcher.stopped.is_set()
+    assert signal.getsignal(signal.SIGTERM) == previous_handler
+
+
+def test_run_maintenance():
+    source = DummySource()
+    dispatcher = DummyDispatcher()
+    calls = []
+
+    def maintenance():
+        calls.append(threading.current_thread())
+        raise RuntimeError('maintenance failed')
+
+    # メンテナンスは別スレッドで実行され、失敗しても常駐は続く
+    LnDaemon([source], [dispatcher], maintenance=maintenance, maintenance_interval=0.001).run()
+    assert source.fetch_count == 3
+    assert calls and threading.main_thread() not in calls
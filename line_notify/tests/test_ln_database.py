@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import text
+
+from line_notify.src import ln_database
+
+
+@pytest.fixture
+def dispose_engines():
+    yield
+    ln_database.dispose_engines()
+
+
+def test_get_engine_cached(tmp_path, dispose_engines):
+    # 同じDBファイルパスには同じEngineを返す
+    db_file_path = tmp_path / 'db' / 'line_notify_data.db'
+    engine = ln_database.get_engine(db_file_path)
+    assert engine is ln_database.get_engine(db_file_path)
+    assert engine is not ln_database.get_engine(tmp_path / 'other.db')
+    assert engine.echo is False
+
+
+def test_get_engine_pragma(tmp_path, dispose_engines):
+    engine = ln_database.get_engine(tmp_path / 'line_notify_data.db', cache_size_kib=1024)
+    with engine.connect() as conn:
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert conn.execute(text('PRAGMA foreign_keys')).scalar() == 1
+        assert conn.execute(text('PRAGMA cache_size')).scalar() == -1024
+
+
+def test_session_factory(tmp_path, dispose_engines):
+    db_file_path = tmp_path / 'line_notify_data.db'
+    with ln_database.session_factory(db_file_path) as session:
+        session.execute(text('CREATE TABLE t_test (value INTEGER)'))
+        session.execute(text('INSERT INTO t_test VALUES (1)'))
+    with ln_database.session_factory(db_file_path) as session:
+        assert session.execute(text('SELECT value FROM t_test')).scalar() == 1
+
+
+def test_variable_dir_not_defined(mocker, dispose_engines):
+    # DBファイルパスが決定できない場合は取得時に例外（import時には何もしない）
+    mocker.patch('line_notify.src.ln_config.LnConfig.getLnVariableDir', return_value=None)
+    with pytest.raises(ValueError):
+        ln_database.get_engine()
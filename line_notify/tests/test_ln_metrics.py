@@ -0,0 +1,103 @@
+import pytest
+import requests
+
+from line_notify.src.ln_metrics import MetricsRegistry, RunRecorder
+
+
+def test_counter():
+    registry = MetricsRegistry()
+    counter = registry.counter('ln_test_total', 'Test counter.')
+    counter.inc(source='nagaoka')
+    counter.inc(2, source='nagaoka')
+    assert counter.value(source='nagaoka') == 3
+    assert registry.counter('ln_test_total', 'Test counter.') is counter
+    assert registry.render() == (
+        '# HELP ln_test_total Test counter.\n'
+        '# TYPE ln_test_total counter\n'
+        'ln_test_total{source="nagaoka"} 3\n'
+    )
+
+
+def test_histogram():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('ln_test_seconds', 'Test histogram.', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, stage='parse')
+    assert histogram.count(stage='parse') == 4
+    lines = registry.render().splitlines()
+    assert 'ln_test_seconds_bucket{stage="parse",le="0.1"} 2' in lines
+    assert 'ln_test_seconds_bucket{stage="parse",le="1"} 3' in lines
+    assert 'ln_test_seconds_bucket{stage="parse",le="+Inf"} 4' in lines
+    assert 'ln_test_seconds_sum{stage="parse"} 2.65' in lines
+    assert 'ln_test_seconds_count{stage="parse"} 4' in lines
+
+
+def test_register_kind_mismatch():
+    registry = MetricsRegistry()
+    registry.counter('ln_test', 'Test.')
+    with pytest.raises(ValueError):
+        registry.histogram('ln_test', 'Test.')
+
+
+def test_write_textfile(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter('ln_test_total', 'Test counter.').inc()
+    path = tmp_path / 'metrics' / 'line_notify.prom'
+    registry.write_textfile(path)
+    assert path.read_text(encoding='utf-8') == registry.render()
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_save_restore_state(tmp_path):
+    # 保存した値を別のレジストリ（次回起動したプロセス）で引き継ぐ
+    registry = MetricsRegistry()
+    registry.counter('ln_test_total', 'Test counter.').inc(3, source='nagaoka')
+    registry.histogram('ln_test_seconds', 'Test histogram.', buckets=(0.1, 1.0)).observe(0.5, stage='parse')
+    path = tmp_path / 'cache' / 'cron_metrics.json'
+    registry.save_state(path)
+
+    restored = MetricsRegistry()
+    assert restored.restore_state(path)
+    assert restored.render() == registry.render()
+
+    # 復元は置き換えのため、同じ値を2回復元しても増えない
+    assert restored.restore_state(path)
+    restored.counter('ln_test_total', 'Test counter.').inc(source='nagaoka')
+    assert restored.counter('ln_test_total', 'Test counter.').value(source='nagaoka') == 4
+
+    # ファイルがない、または壊れている場合は何もしない
+    assert not MetricsRegistry().restore_state(tmp_path / 'none.json')
+    path.write_text('{', encoding='utf-8')
+    assert not restored.restore_state(path)
+
+
+def test_serve():
+    registry = MetricsRegistry()
+    registry.counter('ln_test_total', 'Test counter.').inc()
+    server = registry.serve(0)
+    try:
+        res = requests.get(f'http://127.0.0.1:{server.server_address[1]}/metrics', timeout=5)
+        assert res.status_code == 200
+        assert 'ln_test_total 1' in res.text
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_run_recorder():
+    registry = MetricsRegistry()
+    run = RunRecorder(registry, 'nagaoka')
+    with run.stage('parse'):
+        pass
+    run.count('new', 3)
+    run.observe_bytes(5233)
+    summary = run.finish('changed')
+    assert summary.startswith('source=nagaoka result=changed parse=')
+    assert 'new=3' in summary and 'bytes=5233' in summary
+
+    # 2回目以降の finish は記録しない
+    run.finish('error')
+    text = registry.render()
+    assert 'ln_runs_total{result="changed",source="nagaoka"} 1' in text
+    assert 'result="error"' not in text
+    assert 'ln_stage_duration_seconds_count{source="nagaoka",stage="total"} 1' in text
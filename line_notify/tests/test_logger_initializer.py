@@ -3,7 +3,7 @@ import logging
 import pytest
 import shutil
 
-from line_notify.src.logger_initializer import initialize_logger, initialize_logger_auto
+from line_notify.src.logger_initializer import initialize_logger, initialize_logger_auto, stop_logger, _RoutedQueueHandler
 
 
 template_dir = Path(__file__).parent.parent / 'resource' / 'templates'
@@ -50,3 +50,38 @@ def test_initialize_logger_auto_2(create_temp_dir, mocker, logging_shutdown):
     with (mocker.patch('line_notify.src.ln_config.LnConfig.getLnVariableDir', return_value=None),
             pytest.raises(Exception)):
         initialize_logger_auto()
+
+
+@pytest.fixture
+def stop_queue_logger():
+    yield
+    stop_logger()
+    logging.shutdown()
+
+
+def test_initialize_logger_queue(create_temp_dir, stop_queue_logger):
+    # キュー経由の場合、各loggerにはキューへの追加のみを行うhandlerを設定し、出力はリスナースレッドで行う
+    initialize_logger(template_dir, test_dir, use_queue=True, levels={})
+    logger = logging.getLogger('ln.nagaoka')
+    assert [type(handler) for handler in logger.handlers] == [_RoutedQueueHandler]
+
+    logger.info('info message')
+    logger.debug('debug message')
+    stop_logger()
+    assert 'info message' in (test_dir / 'nagaoka.log').read_text(encoding='utf-8')
+    assert 'debug message' not in (test_dir / 'nagaoka.log').read_text(encoding='utf-8')
+    assert 'debug message' in (test_dir / 'nagaoka.debug.log').read_text(encoding='utf-8')
+    assert not (test_dir / 'niigata.log').read_text(encoding='utf-8')
+
+
+def test_initialize_logger_levels(create_temp_dir, stop_queue_logger, mocker):
+    # loggerごとのレベル（引数を指定しない場合は LN_LOG_LEVELS の設定値）
+    mocker.patch('line_notify.src.ln_config.LnConfig.getLnLogLevels', return_value={'ln.nagaoka': 'INFO'})
+    initialize_logger(template_dir, test_dir, use_queue=False)
+    assert not logging.getLogger('ln.nagaoka').isEnabledFor(logging.DEBUG)
+
+    initialize_logger(template_dir, test_dir, use_queue=False, levels={'ln.nagaoka': 'DEBUG'})
+    assert logging.getLogger('ln.nagaoka').isEnabledFor(logging.DEBUG)
+
+    with pytest.raises(ValueError):
+        initialize_logger(template_dir, test_dir, use_queue=False, levels={'ln.nagaoka': 'NOISY'})
@@ -0,0 +1,31 @@
+from line_notify.src.master_data import get_master_data_lookup
+
+
+def test_lookup_ids():
+    # IDはマスターデータの定義順（1始まり）
+    lookup = get_master_data_lookup()
+    assert lookup.city_ids == {'新潟市': 1, '長岡市': 2}
+    assert lookup.category_id('車両火災') == lookup.category_ids['火災'] == 1
+    assert lookup.category_id('ガス漏れ警戒') == lookup.category_ids['警戒']
+    assert lookup.category_id('救急活動') == lookup.category_ids['救急']
+    assert lookup.category_id('水難') == lookup.category_ids['その他']
+    assert lookup.status_id('救助終了') == lookup.status_ids['救助完了']
+    assert lookup.status_id('不明') is None
+
+
+def test_lookup_district():
+    # 地区名は最も長いものに前方一致させ、一致しない場合は市外とする
+    lookup = get_master_data_lookup()
+    assert lookup.district_id('長岡市 二日町', '長岡市') == lookup.district_ids['長岡市']
+    assert lookup.district_id('新潟市 中央区 川端町', '新潟市') == lookup.district_ids['新潟市中央区']
+    assert lookup.district_id('見附市 本町', '長岡市') == lookup.district_ids['市外（長岡市）']
+
+
+def test_lookup_district_road():
+    # 道路上の場所は 道路等（都市名）（ページの半角括弧、全角英数字はマスターデータと同じく正規化して照合する）
+    lookup = get_master_data_lookup()
+    assert lookup.district_id('長岡市 関越自動車道 上り線', '長岡市') == lookup.district_ids['道路等（長岡市）']
+    assert lookup.district_id('長岡市 国道8号', '長岡市') == lookup.district_ids['道路等（長岡市）']
+    assert lookup.district_id('北陸自動車道 中之島見附ＩＣ', '長岡市') == lookup.district_ids['道路等（長岡市）']
+    assert lookup.district_id('道路等(新潟市)', '新潟市') == lookup.district_ids['道路等（新潟市）']
+    assert lookup.district_id('新潟市 中央区 県道16号', '新潟市') == lookup.district_ids['道路等（新潟市）']
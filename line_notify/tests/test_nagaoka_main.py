@@ -44,29 +44,29 @@
 #             testdata_expect = fp.read()
 
 #         # check
-#         with mocker.patch('requests.get', return_value=res):
+#         with mocker.patch('requests.Session.get', return_value=res):
 #             ret = instance._download_page()
 #             assert testdata_expect == ret
 
 #         # ConnectionError
-#         with mocker.patch('requests.get', side_effect=requests.ConnectionError()):
+#         with mocker.patch('requests.Session.get', side_effect=requests.ConnectionError()):
 #             with pytest.raises(DownloadPageError, match=re.escape('Faild to download webpage. (ConnectionError)')):
 #                 instance._download_page()
 
 #         # Timeout
-#         with mocker.patch('requests.get', side_effect=requests.Timeout()):
+#         with mocker.patch('requests.Session.get', side_effect=requests.Timeout()):
 #             with pytest.raises(DownloadPageError, match=re.escape('Faild to download webpage. (Timeout)')):
 #                 instance._download_page()
 
 #         # RequestsException
-#         with mocker.patch('requests.get', side_effect=requests.RequestException()):
+#         with mocker.patch('requests.Session.get', side_effect=requests.RequestException()):
 #             with pytest.raises(DownloadPageError, match=re.escape('Faild to download webpage. (RequestException)')):
 #                 instance._download_page()
 
 #         # HTTPError
 #         res = requests.Response()
 #         res.status_code = 400
-#         with mocker.patch('requests.get', return_value=res):
+#         with mocker.patch('requests.Session.get', return_value=res):
 #             with pytest.raises(DownloadPageError):
 #                 instance._download_page()
 
@@ -220,3 +220,294 @@
 #             shutil.rmtree(variable_dir)
 #         if config_dir.exists():
 #             shutil.rmtree(config_dir)
+
+
+import contextlib
+import sqlite3
+import pytest
+import requests
+from pathlib import Path
+
+from line_notify.src.disaster_text_parser import attach_disaster_records
+from line_notify.src.errors import DbOperationError
+from line_notify.src.ln_metrics import MetricsRegistry
+from line_notify.src.nagaoka_main import NagaokaMain
+from line_notify.src.notify_dispatcher import COALESCE_WINDOW_DEFAULT
+from line_notify.src.page_sections import read_page_sections
+from line_notify.src.run_lock import RunLock
+from line_notify.src.structures import DisasterTextInfo, DisasterTextType, PageState
+
+
+test_input_dir = Path(__file__).parent.parent.parent / 'test' / 'test_resource' / 'input'
+
+
+@pytest.fixture
+def nagaoka_instance(tmp_path, mocker, monkeypatch):
+    # 設定値（環境変数）、loggerの初期化を置き換えてインスタンスを生成
+    monkeypatch.setenv('LN_VARIABLE_DIR', str(tmp_path))
+    mocker.patch('line_notify.src.nagaoka_main.initialize_logger')
+    yield NagaokaMain()
+
+
+def create_response(status_code: int, content: bytes = b'', headers: dict | None = None) -> requests.Response:
+    res = requests.Response()
+    res.status_code = status_code
+    res._content = content
+    res._content_consumed = True
+    res.headers.update(headers or {})
+    return res
+
+
+def test_download_page_conditional_get(nagaoka_instance, mocker):
+    content = (test_input_dir / 'webtext_1.txt').read_bytes()
+    res = create_response(200, content, {'ETag': '"abc"', 'Last-Modified': 'Mon, 18 Dec 2023 00:00:00 GMT'})
+    get = mocker.patch('requests.Session.get', return_value=res)
+
+    # 初回は検証子なしで取得し、本文を返す
+    assert nagaoka_instance._download_page() is not None
+    assert get.call_args.kwargs['headers'] == {}
+    nagaoka_instance._commit_page_state()
+
+    # 2回目は保存した検証子を送信し、304の場合はNoneを返す
+    get.return_value = create_response(304)
+    assert nagaoka_instance._download_page() is None
+    assert get.call_args.kwargs['headers'] == {
+        'If-None-Match': '"abc"',
+        'If-Modified-Since': 'Mon, 18 Dec 2023 00:00:00 GMT',
+    }
+
+
+def test_download_page_same_digest(nagaoka_instance, mocker):
+    content = (test_input_dir / 'webtext_1.txt').read_bytes()
+    nagaoka_instance._page_state_store.save(PageState(digest=read_page_sections([content]).digest))
+    mocker.patch('requests.Session.get', return_value=create_response(200, content))
+
+    # 本文が前回と同じ場合はNoneを返す
+    assert nagaoka_instance._download_page() is None
+
+
+def test_download_page_stream(nagaoka_instance, mocker):
+    content = (test_input_dir / 'webtext_1.txt').read_bytes()
+    get = mocker.patch('requests.Session.get', return_value=create_response(200, content + b'<!-- trailer -->'))
+
+    # 本文はストリーミングで取得し、災害情報の区間のみを返す
+    text = nagaoka_instance._download_page()
+    assert get.call_args.kwargs['stream'] is True
+    assert '<HTML>' not in text
+    assert len(nagaoka_instance.parse(text)) == 3
+
+    # 区切り文字列より後の変更はダイジェストに影響しない
+    nagaoka_instance._commit_page_state()
+    get.return_value = create_response(200, content + b'<!-- changed -->')
+    assert nagaoka_instance._download_page() is None
+
+
+def test_download_page_drains_rest(nagaoka_instance, mocker):
+    content = (test_input_dir / 'webtext_1.txt').read_bytes()
+    res = create_response(200)
+    chunks = iter([content[:1000], content[1000:], b'<!-- trailer -->', b'<!-- trailer -->'])
+    mocker.patch.object(res, 'iter_content', return_value=chunks)
+    mocker.patch('requests.Session.get', return_value=res)
+
+    # 終了の区切り文字列より後のチャンクも読み切ってから閉じる（接続を再利用するため）
+    assert nagaoka_instance._download_page() is not None
+    assert next(chunks, None) is None
+
+
+def test_download_page_archive(nagaoka_instance, mocker):
+    content = (test_input_dir / 'webtext_1.txt').read_bytes()
+    mocker.patch('requests.Session.get', return_value=create_response(200, content + b'<!-- trailer -->'))
+
+    # 変更があった場合のみ、終了の区切り文字列までのバイト列を保存する
+    nagaoka_instance._download_page()
+    nagaoka_instance._commit_page_state()
+    assert nagaoka_instance._download_page() is None
+    archive = nagaoka_instance._page_archive
+    [(_, digest)] = archive.snapshots('nagaoka')
+    end_marker = '↑過去の災害経過情報↑'.encode('sjis')
+    assert archive.get(digest) == content[:content.index(end_marker) + len(end_marker)]
+    assert read_page_sections([archive.get(digest)]).digest == digest
+
+
+def test_main_not_modified(nagaoka_instance, mocker):
+    mocker.patch('requests.Session.get', return_value=create_response(304))
+    trim = mocker.patch.object(NagaokaMain, '_trim_disaster_text')
+    filter_new = mocker.patch.object(NagaokaMain, '_filter_new_disaster_text')
+
+    # 変更なしの場合は解析、DBアクセスを行わない
+    nagaoka_instance.main()
+    trim.assert_not_called()
+    filter_new.assert_not_called()
+
+
+def test_main_not_modified_delivers_pending(nagaoka_instance, mocker):
+    # ページに変更がない回も、再送待ちの通知を送信する
+    mocker.patch('line_notify.src.ln_config.LnConfig.getLnLineTokenNagaoka', return_value='dummy_token')
+    with contextlib.closing(sqlite3.connect(nagaoka_instance.data_db_path)) as conn:
+        with conn as cur:
+            cur.execute(
+                'INSERT INTO t_notify_outbox (token_key, message, created_at, attempts, next_attempt_at, last_error) '
+                "VALUES ('nagaoka', 'retrying', 0, 1, 0, 'HTTPError, status_code=503');"
+            )
+    mocker.patch('requests.Session.get', return_value=create_response(304))
+    post = mocker.patch('requests.Session.post', return_value=create_response(200))
+
+    nagaoka_instance.main()
+    post.assert_called_once()
+    with contextlib.closing(sqlite3.connect(nagaoka_instance.data_db_path)) as conn:
+        assert conn.execute('SELECT delivered_at IS NOT NULL FROM t_notify_outbox;').fetchone()[0] == 1
+
+
+def test_process_adaptive_interval(nagaoka_instance):
+    # 現在発生中の災害がある場合はポーリング間隔を短くする
+    assert nagaoka_instance.interval == NagaokaMain.POLL_INTERVAL
+    nagaoka_instance.process([DisasterTextInfo('12月21日 15:19 長岡市 二日町 に車両火災のため消防車が出動しました。',
+                                               DisasterTextType.CURRENT)])
+    assert nagaoka_instance.interval < NagaokaMain.POLL_INTERVAL
+
+
+def create_info_list(texts: list[tuple[str, DisasterTextType]]) -> list[DisasterTextInfo]:
+    return attach_disaster_records([DisasterTextInfo(*text) for text in texts], NagaokaMain.CITY_NAME)
+
+
+def test_process_notify_state_change_only(nagaoka_instance):
+    # 同じ災害の状況が変化しない災害情報（鎮圧後の鎮火前に届いた鎮圧 等）は登録のみ行い、通知しない
+    nagaoka_instance.process(create_info_list([
+        ('12月08日 01:06 長岡市 小国町横沢 に建物火災のため消防車が出動しました。', DisasterTextType.CURRENT),
+        ('12月08日 01:06 長岡市 小国町横沢 の建物火災は01:31に鎮火しました。', DisasterTextType.PAST_WITH_TIME),
+    ]))
+    nagaoka_instance.process(create_info_list([
+        ('12月08日 01:06 長岡市 小国町横沢 の建物火災は01:28に鎮圧しました。', DisasterTextType.PAST_WITH_TIME),
+    ]))
+    with contextlib.closing(sqlite3.connect(nagaoka_instance._data_db_path)) as conn:
+        registered = conn.execute('SELECT COUNT(*) FROM t_disaster_text_nagaoka;').fetchone()[0]
+        notified = [row[0] for row in conn.execute('SELECT message FROM t_notify_outbox ORDER BY outbox_id;')]
+    assert registered == 3
+    assert len(notified) == 2 and '鎮火' in notified[1]
+
+
+def test_endpoint_urls(tmp_path, mocker, monkeypatch):
+    # 接続先URLを設定した場合は、クラスの既定値の代わりに使用する
+    monkeypatch.setenv('LN_VARIABLE_DIR', str(tmp_path))
+    mocker.patch('line_notify.src.nagaoka_main.initialize_logger')
+    mocker.patch('line_notify.src.ln_config.LnConfig.getLnSiteUrlNagaoka', return_value='http://127.0.0.1:1/page')
+    mocker.patch('line_notify.src.ln_config.LnConfig.getLnNotifyUrl', return_value='http://127.0.0.1:1/notify')
+    nagaoka = NagaokaMain()
+
+    get = mocker.patch('requests.Session.get', return_value=create_response(304))
+    nagaoka._download_page()
+    assert get.call_args.args[0] == 'http://127.0.0.1:1/page'
+    assert nagaoka.dispatcher._notify_url == 'http://127.0.0.1:1/notify'
+
+
+def test_notify_coalesce_window(nagaoka_instance, monkeypatch):
+    # 未設定の場合は既定値、設定した場合はその値で通知をまとめる
+    assert nagaoka_instance.dispatcher._coalesce_window == COALESCE_WINDOW_DEFAULT
+    monkeypatch.setenv('LN_NOTIFY_COALESCE_WINDOW', '0')
+    assert NagaokaMain().dispatcher._coalesce_window == 0.0
+
+
+def test_variable_dir_not_defined(tmp_path, mocker, monkeypatch):
+    # variable_dir が .env、環境変数、config.yaml のいずれにも設定されていない場合は例外送出
+    monkeypatch.delenv('LN_VARIABLE_DIR', raising=False)
+    mocker.patch('line_notify.src.ln_config.LnConfig.dotenv_path', tmp_path / '.env')
+    mocker.patch('line_notify.src.ln_config.LnConfig.config_yaml_path', tmp_path / 'config.yaml')
+    mocker.patch('line_notify.src.nagaoka_main.initialize_logger')
+    with pytest.raises(ValueError):
+        NagaokaMain()
+
+
+def test_variable_dir_from_config_yaml(tmp_path, mocker, monkeypatch):
+    # .env、環境変数に設定されていない場合は config.yaml の variable_dir を使用（存在しない場合は作成）
+    monkeypatch.delenv('LN_VARIABLE_DIR', raising=False)
+    variable_dir = tmp_path / 'var'
+    config_yaml_path = tmp_path / 'config.yaml'
+    config_yaml_path.write_text(f'config:\n  variable_dir: {variable_dir}\n', encoding='utf-8')
+    mocker.patch('line_notify.src.ln_config.LnConfig.dotenv_path', tmp_path / '.env')
+    mocker.patch('line_notify.src.ln_config.LnConfig.config_yaml_path', config_yaml_path)
+    mocker.patch('line_notify.src.nagaoka_main.initialize_logger')
+    nagaoka = NagaokaMain()
+    assert nagaoka._data_db_path == variable_dir / 'db' / 'line_notify_data.db'
+    assert variable_dir.is_dir()
+
+
+def test_main_metrics(nagaoka_instance, mocker, caplog):
+    # 1回のポーリングごとに処理時間の要約をログに出力し、メトリクスのファイルを更新する
+    content = (test_input_dir / 'webtext_1.txt').read_bytes()
+    mocker.patch('requests.Session.get', return_value=create_response(200, content))
+    mocker.patch.object(nagaoka_instance.dispatcher, 'dispatch_pending')
+    with caplog.at_level('INFO', logger='ln.nagaoka'):
+        nagaoka_instance.main()
+
+    summary = [r.message for r in caplog.records if r.message.startswith('source=nagaoka')]
+    assert len(summary) == 1
+    for stage in ('download=', 'decode=', 'parse=', 'dedup=', 'register=', 'notify=', 'new=3'):
+        assert stage in summary[0]
+    assert 'result=changed' in summary[0]
+    text = nagaoka_instance._metrics_textfile.read_text(encoding='utf-8')
+    assert 'ln_stage_duration_seconds_bucket{source="nagaoka",stage="parse",le="+Inf"}' in text
+
+
+def test_main_metrics_accumulate(nagaoka_instance, mocker):
+    # cron で起動した回の値は次回の起動（新しいレジストリ）に引き継がれ、ファイルは実行方法ごとに分かれる
+    mocker.patch('requests.Session.get', return_value=create_response(304))
+    nagaoka_instance.main()
+    first = nagaoka_instance._metrics.counter('ln_runs_total', '').value(source='nagaoka', result='unchanged')
+
+    nagaoka_instance._metrics = MetricsRegistry()
+    nagaoka_instance.main()
+    assert nagaoka_instance._metrics.counter('ln_runs_total', '').value(
+        source='nagaoka', result='unchanged'
+    ) == first + 1
+    assert nagaoka_instance._metrics_textfile.name == 'line_notify_cron.prom'
+    assert f'result="unchanged",source="nagaoka"}} {int(first) + 1}' in (
+        nagaoka_instance._metrics_textfile.read_text(encoding='utf-8')
+    )
+
+
+def test_main_skipped_while_locked(nagaoka_instance, mocker):
+    # 前回の実行（または常駐プロセス）が同じ取得元のロックを保持している場合は取得しない
+    get = mocker.patch('requests.Session.get', return_value=create_response(304))
+    other = RunLock(nagaoka_instance.run_lock.lock_path)
+    assert other.acquire()
+    try:
+        nagaoka_instance.main()
+    finally:
+        other.release()
+    get.assert_not_called()
+    # 実行しなかった回はメトリクスのファイルを更新しない（保持しているプロセスのファイルを上書きしない）
+    assert not nagaoka_instance._metrics_textfile.exists()
+
+    # 解放後は実行し、終了時にロックを解放する
+    nagaoka_instance.main()
+    get.assert_called_once()
+    assert not nagaoka_instance.run_lock.locked
+
+
+def test_process_register_failure_keeps_incident_state(nagaoka_instance, mocker):
+    # 登録に失敗した場合は災害ごとの状態も更新されず、次回のポーリングで同じ状態変化を通知する
+    info_list = create_info_list([
+        ('12月08日 01:06 長岡市 小国町横沢 に建物火災のため消防車が出動しました。', DisasterTextType.CURRENT),
+    ])
+    register = mocker.patch.object(
+        nagaoka_instance._disaster_store, 'register', side_effect=DbOperationError('locked')
+    )
+    with pytest.raises(DbOperationError):
+        nagaoka_instance.process(info_list)
+    assert len(nagaoka_instance._incident_tracker) == 0
+
+    mocker.stop(register)
+    nagaoka_instance.process(info_list)
+    with contextlib.closing(sqlite3.connect(nagaoka_instance._data_db_path)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t_incident;').fetchone()[0] == 1
+        assert conn.execute('SELECT COUNT(*) FROM t_notify_outbox;').fetchone()[0] == 1
+
+
+def test_main_logs_traceback(nagaoka_instance, mocker, caplog):
+    # 1回で終了する実行では、失敗の原因をトレースバック付きでログに出力する
+    mocker.patch('requests.Session.get', side_effect=requests.ConnectionError('refused'))
+    with caplog.at_level('INFO', logger='ln.nagaoka'):
+        nagaoka_instance.main()
+    failed = [r for r in caplog.records if r.message == 'Failed to run:']
+    assert len(failed) == 1 and failed[0].exc_info is not None
+    assert any('result=error' in r.message for r in caplog.records)
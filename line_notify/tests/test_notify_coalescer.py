@@ -0,0 +1,29 @@
+from line_notify.src.notify_coalescer import coalesce_messages, build_message
+from line_notify.src.structures import OutboxMessage
+
+
+def create_messages(*texts: str) -> list[OutboxMessage]:
+    return [OutboxMessage(i, 'nagaoka', text, 0) for i, text in enumerate(texts, start=1)]
+
+
+def test_coalesce_messages():
+    # 最大文字数に収まる範囲で古い順にまとめる
+    messages = create_messages('aaa', 'bbb', 'ccc', 'dddddddd', 'e')
+    groups = coalesce_messages(list(reversed(messages)), max_length=8)
+    assert [[m.outbox_id for m in group] for group in groups] == [[1, 2], [3], [4], [5]]
+    assert [build_message(group, max_length=8) for group in groups] == ['aaa\nbbb', 'ccc', 'dddddddd', 'e']
+
+
+def test_coalesce_burst():
+    # 1件ずつ送信する場合に比べて送信回数が大きく減る
+    messages = create_messages(*[f'12月21日 15:{i:02d} 長岡市 二日町 の建物火災は15:30に鎮火しました。' for i in range(50)])
+    groups = coalesce_messages(messages)
+    assert len(groups) <= 5
+    assert all(len(build_message(group)) <= 1000 for group in groups)
+
+
+def test_build_message_truncate():
+    # 単独で最大文字数を超える場合は切り詰める
+    messages = create_messages('x' * 20)
+    groups = coalesce_messages(messages, max_length=10)
+    assert build_message(groups[0], max_length=10) == 'x' * 9 + '…'
@@ -0,0 +1,249 @@
+import contextlib
+import datetime
+import sqlite3
+import time
+
+import pytest
+import requests
+
+from line_notify.src.db_migration import DbMigration
+from line_notify.src.disaster_store import DisasterTextStore
+from line_notify.src.notify_dispatcher import NotifyDispatcher
+from line_notify.src.structures import DisasterTextInfo, DisasterTextType
+
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def data_db_path(tmp_path):
+    db_path = tmp_path / 'line_notify_data.db'
+    DbMigration(db_path).migrate()
+    yield db_path
+
+
+def create_response(status_code: int, headers: dict | None = None) -> requests.Response:
+    res = requests.Response()
+    res.status_code = status_code
+    res.headers.update(headers or {})
+    return res
+
+
+def enqueue(db_path, *disaster_texts: str, token_key: str = 'nagaoka'):
+    store = DisasterTextStore(db_path, '長岡市', 't_disaster_text_nagaoka')
+    store.register(
+        [DisasterTextInfo(dtext, DisasterTextType.CURRENT) for dtext in disaster_texts],
+        registered_at=datetime.datetime.fromtimestamp(NOW),
+        token_keys=[token_key],
+    )
+
+
+def select_outbox(db_path) -> list[tuple]:
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        return conn.execute(
+            'SELECT message, attempts, next_attempt_at, delivered_at, failed_at FROM t_notify_outbox ORDER BY outbox_id;'
+        ).fetchall()
+
+
+def create_dispatcher(db_path, clock=lambda: NOW, **kwargs) -> NotifyDispatcher:
+    kwargs.setdefault('coalesce_window', 0.0)
+    return NotifyDispatcher(db_path, token_resolver=lambda key: f'token_{key}', clock=clock, **kwargs)
+
+
+def test_register_enqueue_only_new(data_db_path):
+    # 新たに登録した災害情報のみアウトボックスに追加される
+    enqueue(data_db_path, 'msg_1')
+    enqueue(data_db_path, 'msg_1', 'msg_2')
+    assert [row[0] for row in select_outbox(data_db_path)] == ['msg_1', 'msg_2']
+
+
+def test_dispatch_delivered(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1', 'msg_2')
+    post = mocker.patch('requests.Session.post', return_value=create_response(200))
+    dispatcher = create_dispatcher(data_db_path)
+
+    assert dispatcher.dispatch_pending() == 2
+    assert [call.kwargs['params']['message'] for call in post.call_args_list] == ['msg_1\nmsg_2']
+    assert post.call_args.kwargs['headers'] == {'Authorization': 'Bearer token_nagaoka'}
+    assert [(row[1], row[3]) for row in select_outbox(data_db_path)] == [(1, NOW), (1, NOW)]
+
+    # 送信済みのメッセージは再送しない
+    assert dispatcher.dispatch_pending() == 0
+
+
+def test_dispatch_rate_limit(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1', 'msg_2', 'msg_3')
+    headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(NOW) + 600)}
+    post = mocker.patch('requests.Session.post', return_value=create_response(200, headers))
+
+    # 残り回数が0になった後のメッセージはリセット時刻まで延期
+    assert create_dispatcher(data_db_path, max_message_length=5).dispatch_pending() == 1
+    assert post.call_count == 1
+    rows = select_outbox(data_db_path)
+    assert rows[0][3] == NOW
+    assert [(row[1], row[2], row[3]) for row in rows[1:]] == [(0, NOW + 600, None), (0, NOW + 600, None)]
+
+
+def test_dispatch_retry(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1', 'msg_2')
+    mocker.patch('requests.Session.post', side_effect=requests.ConnectionError())
+
+    # 失敗したメッセージは試行回数を増やして再試行、後続は順序を保つため延期
+    assert create_dispatcher(data_db_path, max_message_length=5).dispatch_pending() == 0
+    rows = select_outbox(data_db_path)
+    assert rows[0][1] == 1 and rows[0][2] > NOW and rows[0][3] is None
+    assert rows[1][1] == 0 and rows[1][2] == rows[0][2]
+
+
+def test_dispatch_rate_limited_not_counted(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1')
+    now = [NOW]
+    post = mocker.patch('requests.Session.post')
+    dispatcher = create_dispatcher(data_db_path, clock=lambda: now[0], max_attempts=2)
+
+    # 429 はリセット時刻まで延期し、上限回数を超えて続いても送信失敗にしない
+    for i in range(5):
+        post.return_value = create_response(
+            429, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(now[0]) + 60)}
+        )
+        assert dispatcher.dispatch_pending() == 0
+        assert select_outbox(data_db_path)[0] == ('msg_1', 0, now[0] + 60, None, None)
+        now[0] += 61
+    assert post.call_count == 5
+
+    # リセット時刻が不明な場合はバックオフ
+    post.return_value = create_response(429)
+    assert dispatcher.dispatch_pending() == 0
+    row = select_outbox(data_db_path)[0]
+    assert row[1] == 0 and row[2] > now[0] and row[4] is None
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        assert conn.execute('SELECT last_error FROM t_notify_outbox;').fetchone()[0] == 'HTTPError, status_code=429'
+
+
+def test_dispatch_lease_renewed(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1', 'msg_2', 'msg_3')
+    now = [NOW]
+    other = create_dispatcher(data_db_path, clock=lambda: now[0], claim_lease=60.0)
+    claimed_by_other = []
+
+    def post(url, **kwargs):
+        # 1通ごとに40秒かかり（レーン全体では取得時のリース60秒を超える）、その間に他のディスパッチャーが取得を試みる
+        now[0] += 40
+        claimed_by_other.extend(other._claim(0.0)[0])
+        return create_response(200)
+
+    mocker.patch('requests.Session.post', side_effect=post)
+    dispatcher = create_dispatcher(data_db_path, clock=lambda: now[0], claim_lease=60.0, max_message_length=5)
+
+    # 送信前にリースを延長するため、他のディスパッチャーに取得されず重複送信されない
+    [result] = dispatcher.dispatch()
+    assert (result.delivered, result.deferred) == (3, 0)
+    assert claimed_by_other == []
+
+
+def test_dispatch_lease_lost(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1', 'msg_2', 'msg_3')
+    now = [NOW]
+    other = create_dispatcher(data_db_path, clock=lambda: now[0], claim_lease=60.0)
+    claimed_by_other = []
+
+    def post(url, **kwargs):
+        # 1通の送信がリースを超え、その間に他のディスパッチャーが全て取得
+        if not claimed_by_other:
+            now[0] += 120
+            claimed_by_other.extend(other._claim(0.0)[0])
+        return create_response(200)
+
+    post_mock = mocker.patch('requests.Session.post', side_effect=post)
+    dispatcher = create_dispatcher(data_db_path, clock=lambda: now[0], claim_lease=60.0, max_message_length=5)
+
+    # リースを延長できない場合は残りを送信せず、取得した他のディスパッチャーに任せる
+    [result] = dispatcher.dispatch()
+    assert (result.delivered, result.deferred, result.last_error) == (1, 2, 'lease expired')
+    assert post_mock.call_count == 1
+    assert len(claimed_by_other) == 3
+
+
+def test_dispatch_coalesce_window(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1')
+    enqueue(data_db_path, 'msg_2', token_key='niigata')
+    post = mocker.patch('requests.Session.post', return_value=create_response(200))
+
+    # 最も古いメッセージの登録から coalesce_window 秒経過するまでは送信しない
+    assert create_dispatcher(data_db_path, coalesce_window=10.0, clock=lambda: NOW + 5).dispatch_pending() == 0
+    post.assert_not_called()
+    assert create_dispatcher(data_db_path, coalesce_window=10.0, clock=lambda: NOW + 5).dispatch_pending(flush=True) == 2
+    assert post.call_count == 2
+
+
+def test_dispatch_give_up(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1')
+    mocker.patch('requests.Session.post', return_value=create_response(401))
+
+    # 再試行しても成功しないステータスは直ちに送信失敗とする
+    assert create_dispatcher(data_db_path).dispatch_pending() == 0
+    assert select_outbox(data_db_path)[0][4] == NOW
+
+
+def test_dispatch_invalid_token_stops_lane(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1', 'msg_2', 'msg_3')
+
+    # 400 はそのメッセージのみ失敗とし、残りは送信する
+    post = mocker.patch('requests.Session.post', side_effect=[create_response(400)] + [create_response(200)] * 2)
+    [result] = create_dispatcher(data_db_path, max_message_length=5).dispatch()
+    assert (result.delivered, result.failed, post.call_count) == (2, 1, 3)
+
+    # 401/403 は同じトークンの残りも送信せずに失敗とする
+    enqueue(data_db_path, 'msg_4', 'msg_5', 'msg_6')
+    post = mocker.patch('requests.Session.post', return_value=create_response(403))
+    [result] = create_dispatcher(data_db_path, max_message_length=5).dispatch()
+    assert (result.delivered, result.failed, result.deferred, post.call_count) == (0, 3, 0, 1)
+    assert all(row[4] == NOW for row in select_outbox(data_db_path)[3:])
+
+
+def test_dispatch_token_not_defined(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1')
+    post = mocker.patch('requests.Session.post')
+    dispatcher = NotifyDispatcher(data_db_path, token_resolver=lambda key: None, clock=lambda: NOW, coalesce_window=0.0)
+    assert dispatcher.dispatch_pending() == 0
+    post.assert_not_called()
+    assert select_outbox(data_db_path)[0][4] == NOW
+
+
+def test_start_and_stop(data_db_path, mocker):
+    enqueue(data_db_path, 'msg_1')
+    mocker.patch('requests.Session.post', return_value=create_response(200))
+    dispatcher = create_dispatcher(data_db_path)
+    dispatcher.start(poll_interval=0.01)
+    try:
+        deadline = time.monotonic() + 5.0
+        while select_outbox(data_db_path)[0][3] is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        dispatcher.stop(timeout=5.0)
+    assert select_outbox(data_db_path)[0][3] == NOW
+
+
+def test_dispatch_fan_out(data_db_path, mocker):
+    # 多数のトークンへの同報は並行して送信し、トークンごとの送信結果を返す
+    token_keys = [f'nagaoka.group_{i:02}' for i in range(20)]
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    store.register([DisasterTextInfo('msg_1', DisasterTextType.CURRENT)],
+                   registered_at=datetime.datetime.fromtimestamp(NOW), token_keys=token_keys)
+
+    def post(url, **kwargs):
+        time.sleep(0.2)
+        if kwargs['headers']['Authorization'] == 'Bearer token_nagaoka.group_00':
+            return create_response(401)
+        return create_response(200)
+
+    mocker.patch('requests.Session.post', side_effect=post)
+    dispatcher = create_dispatcher(data_db_path, max_workers=20)
+
+    start = time.perf_counter()
+    results = dispatcher.dispatch()
+    assert time.perf_counter() - start < 0.2 * 5
+
+    assert [result.token_key for result in results] == token_keys
+    assert (results[0].failed, results[0].last_error) == (1, 'HTTPError, status_code=401')
+    assert all(result.delivered == 1 and result.failed == 0 for result in results[1:])
@@ -0,0 +1,62 @@
+import contextlib
+import sqlite3
+
+import pytest
+
+from line_notify.src.page_archive import INDEX_FILE_NAME, OBJECTS_DIR_NAME, PageArchive, page_digest
+
+
+def count_objects(archive_dir) -> int:
+    return len(list((archive_dir / OBJECTS_DIR_NAME).glob('*/*')))
+
+
+@pytest.mark.parametrize('compression', ['lzma', 'zlib'])
+def test_put_and_get(tmp_path, compression):
+    archive = PageArchive(tmp_path, compression)
+    raw = 'ページ本文'.encode('sjis') * 100
+    digest = archive.put('nagaoka', raw, fetched_at=100.0)
+    assert digest == page_digest(raw)
+    assert archive.get(digest) == raw
+    assert archive.stats()['stored_size'] < len(raw)
+
+    with pytest.raises(KeyError):
+        archive.get(page_digest(b'unknown'))
+
+
+def test_put_same_body_once(tmp_path):
+    # 同じ本文は1度だけ保存し、取得日時のみ記録する
+    archive = PageArchive(tmp_path)
+    digest_1 = archive.put('nagaoka', b'page_1', fetched_at=100.0)
+    digest_2 = archive.put('nagaoka', b'page_2', fetched_at=200.0)
+    archive.put('nagaoka', b'page_1', fetched_at=300.0)
+    assert count_objects(tmp_path) == 2
+    assert archive.stats()['snapshots'] == 3
+    assert archive.snapshots('nagaoka') == [(100.0, digest_1), (200.0, digest_2), (300.0, digest_1)]
+
+    # ファイルが失われていた場合は書き直す
+    next((tmp_path / OBJECTS_DIR_NAME).glob(f'*/{digest_1}.*')).unlink()
+    archive.put('nagaoka', b'page_1', fetched_at=400.0)
+    assert archive.get(digest_1) == b'page_1'
+
+
+def test_snapshots_range(tmp_path):
+    archive = PageArchive(tmp_path)
+    for fetched_at in (100.0, 200.0, 300.0):
+        archive.put('nagaoka', str(fetched_at).encode(), fetched_at=fetched_at)
+    archive.put('niigata', b'niigata', fetched_at=200.0)
+
+    assert [t for t, _ in archive.snapshots('nagaoka', since=200.0)] == [200.0, 300.0]
+    assert [t for t, _ in archive.snapshots('nagaoka', since=100.0, until=300.0)] == [100.0, 200.0]
+
+    # 期間の問い合わせは (source, fetched_at) のインデックスを使用する
+    with contextlib.closing(sqlite3.connect(tmp_path / INDEX_FILE_NAME)) as conn:
+        plan = conn.execute(
+            'EXPLAIN QUERY PLAN SELECT fetched_at, digest FROM t_page_snapshot WHERE source=? AND fetched_at>=?;',
+            ('nagaoka', 0.0)
+        ).fetchall()
+    assert 'idx_t_page_snapshot_source_fetched_at' in str(plan)
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        PageArchive(tmp_path, 'bz2')
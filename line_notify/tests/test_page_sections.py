@@ -0,0 +1,59 @@
+import unicodedata
+from pathlib import Path
+
+import pytest
+
+from line_notify.src.disaster_text_parser import parse_disaster_text
+from line_notify.src.errors import TextAnalysisError
+from line_notify.src.page_sections import PageSectionReader, read_page_sections
+
+test_input_dir = Path(__file__).parent.parent.parent / 'test' / 'test_resource' / 'input'
+
+
+def split_chunks(content: bytes, size: int) -> list[bytes]:
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 100000])
+def test_read_page_sections(chunk_size):
+    # チャンクの区切り位置（区切り文字列の途中 等）に関係なく、ページ全体を変換した場合と同じ解析結果になる
+    content = (test_input_dir / 'webtext_1.txt').read_bytes()
+    expected = parse_disaster_text(unicodedata.normalize('NFKC', content.decode('sjis')).replace('　', ' '))
+    reader = read_page_sections(split_chunks(content, chunk_size))
+    assert reader.completed
+    assert parse_disaster_text(reader.text()) == expected
+
+
+def test_read_page_sections_stop():
+    # 終了の区切り文字列以降のチャンクは読まない
+    content = (test_input_dir / 'webtext_1.txt').read_bytes()
+    consumed = []
+
+    def chunks():
+        for chunk in split_chunks(content, 512):
+            consumed.append(chunk)
+            yield chunk
+
+    read_page_sections(chunks())
+    assert len(consumed) < len(split_chunks(content, 512))
+
+
+def test_digest():
+    # ダイジェストは終了の区切り文字列までのバイト列から求める（チャンクの区切り位置に依存しない）
+    content = (test_input_dir / 'webtext_1.txt').read_bytes()
+    digest = read_page_sections([content]).digest
+    assert read_page_sections(split_chunks(content + b'trailer', 13)).digest == digest
+    assert read_page_sections([b'x' + content]).digest != digest
+
+
+def test_format_error():
+    reader = PageSectionReader()
+    assert reader.feed('<HTML>↓現在発生している災害↓</HTML>'.encode('sjis')) is False
+    with pytest.raises(TextAnalysisError):
+        reader.text()
+
+    # 終了の区切り文字列のみ見つかった場合
+    reader = read_page_sections(['↓現在発生している災害↓↑過去の災害経過情報↑'.encode('sjis')])
+    assert reader.completed
+    with pytest.raises(TextAnalysisError):
+        reader.sections()
@@ -0,0 +1,22 @@
+from line_notify.src.page_state import PageStateStore
+from line_notify.src.structures import PageState
+
+
+def test_load_not_exists(tmp_path):
+    # 状態ファイルが存在しない場合は空の状態
+    store = PageStateStore(tmp_path / 'state.json')
+    assert store.load() == PageState()
+
+
+def test_save_and_load(tmp_path):
+    store = PageStateStore(tmp_path / 'cache' / 'state.json')
+    page_state = PageState(etag='"abc"', last_modified='Mon, 18 Dec 2023 00:00:00 GMT', digest='0123')
+    store.save(page_state)
+    assert store.load() == page_state
+
+
+def test_load_broken(tmp_path):
+    # 壊れた状態ファイルは空の状態として扱う
+    state_file_path = tmp_path / 'state.json'
+    state_file_path.write_text('{', encoding='utf-8')
+    assert PageStateStore(state_file_path).load() == PageState()
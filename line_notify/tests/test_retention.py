@@ -0,0 +1,173 @@
+import contextlib
+import datetime
+import sqlite3
+
+import pytest
+
+from line_notify.src.db_migration import DbMigration
+from line_notify.src.disaster_store import DisasterTextStore
+from line_notify.src.disaster_text_parser import attach_disaster_records
+from line_notify.src.archive_db import archive_db_path
+from line_notify.src.retention import DataRetention
+from line_notify.src.structures import DisasterTextInfo, DisasterTextType
+
+NOW = datetime.datetime(2024, 6, 1, 12, 0, 0)
+
+
+def make_infos(dtext_list: list[str]) -> list[DisasterTextInfo]:
+    return attach_disaster_records(
+        [DisasterTextInfo(dtext, DisasterTextType.CURRENT) for dtext in dtext_list], '長岡市', NOW
+    )
+
+
+@pytest.fixture
+def data_db_path(tmp_path):
+    # 2024-01 に2件、2024-02 に1件、2024-05 に1件登録
+    db_path = tmp_path / 'line_notify_data.db'
+    DbMigration(db_path).migrate()
+    store = DisasterTextStore(db_path, '長岡市', 't_disaster_text_nagaoka')
+    for registered_at, dtext_list in (
+        (datetime.datetime(2024, 1, 10), [
+            '01月10日 01:06 長岡市 与板町与板 に車両火災のため消防車が出動しました。',
+            '01月10日 02:00 長岡市 寺泊 に救急活動のため消防車が出動しました。',
+        ]),
+        (datetime.datetime(2024, 2, 20), ['02月20日 09:30 長岡市 宮栄 に建物火災のため消防車が出動しました。']),
+        (datetime.datetime(2024, 5, 20), ['05月20日 10:15 長岡市 寺泊 に建物火災のため消防車が出動しました。']),
+    ):
+        store.register(make_infos(dtext_list), registered_at=registered_at)
+    yield db_path
+
+
+def select_texts(db_path, schema: str = 'main') -> list[str]:
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        return [row[0] for row in conn.execute(
+            f'SELECT disaster_text FROM {schema}.t_disaster_text_nagaoka ORDER BY datetime;'
+        )]
+
+
+def test_new_db_incremental(data_db_path):
+    # 新規に作成したDBは auto_vacuum=INCREMENTAL
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        assert conn.execute('PRAGMA auto_vacuum;').fetchone()[0] == 2
+
+
+def test_invalid_days(data_db_path):
+    with pytest.raises(ValueError):
+        DataRetention(data_db_path, retention_days=90, fingerprint_days=30)
+
+
+def test_run_moves_expired_months(data_db_path):
+    retention = DataRetention(data_db_path, retention_days=90, clock=lambda: NOW)
+    result = retention.run()
+    assert result.moved == {'2024-01': 2, '2024-02': 1}
+    assert result.completed
+
+    # 保存期間内のものはデータDBに残り、移したものは月ごとのアーカイブDBで参照できる
+    assert len(select_texts(data_db_path)) == 1
+    assert retention.archives() == [
+        archive_db_path(retention.archive_dir, '2024-01'), archive_db_path(retention.archive_dir, '2024-02')
+    ]
+    assert len(select_texts(archive_db_path(retention.archive_dir, '2024-01'))) == 2
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        conn.execute('ATTACH DATABASE ? AS archive;', (str(archive_db_path(retention.archive_dir, '2024-02')),))
+        assert conn.execute('SELECT COUNT(*) FROM archive.t_disaster_text_nagaoka;').fetchone()[0] == 1
+        assert conn.execute('SELECT COUNT(*) FROM t_recent_fingerprint;').fetchone()[0] == 3
+
+    # 2回目は移すものがない
+    assert retention.run().moved == {}
+
+
+def test_moved_texts_not_registered_again(data_db_path):
+    DataRetention(data_db_path, retention_days=90, clock=lambda: NOW).run()
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    infos = make_infos([
+        '01月10日 01:06 長岡市 与板町与板 に車両火災のため消防車が出動しました。',
+        '06月01日 11:00 長岡市 与板町与板 に車両火災のため消防車が出動しました。',
+    ])
+    assert store.filter_new(infos) == infos[1:]
+
+
+def test_prune_fingerprints(data_db_path):
+    DataRetention(data_db_path, retention_days=90, clock=lambda: NOW).run()
+    # フィンガープリントの保存期間を過ぎたものは削除され、重複判定の対象外になる
+    later = NOW + datetime.timedelta(days=140)
+    result = DataRetention(data_db_path, retention_days=90, clock=lambda: later).run()
+    assert result.moved == {'2024-05': 1}
+    assert result.pruned_fingerprints == 3
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        assert conn.execute('SELECT registered_at FROM t_recent_fingerprint;').fetchall() == [('2024-05-20 00:00:00',)]
+
+
+def test_time_budget(data_db_path):
+    # 時間切れの場合は移さずに終了し、次回に続きを行う
+    retention = DataRetention(data_db_path, retention_days=90, clock=lambda: NOW)
+    result = retention.run(time_budget=0)
+    assert result.moved == {}
+    assert not result.completed
+    assert len(select_texts(data_db_path)) == 4
+    assert retention.run().completed
+
+
+def test_incremental_vacuum(data_db_path):
+    store = DisasterTextStore(data_db_path, '長岡市', 't_disaster_text_nagaoka')
+    store.register(
+        make_infos([f'01月11日 03:00 長岡市 寺泊{n:05} に建物火災のため消防車が出動しました。' * 5 for n in range(2000)]),
+        registered_at=datetime.datetime(2024, 1, 11),
+    )
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        page_count = conn.execute('PRAGMA page_count;').fetchone()[0]
+
+    result = DataRetention(data_db_path, retention_days=90, clock=lambda: NOW).run()
+    assert result.moved['2024-01'] == 2002
+    assert result.vacuumed_pages > 0
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        assert conn.execute('PRAGMA freelist_count;').fetchone()[0] == 0
+        assert conn.execute('PRAGMA page_count;').fetchone()[0] < page_count
+
+
+def test_convert_to_incremental(tmp_path):
+    db_path = tmp_path / 'line_notify_data.db'
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        conn.execute('CREATE TABLE t (value);')
+    DbMigration(db_path).migrate()
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute('PRAGMA auto_vacuum;').fetchone()[0] == 0
+
+    DataRetention(db_path).convert_to_incremental()
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute('PRAGMA auto_vacuum;').fetchone()[0] == 2
+
+
+def test_prune_outbox_and_incidents(data_db_path):
+    # 送信を終えて保存期間を過ぎたアウトボックスの行、終了して保存期間を過ぎた災害の状態のみ削除される
+    old = (NOW - datetime.timedelta(days=91)).timestamp()
+    recent = (NOW - datetime.timedelta(days=1)).timestamp()
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        with conn as cur:
+            cur.executemany(
+                'INSERT INTO t_notify_outbox (token_key, message, created_at, next_attempt_at, delivered_at, failed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?);',
+                [
+                    ('nagaoka', 'delivered_old', old, old, old, None),
+                    ('nagaoka', 'failed_old', old, old, None, old),
+                    ('nagaoka', 'delivered_recent', recent, recent, recent, None),
+                    ('nagaoka', 'pending_old', old, old, None, None),
+                ]
+            )
+            cur.executemany(
+                'INSERT INTO t_incident (incident_key, city_id, occurred_at, location, category_id, status_id, '
+                'updated_at, closed_at) VALUES (?, 2, ?, ?, 1, ?, ?, ?);',
+                [
+                    ('closed_old', '2024-01-10 01:06:00', 'a', 3, old, old),
+                    ('closed_recent', '2024-05-31 01:06:00', 'b', 3, recent, recent),
+                    ('open_old', '2024-01-10 02:00:00', 'c', 1, old, None),
+                ]
+            )
+
+    result = DataRetention(data_db_path, retention_days=90, clock=lambda: NOW).run()
+    assert (result.pruned_outbox, result.pruned_incidents) == (2, 1)
+    with contextlib.closing(sqlite3.connect(data_db_path)) as conn:
+        outbox = [row[0] for row in conn.execute('SELECT message FROM t_notify_outbox ORDER BY outbox_id;')]
+        incidents = [row[0] for row in conn.execute('SELECT incident_key FROM t_incident ORDER BY incident_key;')]
+    assert outbox == ['delivered_recent', 'pending_old']
+    assert incidents == ['closed_recent', 'open_old']
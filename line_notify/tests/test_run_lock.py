@@ -0,0 +1,63 @@
+from logging import getLogger
+import json
+import os
+
+from line_notify.src.ln_metrics import MetricsRegistry
+from line_notify.src.run_lock import RunLock, acquire_or_skip
+
+
+def test_acquire_release(tmp_path):
+    lock_path = tmp_path / 'lock' / 'nagaoka.lock'
+    first = RunLock(lock_path)
+    second = RunLock(lock_path)
+
+    # 保持中は他のインスタンス（別のファイル記述）から取得できず、保持者の情報を読める
+    assert first.acquire()
+    assert not second.acquire()
+    holder = second.holder()
+    assert holder is not None and holder.pid == os.getpid()
+
+    # 解放するとロックファイルは空になり、取得できる
+    first.release()
+    assert second.holder() is None
+    assert second.acquire()
+    assert second.recovered is None
+    second.release()
+
+
+def test_recover_left_lock(tmp_path):
+    # 解放されずに終了したプロセスの情報が残っていても取得でき、recovered に残る
+    lock_path = tmp_path / 'nagaoka.lock'
+    lock_path.write_text(json.dumps({'pid': 99999, 'host': 'old-host', 'acquired_at': 0.0}))
+    lock = RunLock(lock_path)
+    assert lock.acquire()
+    assert (lock.recovered.pid, lock.recovered.host) == (99999, 'old-host')
+    assert lock.holder().pid == os.getpid()
+    lock.release()
+
+
+def test_acquire_or_skip(tmp_path, caplog):
+    now = [1000.0]
+    lock_path = tmp_path / 'nagaoka.lock'
+    holder = RunLock(lock_path, clock=lambda: now[0])
+    lock = RunLock(lock_path, stale_after=60.0, clock=lambda: now[0])
+    registry = MetricsRegistry()
+    logger = getLogger('ln.test')
+    assert holder.acquire()
+
+    # 保持されている場合は行わず、理由ごとに記録（stale_after を超えた場合は警告）
+    assert not acquire_or_skip(lock, 'nagaoka', registry, logger)
+    now[0] += 61.0
+    with caplog.at_level('WARNING', logger='ln.test'):
+        assert not acquire_or_skip(lock, 'nagaoka', registry, logger)
+    assert any('stale' in record.message for record in caplog.records)
+
+    runs = registry.counter('ln_runs_total', '')
+    skipped = registry.counter('ln_runs_skipped_total', '')
+    assert runs.value(source='nagaoka', result='skipped') == 2
+    assert skipped.value(source='nagaoka', reason='locked') == 1
+    assert skipped.value(source='nagaoka', reason='stale') == 1
+
+    holder.release()
+    assert acquire_or_skip(lock, 'nagaoka', registry, logger)
+    lock.release()
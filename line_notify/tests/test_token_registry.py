@@ -0,0 +1,62 @@
+import contextlib
+import sqlite3
+
+import pytest
+
+from line_notify.src.db_migration import DbMigration
+from line_notify.src.token_registry import TokenRegistry
+
+
+@pytest.fixture
+def data_db_path(tmp_path):
+    db_path = tmp_path / 'line_notify_data.db'
+    DbMigration(db_path).migrate()
+    execute(db_path, 'INSERT INTO t_token VALUES (?, ?);', ('nagaoka', 'token_1'), ('nagaoka.brigade_1', 'token_2'),
+            ('niigata', 'token_3'))
+    yield db_path
+
+
+def execute(db_path, sql: str, *params_list: tuple):
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        with conn as cur:
+            cur.executemany(sql, params_list or [()])
+
+
+def test_recipients(data_db_path):
+    registry = TokenRegistry(data_db_path)
+    assert registry.recipients('nagaoka') == ['nagaoka', 'nagaoka.brigade_1']
+    assert registry.recipients('niigata') == ['niigata']
+    # 登録がない場合は通知元の名前のみ
+    assert registry.recipients('joetsu') == ['joetsu']
+
+
+def test_resolve_fallback(data_db_path):
+    registry = TokenRegistry(data_db_path, fallback=lambda key: f'env_{key}')
+    assert registry.resolve('nagaoka.brigade_1') == 'token_2'
+    assert registry.resolve('joetsu') == 'env_joetsu'
+    assert TokenRegistry(data_db_path).resolve('joetsu') is None
+
+
+def test_cache_invalidated_on_change(data_db_path, mocker):
+    now = [0.0]
+    registry = TokenRegistry(data_db_path, refresh_interval=1.0, clock=lambda: now[0])
+    assert registry.resolve('nagaoka') == 'token_1'
+
+    # 変更がない場合は t_token を読み込み直さない
+    select = mocker.spy(registry, '_refresh')
+    now[0] = 2.0
+    tokens = registry.tokens()
+    assert select.call_count == 1
+    assert registry.tokens() is tokens
+
+    # 追加、更新、削除はトリガーで検知する（確認は refresh_interval 秒に1回）
+    execute(data_db_path, 'UPDATE t_token SET token_value=? WHERE token_key=?;', ('token_4', 'nagaoka'))
+    execute(data_db_path, 'DELETE FROM t_token WHERE token_key=?;', ('nagaoka.brigade_1',))
+    assert registry.resolve('nagaoka') == 'token_1'
+    now[0] = 3.0
+    assert registry.resolve('nagaoka') == 'token_4'
+    assert registry.recipients('nagaoka') == ['nagaoka']
+
+    execute(data_db_path, 'INSERT INTO t_token VALUES (?, ?);', ('nagaoka.office', 'token_5'))
+    registry.invalidate()
+    assert registry.recipients('nagaoka') == ['nagaoka', 'nagaoka.office']
@@ -0,0 +1,95 @@
+import argparse
+import re
+import sys
+import timeit
+import unicodedata
+from pathlib import Path
+
+from line_notify.src.disaster_text_parser import parse_disaster_text, find_sections
+from line_notify.src.structures import DisasterTextType, DisasterTextInfo
+
+INPUT_DIR = Path(__file__).parent.parent.parent / 'test' / 'test_resource' / 'input'
+
+
+def legacy_parse(webpage_text: str) -> list[DisasterTextInfo]:
+    # 比較用: 置き換え前の NagaokaMain._trim_disaster_text と同じ処理
+    PAT = re.compile(
+        r'.+↓現在発生している災害↓(.+)↑現在発生している災害↑.+↓過去の災害経過情報↓(.+)↑過去の災害経過情報↑.+',
+        re.DOTALL
+    )
+    m = PAT.match(webpage_text)
+    if not m:
+        raise ValueError('format error')
+
+    info_list = re.findall(r'(\d\d月\d\d日.+?出動しました。)', m.group(1), re.DOTALL)
+    disaster_text_list = [DisasterTextInfo(dinfo, DisasterTextType.CURRENT) for dinfo in info_list]
+    info_list = re.findall(r'(\d\d月\d\d日.+?は\d\d:\d\dに.+?しました。)', m.group(2))
+    disaster_text_list.extend([DisasterTextInfo(dinfo, DisasterTextType.PAST_WITH_TIME) for dinfo in info_list])
+    info_list = re.findall(r'(\d\d月\d\d日.+?は消火の必要はありませんでした。)', m.group(2))
+    disaster_text_list.extend([DisasterTextInfo(dinfo, DisasterTextType.PAST) for dinfo in info_list])
+    return disaster_text_list
+
+
+def load_page(path: Path) -> str:
+    # Shift_JISのままの入力はダウンロード時と同じ整形を行う
+    raw = path.read_bytes()
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        text = raw.decode('sjis')
+    text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\u3000', ' ', text)
+
+
+def enlarge_page(webpage_text: str, factor: int) -> str:
+    # 2つの災害情報欄の中身を factor 倍に複製したページを作成
+    current_begin, current_end, past_begin, past_end = find_sections(webpage_text)
+    return (
+        webpage_text[:current_begin]
+        + webpage_text[current_begin:current_end] * factor
+        + webpage_text[current_end:past_begin]
+        + webpage_text[past_begin:past_end] * factor
+        + webpage_text[past_end:]
+    )
+
+
+def measure(func, webpage_text: str, number: int) -> float:
+    # 1回あたりの最短実行時間[s]
+    return min(timeit.repeat(lambda: func(webpage_text), number=number, repeat=5)) / number
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark of disaster text parser.')
+    parser.add_argument('--factor', type=int, default=100, help='size factor of synthetic pages.')
+    parser.add_argument('--number', type=int, default=20, help='iterations per measurement.')
+    parser.add_argument('--max-ratio', type=float, default=None,
+                        help='fail if parse_disaster_text is slower than legacy * MAX_RATIO.')
+    args = parser.parse_args()
+
+    failed = False
+    print(f'{"page":<28}{"bytes":>10}{"entries":>9}{"legacy[ms]":>12}{"single[ms]":>12}{"speedup":>9}')
+    for path in sorted(INPUT_DIR.glob('webtext_*.txt')):
+        base_text = load_page(path)
+        for label, webpage_text, number in (
+            (path.name, base_text, args.number * 10),
+            (f'{path.name} x{args.factor}', enlarge_page(base_text, args.factor), args.number),
+        ):
+            # 結果が一致することを確認してから計測
+            expect = legacy_parse(webpage_text)
+            if parse_disaster_text(webpage_text) != expect:
+                print(f'{label}: result mismatch.')
+                return 1
+
+            legacy_time = measure(legacy_parse, webpage_text, number)
+            single_time = measure(parse_disaster_text, webpage_text, number)
+            ratio = legacy_time / single_time
+            print(f'{label:<28}{len(webpage_text.encode()):>10}{len(expect):>9}'
+                  f'{legacy_time * 1000:>12.3f}{single_time * 1000:>12.3f}{ratio:>8.2f}x')
+            if args.max_ratio is not None and single_time > legacy_time * args.max_ratio:
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+from line_notify.src import nagaoka_main
+from line_notify.src.nagaoka_main import NagaokaMain
+from scripts.benchmark.page_generator import generate_page
+
+# 計測する処理（NagaokaMain の処理順）
+STAGES = ('decode', 'parse', 'dedup', 'register', 'notify')
+
+
+class LocalHttpClient:
+    # Webページ取得、LINE通知をネットワークに接続せずに応答する（LnHttpClient と同じインターフェース）
+    timeout = (3.05, 10.0)
+
+    def __init__(self, page: bytes):
+        self._page = page
+        self.post_count = 0
+
+    @staticmethod
+    def _response(status_code: int, content: bytes = b'') -> requests.Response:
+        res = requests.Response()
+        res.status_code = status_code
+        res._content = content
+        res._content_consumed = True
+        return res
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self._response(200, self._page)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        self.post_count += 1
+        return self._response(200)
+
+    def close(self):
+        pass
+
+
+def run_once(page: bytes, work_dir: Path) -> dict[str, float]:
+    # 空のデータDBに対して1ページ分の処理を行い、処理ごとの時間[s]を返す
+    http_client = LocalHttpClient(page)
+    with (
+        mock.patch.dict(os.environ, {'LN_VARIABLE_DIR': str(work_dir)}),
+        mock.patch.object(nagaoka_main, 'initialize_logger'),
+        mock.patch.object(nagaoka_main, 'get_http_client', return_value=http_client),
+    ):
+        nagaoka = NagaokaMain()
+
+    elapsed: dict[str, float] = {}
+
+    start = time.perf_counter()
+    webpage_text = nagaoka._download_page()
+    elapsed['decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    disaster_text_info_list = nagaoka.parse(webpage_text)
+    elapsed['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_list = nagaoka._filter_new_disaster_text(disaster_text_info_list)
+    elapsed['dedup'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transitions = nagaoka._incident_tracker.plan(new_list)
+    nagaoka._register_disaster_text(new_list, transitions)
+    elapsed['register'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    nagaoka.dispatcher.dispatch_pending(flush=True)
+    elapsed['notify'] = time.perf_counter() - start
+
+    if not new_list or http_client.post_count == 0:
+        raise RuntimeError('benchmark page was not processed.')
+    return elapsed
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples: list[dict[str, float]]) -> dict[str, dict[str, float]]:
+    # 処理ごとの最短、中央値、平均[ms]
+    result = {}
+    for stage in STAGES + ('total',):
+        values = [sample[stage] * 1000 for sample in samples]
+        result[stage] = {
+            'min_ms': round(min(values), 3),
+            'median_ms': round(statistics.median(values), 3),
+            'mean_ms': round(statistics.mean(values), 3),
+        }
+    return result
+
+
+def compare(result: dict, baseline: dict, max_ratio: float) -> list[str]:
+    # 中央値が基準の max_ratio 倍を超えた処理（ページの条件が異なる場合は比較しない）
+    if {k: v for k, v in baseline.get('params', {}).items() if k != 'repeat'} != \
+            {k: v for k, v in result['params'].items() if k != 'repeat'}:
+        raise ValueError('baseline was measured with different page parameters.')
+    regressions = []
+    for stage, stats in result['stages'].items():
+        if (base := baseline.get('stages', {}).get(stage)) is None or base['median_ms'] <= 0:
+            continue
+        ratio = stats['median_ms'] / base['median_ms']
+        if ratio > max_ratio:
+            regressions.append(f'{stage}: {base["median_ms"]:.3f}ms -> {stats["median_ms"]:.3f}ms ({ratio:.2f}x)')
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark of the Nagaoka polling pipeline with a local mock.')
+    parser.add_argument('--current', type=int, default=1000, help='number of current entries in the page.')
+    parser.add_argument('--past', type=int, default=3000, help='number of past entries in the page.')
+    parser.add_argument('--repeat', type=int, default=5, help='number of measurements.')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the page generator.')
+    parser.add_argument('-o', '--output', type=Path, default=None, help='write results as JSON.')
+    parser.add_argument('--baseline', type=Path, default=None, help='JSON results of a previous run to compare.')
+    parser.add_argument('--max-ratio', type=float, default=1.2,
+                        help='fail if a stage median is slower than baseline * MAX_RATIO.')
+    args = parser.parse_args()
+
+    # 通知先トークン（ローカルのモックに送信するため任意の値）
+    os.environ.setdefault('LN_LINE_TOKEN_NAGAOKA', 'benchmark')
+
+    page = generate_page(args.current, args.past, seed=args.seed)
+    samples: list[dict[str, float]] = []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as work_dir:
+            elapsed = run_once(page, Path(work_dir))
+        elapsed['total'] = sum(elapsed.values())
+        samples.append(elapsed)
+
+    result = {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'current': args.current, 'past': args.past, 'repeat': args.repeat, 'seed': args.seed,
+                   'page_bytes': len(page)},
+        'stages': summarize(samples),
+    }
+
+    print(f'{"stage":<10}{"min[ms]":>12}{"median[ms]":>12}{"mean[ms]":>12}')
+    for stage, stats in result['stages'].items():
+        print(f'{stage:<10}{stats["min_ms"]:>12.3f}{stats["median_ms"]:>12.3f}{stats["mean_ms"]:>12.3f}')
+    if args.output is not None:
+        args.output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    if args.baseline is not None:
+        try:
+            regressions = compare(result, json.loads(args.baseline.read_text(encoding='utf-8')), args.max_ratio)
+        except ValueError as err:
+            print(err)
+            return 1
+        for regression in regressions:
+            print(f'regression: {regression}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
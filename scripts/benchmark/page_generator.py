@@ -0,0 +1,141 @@
+import argparse
+import datetime
+import random
+import sys
+from pathlib import Path
+
+PAGE_ENCODING = 'sjis'
+REFERENCE_DEFAULT = datetime.datetime(2023, 12, 21, 15, 30)
+
+# 長岡市の町名（丁目は一部のみ付与）
+TOWNS = (
+    '二日町', '与板町与板', '中島', '小国町千谷沢', '宮栄', '下河根川', '西千手', '日赤町', '新栄町', '関原町',
+    '葎谷', '寺島町', '上の原町', '本町', '中之島', '小国町二本柳', '石内', '昭和', '古正寺', '大手通',
+    '寺泊', '栃尾', '山古志', '川口', '和島', '三島', '越路', '小国町横沢', '千秋', '東坂之上町',
+)
+CATEGORIES = ('建物火災', '車両火災', 'その他火災', '救助活動', '救急活動', '警戒活動', 'ガス漏れ警戒')
+
+LI_TEMPLATE = (
+    '<li style="padding: 5px 3px 5px 3px; border-bottom: 1px dotted #999;">\n'
+    '\t<span>{text}</span>\n'
+    '</li>\n'
+)
+PAGE_TEMPLATE = '''<HTML>
+<HEAD>
+<TITLE>消防出動情報</TITLE>
+<meta http-equiv="Content-Type" content="text/html; charset=SHIFT_JIS">
+<meta http-equiv="Pragma" content="no-cache">
+<meta http-equiv="Cache-Control" content="no-cache">
+</HEAD>
+<BODY>
+<CENTER>
+<TABLE width="690" >
+<!-- ↓現在発生している災害↓ -->
+<TR>
+\t<TD>
+\t\t<ul style="margin: 0; padding: 5px; list-style: none; background: #FFECC1; font-size: 0.9em; color: #444444;">
+
+{current}
+\t\t</ul>
+\t</TD>
+</TR>
+<!-- ↑現在発生している災害↑ -->
+<TR>
+<TD><BR></TD>
+</TR>
+<!-- ↓過去の災害経過情報↓ -->
+<TR>
+\t<TD>
+\t\t<ul style="margin: 0; padding: 5px; list-style: none; background: #FFECC1; font-size: 0.9em; color: #444444;">
+
+{past}
+\t\t</ul>
+\t</TD>
+</TR>
+<!-- ↑過去の災害経過情報↑ -->
+</TABLE>
+<B>お問い合わせ</B><BR>
+<B>長岡市消防本部</B><BR>
+</CENTER>
+</BODY>
+</HTML>
+'''
+
+
+def _location(rng: random.Random) -> str:
+    # 丁目付きの場合は「丁目に」、それ以外は「 に」と続く（実際のページと同じ）
+    town = rng.choice(TOWNS)
+    if rng.random() < 0.4:
+        return f'長岡市 {town} {"１２３４５６"[rng.randrange(6)]}丁目'
+    return f'長岡市 {town} '
+
+
+def _head(occurred_at: datetime.datetime, location: str) -> str:
+    return f'{occurred_at:%m}月{occurred_at:%d}日　{occurred_at:%H:%M}　{location}'
+
+
+def generate_entries(
+    current_count: int,
+    past_count: int,
+    reference: datetime.datetime = REFERENCE_DEFAULT,
+    seed: int = 0,
+) -> tuple[list[str], list[str]]:
+    # 現在発生中の災害、過去の災害経過情報の文字列（新しい順、発生日時は全て異なる）
+    rng = random.Random(seed)
+    current: list[str] = []
+    for i in range(current_count):
+        occurred_at = reference - datetime.timedelta(minutes=i)
+        current.append(f'{_head(occurred_at, _location(rng))}に{rng.choice(CATEGORIES)}のため消防車が出動しました。')
+
+    past: list[str] = []
+    for i in range(past_count):
+        occurred_at = reference - datetime.timedelta(minutes=current_count + i)
+        head = _head(occurred_at, _location(rng))
+        status_at = occurred_at + datetime.timedelta(minutes=rng.randrange(5, 90))
+        kind = i % 5
+        if kind == 0:
+            past.append(f'{head}に{rng.choice(CATEGORIES)}のため消防車が出動しました。')
+        elif kind == 1:
+            past.append(f'{head}の建物火災は{status_at:%H:%M}に鎮圧しました。')
+        elif kind == 2:
+            past.append(f'{head}の車両火災は{status_at:%H:%M}に鎮火しました。')
+        elif kind == 3:
+            past.append(f'{head}の救助活動は{status_at:%H:%M}に救助終了しました。')
+        else:
+            past.append(f'{head}のその他火災は消火の必要はありませんでした。')
+    return current, past
+
+
+def generate_page(
+    current_count: int = 1000,
+    past_count: int = 3000,
+    reference: datetime.datetime = REFERENCE_DEFAULT,
+    seed: int = 0,
+) -> bytes:
+    # 実際のWebページと同じ構造、文字コード（Shift_JIS）のページを生成
+    current, past = generate_entries(current_count, past_count, reference, seed)
+    page = PAGE_TEMPLATE.format(
+        current=''.join(LI_TEMPLATE.format(text=text) for text in current),
+        past=''.join(LI_TEMPLATE.format(text=text) for text in past),
+    )
+    return page.encode(PAGE_ENCODING)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Generate a synthetic disaster information page (Shift_JIS).')
+    parser.add_argument('--current', type=int, default=1000, help='number of current entries.')
+    parser.add_argument('--past', type=int, default=3000, help='number of past entries.')
+    parser.add_argument('--seed', type=int, default=0, help='random seed.')
+    parser.add_argument('-o', '--output', type=Path, default=None, help='output file (default: stdout).')
+    args = parser.parse_args()
+
+    page = generate_page(args.current, args.past, seed=args.seed)
+    if args.output is None:
+        sys.stdout.buffer.write(page)
+    else:
+        args.output.write_bytes(page)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,29 @@
+import pytest
+
+from line_notify.src.disaster_text_parser import attach_disaster_records, parse_disaster_text
+from line_notify.src.page_sections import read_page_sections
+from scripts.benchmark.bench_pipeline import compare
+from scripts.benchmark.page_generator import generate_page
+
+
+def test_generate_page():
+    # 生成したページは全ての災害情報が解析できる（過去の災害経過情報のうち出動は対象外）
+    reader = read_page_sections([generate_page(current_count=50, past_count=100)])
+    disaster_text_info_list = attach_disaster_records(parse_disaster_text(reader.text()), '長岡市')
+    assert len(disaster_text_info_list) == 50 + 80
+    assert all(dinfo.record is not None for dinfo in disaster_text_info_list)
+
+
+def test_generate_page_seed():
+    assert generate_page(10, 10, seed=1) == generate_page(10, 10, seed=1)
+    assert generate_page(10, 10, seed=1) != generate_page(10, 10, seed=2)
+
+
+def test_compare():
+    params = {'current': 1, 'past': 1, 'repeat': 5}
+    baseline = {'params': params, 'stages': {'parse': {'median_ms': 10.0}, 'notify': {'median_ms': 10.0}}}
+    result = {'params': params, 'stages': {'parse': {'median_ms': 13.0}, 'notify': {'median_ms': 11.0}}}
+    assert compare(result, baseline, 1.2) == ['parse: 10.000ms -> 13.000ms (1.30x)']
+
+    with pytest.raises(ValueError):
+        compare({'params': {**params, 'past': 2}, 'stages': {}}, baseline, 1.2)
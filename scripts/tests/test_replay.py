@@ -0,0 +1,56 @@
+import contextlib
+import datetime
+import sqlite3
+
+from line_notify.src.page_archive import PageArchive
+from line_notify.src.page_sections import read_page_sections
+from scripts.benchmark.page_generator import generate_page
+from scripts.tools.replay import import_pages, replay
+
+START = datetime.datetime(2023, 12, 21, 0, 0).timestamp()
+
+
+def create_archive(tmp_path) -> PageArchive:
+    # 1時間ごとに取得したページ（2回に1回は前回と同じ本文）
+    archive = PageArchive(tmp_path / 'archive')
+    for i in range(6):
+        raw = read_page_sections([generate_page(5, 10, seed=i // 2)], keep_raw=True).raw
+        archive.put('nagaoka', raw, fetched_at=START + i * 3600)
+    return archive
+
+
+def test_replay(tmp_path):
+    archive = create_archive(tmp_path)
+    db_path = tmp_path / 'line_notify_data.db'
+    result = replay(archive, 'nagaoka', db_path, workers=2)
+    assert (result['snapshots'], result['pages'], result['distinct_pages'], result['errors']) == (6, 3, 3, 0)
+
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        rows = conn.execute('SELECT COUNT(*), MIN(datetime) FROM t_disaster_text_nagaoka;').fetchone()
+        outbox = conn.execute('SELECT COUNT(*) FROM t_notify_outbox;').fetchone()[0]
+    assert rows == (result['new'], '2023-12-21 00:00:00')
+    assert outbox == 0
+
+    # 2回目は全て登録済み
+    assert replay(archive, 'nagaoka', db_path, workers=2)['new'] == 0
+
+
+def test_replay_range_dry_run(tmp_path):
+    archive = create_archive(tmp_path)
+    db_path = tmp_path / 'line_notify_data.db'
+    result = replay(archive, 'nagaoka', db_path, since=START + 2 * 3600, until=START + 4 * 3600, workers=1,
+                    dry_run=True)
+    assert (result['snapshots'], result['pages']) == (2, 1)
+    assert result['new'] > 0
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t_disaster_text_nagaoka;').fetchone()[0] == 0
+
+
+def test_import_pages(tmp_path):
+    page_path = tmp_path / 'saigaipc.html'
+    page_path.write_bytes(generate_page(5, 10) + b'<!-- trailer -->')
+    archive = PageArchive(tmp_path / 'archive')
+    assert import_pages(archive, 'nagaoka', [page_path], fetched_at=START) == 1
+    [(fetched_at, digest)] = archive.snapshots('nagaoka')
+    assert fetched_at == START
+    assert digest == read_page_sections([page_path.read_bytes()]).digest
@@ -0,0 +1,56 @@
+import pytest
+import requests
+
+from scripts.tools.load_test import percentile
+from scripts.tools.stand_in_server import StandInServer, StandInSettings
+
+
+@pytest.fixture
+def stand_in_server():
+    def start(**kwargs) -> StandInServer:
+        server = StandInServer(('127.0.0.1', 0), StandInSettings(current_count=2, past_count=5, **kwargs))
+        server.start()
+        servers.append(server)
+        return server
+
+    servers: list[StandInServer] = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_page_etag(stand_in_server):
+    server = stand_in_server(rotate_every=0)
+    res = requests.get(server.page_url, timeout=5)
+    assert res.status_code == 200
+    assert '↓現在発生している災害↓' in res.content.decode('sjis')
+
+    # 変更がない場合は304
+    res = requests.get(server.page_url, headers={'If-None-Match': res.headers['ETag']}, timeout=5)
+    assert res.status_code == 304
+    assert server.state.stats['page_304'] == 1
+
+
+def test_page_rotate(stand_in_server):
+    server = stand_in_server(rotate_every=1)
+    etag = requests.get(server.page_url, timeout=5).headers['ETag']
+    assert requests.get(server.page_url, headers={'If-None-Match': etag}, timeout=5).status_code == 200
+
+
+def test_notify_rate_limit(stand_in_server):
+    server = stand_in_server(rate_limit=2)
+    headers = {'Authorization': 'Bearer token'}
+    responses = [requests.post(server.notify_url, headers=headers, params={'message': 'm'}, timeout=5)
+                 for _ in range(3)]
+    assert [res.status_code for res in responses] == [200, 200, 429]
+    assert responses[1].headers['X-RateLimit-Remaining'] == '0'
+    assert int(responses[2].headers['X-RateLimit-Reset']) > 0
+
+    # トークンがない場合は401
+    assert requests.post(server.notify_url, params={'message': 'm'}, timeout=5).status_code == 401
+
+
+def test_percentile():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([float(v) for v in range(1, 101)], 0.99) == 99.0
@@ -0,0 +1,124 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from line_notify.src import nagaoka_main
+from line_notify.src.nagaoka_main import NagaokaMain
+from scripts.tools.stand_in_server import StandInServer, add_arguments, settings_from_args
+
+
+def percentile(values: list[float], ratio: float) -> float:
+    # 最近傍法によるパーセンタイル
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(ratio * len(ordered)) - 1))]
+
+
+def create_nagaoka(work_dir: Path) -> NagaokaMain:
+    # ログ出力先を使わず、作業ディレクトリを variable_dir としてインスタンスを生成（接続先は環境変数で指定済み）
+    with (
+        mock.patch.dict(os.environ, {'LN_VARIABLE_DIR': str(work_dir)}),
+        mock.patch.object(nagaoka_main, 'initialize_logger'),
+    ):
+        nagaoka = NagaokaMain()
+    # 再試行のたびに出力される警告は結果の集計で確認する
+    logging.getLogger('ln.nagaoka').setLevel(logging.ERROR)
+    return nagaoka
+
+
+def outbox_summary(db_path: Path) -> dict[str, int]:
+    # アウトボックスの送信結果（再試行回数は送信済みメッセージの attempts - 1 の合計）
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        row = conn.execute(
+            'SELECT '
+            'COUNT(*), '
+            'SUM(delivered_at IS NOT NULL), '
+            'SUM(failed_at IS NOT NULL), '
+            'SUM(delivered_at IS NULL AND failed_at IS NULL), '
+            'IFNULL(SUM(MAX(attempts - 1, 0)), 0) '
+            'FROM t_notify_outbox;'
+        ).fetchone()
+    return dict(zip(('queued', 'delivered', 'failed', 'pending', 'retries'), (int(v or 0) for v in row)))
+
+
+def run(args: argparse.Namespace) -> dict:
+    server = StandInServer((args.host, 0), settings_from_args(args))
+    server.start()
+    os.environ['LN_SITE_URL_NAGAOKA'] = server.page_url
+    os.environ['LN_NOTIFY_URL'] = server.notify_url
+    os.environ.setdefault('LN_LINE_TOKEN_NAGAOKA', 'load-test')
+
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            nagaoka = create_nagaoka(Path(work_dir))
+
+            # ポーリング1回分（NagaokaMain.main と同じ処理、失敗回数を数える）
+            latencies: list[float] = []
+            errors = 0
+            started = time.perf_counter()
+            for _ in range(args.cycles):
+                start = time.perf_counter()
+                try:
+                    if (webpage_text := nagaoka.fetch()) is not None:
+                        nagaoka.process(nagaoka.parse(webpage_text))
+                    nagaoka.dispatcher.dispatch_pending(flush=True)
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+            elapsed = time.perf_counter() - started
+
+            # 再試行待ちの通知を送信し終えるまで待つ
+            deadline = time.monotonic() + args.drain_timeout
+            while outbox_summary(nagaoka._data_db_path)['pending'] and time.monotonic() < deadline:
+                nagaoka.dispatcher.dispatch_pending(flush=True)
+                time.sleep(0.1)
+
+            outbox = outbox_summary(nagaoka._data_db_path)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'cycles': args.cycles,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'cycles_per_s': round(args.cycles / elapsed, 3) if elapsed > 0 else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'max': round(max(latencies, default=0.0) * 1000, 3),
+        },
+        'outbox': outbox,
+        'server': dict(server.state.stats),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Offline load test of poll/notify cycles against the stand-in server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--cycles', type=int, default=1000, help='number of poll/notify cycles.')
+    parser.add_argument('--drain-timeout', type=float, default=30.0, help='max wait for pending notifications [s].')
+    parser.add_argument('-o', '--output', type=Path, default=None, help='write results as JSON.')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output is not None:
+        args.output.write_text(text, encoding='utf-8')
+    return 1 if result['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
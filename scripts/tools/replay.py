@@ -0,0 +1,151 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from line_notify.src.db_migration import DbMigration
+from line_notify.src.disaster_store import DisasterTextStore
+from line_notify.src.disaster_text_parser import attach_disaster_records, parse_disaster_text
+from line_notify.src.errors import TextAnalysisError
+from line_notify.src.page_archive import COMPRESSION_DEFAULT, COMPRESSORS, PageArchive
+from line_notify.src.page_sections import read_page_sections
+from line_notify.src.structures import DisasterTextInfo
+
+# 通知元ごとの都市名、災害情報テーブル
+SOURCES = {
+    'nagaoka': ('長岡市', 't_disaster_text_nagaoka'),
+}
+
+
+def parse_snapshot(archive_dir: str, source: str, digest: str, fetched_at: float) -> list[DisasterTextInfo] | str:
+    # 保存したページを展開して解析（ワーカープロセスで実行、解析できない場合はエラー内容を返す）
+    city_name = SOURCES[source][0]
+    try:
+        reader = read_page_sections([PageArchive(Path(archive_dir)).get(digest)])
+        return attach_disaster_records(
+            parse_disaster_text(reader.text()), city_name, datetime.datetime.fromtimestamp(fetched_at)
+        )
+    except TextAnalysisError as err:
+        return str(err)
+
+
+def parse_time(value: str) -> float:
+    # ISO 8601 形式の日付、日時（タイムゾーンなしの場合はローカル時刻）
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def replay(
+    archive: PageArchive,
+    source: str,
+    db_path: Path,
+    since: float | None = None,
+    until: float | None = None,
+    workers: int | None = None,
+    dry_run: bool = False,
+) -> dict:
+    # 期間内に保存したページを取得日時順に解析、重複判定し、未登録の災害情報をデータDBに登録する
+    # （解析は本文ごとに1回だけプロセスプールで行い、登録は取得日時順に1プロセスで行う。通知は行わない）
+    city_name, table_name = SOURCES[source]
+    snapshots = archive.snapshots(source, since, until)
+
+    # 連続して同じ本文を取得した記録は除く
+    changed: list[tuple[float, str]] = []
+    for fetched_at, digest in snapshots:
+        if not changed or changed[-1][1] != digest:
+            changed.append((fetched_at, digest))
+    first_fetched: dict[str, float] = {}
+    for fetched_at, digest in changed:
+        first_fetched.setdefault(digest, fetched_at)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        digests = list(first_fetched)
+        parsed = dict(zip(digests, pool.map(
+            parse_snapshot,
+            [str(archive.archive_dir)] * len(digests), [source] * len(digests), digests,
+            [first_fetched[digest] for digest in digests],
+            chunksize=max(1, len(digests) // (4 * (workers or os.cpu_count() or 1))),
+        )))
+    parse_elapsed = time.perf_counter() - started
+
+    DbMigration(db_path).migrate()
+    store = DisasterTextStore(db_path, city_name, table_name)
+    counts = {'snapshots': len(snapshots), 'pages': len(changed), 'distinct_pages': len(parsed),
+              'errors': 0, 'parsed': 0, 'new': 0}
+    for fetched_at, digest in changed:
+        if isinstance(result := parsed[digest], str):
+            counts['errors'] += 1
+            continue
+        counts['parsed'] += len(result)
+        new_list = store.filter_new(result)
+        counts['new'] += len(new_list)
+        if dry_run:
+            store.remember(new_list)
+        else:
+            store.register(new_list, registered_at=datetime.datetime.fromtimestamp(fetched_at))
+
+    return {
+        **counts,
+        'parse_s': round(parse_elapsed, 3),
+        'elapsed_s': round(time.perf_counter() - started, 3),
+    }
+
+
+def import_pages(archive: PageArchive, source: str, paths: list[Path], fetched_at: float | None = None) -> int:
+    # 保存済みのページファイルを追加（取得日時の指定がない場合はファイルの更新日時）
+    for path in paths:
+        raw = read_page_sections([path.read_bytes()], keep_raw=True).raw
+        archive.put(source, raw, fetched_at if fetched_at is not None else path.stat().st_mtime)
+    return len(paths)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Archive of fetched pages and replay of the parse/dedup pipeline.')
+    parser.add_argument('archive_dir', type=Path, help='archive directory (LN_ARCHIVE_DIR or variable_dir/archive).')
+    parser.add_argument('--source', choices=sorted(SOURCES), default='nagaoka')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_replay = subparsers.add_parser('replay', help='parse and register archived pages in a time range.')
+    parser_replay.add_argument('--db', type=Path, default=None,
+                               help='data DB to register into (default: a temporary DB, implies --dry-run).')
+    parser_replay.add_argument('--since', type=parse_time, default=None, help='ISO date/datetime (inclusive).')
+    parser_replay.add_argument('--until', type=parse_time, default=None, help='ISO date/datetime (exclusive).')
+    parser_replay.add_argument('--workers', type=int, default=None, help='number of parser processes.')
+    parser_replay.add_argument('--dry-run', action='store_true', help='count new entries without registering.')
+
+    parser_import = subparsers.add_parser('import', help='add saved page files to the archive.')
+    parser_import.add_argument('pages', type=Path, nargs='+')
+    parser_import.add_argument('--fetched-at', type=parse_time, default=None,
+                               help='ISO datetime of the pages (default: file mtime).')
+    parser_import.add_argument('--compression', choices=sorted(COMPRESSORS), default=COMPRESSION_DEFAULT)
+
+    subparsers.add_parser('stats', help='show the number of snapshots and stored bytes.')
+
+    args = parser.parse_args()
+    if args.command == 'import':
+        archive = PageArchive(args.archive_dir, args.compression)
+        print(f'imported {import_pages(archive, args.source, args.pages, args.fetched_at)} pages.')
+        return 0
+
+    archive = PageArchive(args.archive_dir)
+    if args.command == 'stats':
+        print(json.dumps(archive.stats(), indent=2))
+        return 0
+
+    if args.db is not None:
+        result = replay(archive, args.source, args.db, args.since, args.until, args.workers, args.dry_run)
+    else:
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = replay(archive, args.source, Path(work_dir) / 'line_notify_data.db',
+                            args.since, args.until, args.workers, dry_run=True)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 1 if result['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
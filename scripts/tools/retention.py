@@ -0,0 +1,83 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from line_notify.src.errors import DbOperationError
+from line_notify.src.retention import (
+    FINGERPRINT_DAYS_DEFAULT, RETENTION_DAYS_DEFAULT, TIME_BUDGET_DEFAULT, DataRetention
+)
+
+
+def create_retention(args) -> DataRetention:
+    return DataRetention(
+        args.database_filepath,
+        archive_dir=args.archive_dir,
+        retention_days=getattr(args, 'retention_days', RETENTION_DAYS_DEFAULT),
+        fingerprint_days=getattr(args, 'fingerprint_days', FINGERPRINT_DAYS_DEFAULT),
+    )
+
+
+def run(args) -> int:
+    retention = create_retention(args)
+    start = time.perf_counter()
+    result = retention.run(args.time_budget)
+    for month, count in sorted(result.moved.items()):
+        print(f'{month}  {count:>6} rows moved')
+    print(f'{result.pruned_fingerprints} fingerprints, {result.pruned_outbox} outbox rows and '
+          f'{result.pruned_incidents} closed incidents pruned, {result.vacuumed_pages} pages vacuumed '
+          f'({time.perf_counter() - start:.2f}s).')
+    if not result.completed:
+        print('time budget exceeded: run again to continue.', file=sys.stderr)
+    return 0
+
+
+def convert(args) -> int:
+    start = time.perf_counter()
+    create_retention(args).convert_to_incremental()
+    print(f'converted to auto_vacuum=INCREMENTAL ({time.perf_counter() - start:.2f}s).')
+    return 0
+
+
+def list_archives(args) -> int:
+    for path in create_retention(args).archives():
+        print(f'{path}  {path.stat().st_size:>12}')
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Move old disaster texts to monthly archive DBs.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common_arguments(subparser: argparse.ArgumentParser):
+        subparser.add_argument('database_filepath', type=Path, help='data DB (variable_dir/db/line_notify_data.db).')
+        subparser.add_argument('--archive-dir', type=Path, default=None,
+                               help='directory of monthly archive DBs (default: <data DB dir>/archive).')
+
+    parser_run = subparsers.add_parser('run', help='move expired rows, prune fingerprints and vacuum free pages.')
+    add_common_arguments(parser_run)
+    parser_run.add_argument('--retention-days', type=int, default=RETENTION_DAYS_DEFAULT)
+    parser_run.add_argument('--fingerprint-days', type=int, default=FINGERPRINT_DAYS_DEFAULT)
+    parser_run.add_argument('--time-budget', type=float, default=TIME_BUDGET_DEFAULT, help='seconds.')
+    parser_run.set_defaults(func=run)
+
+    parser_convert = subparsers.add_parser(
+        'convert', help='enable incremental vacuum on an existing data DB (rewrites the DB; stop the daemon first).'
+    )
+    add_common_arguments(parser_convert)
+    parser_convert.set_defaults(func=convert)
+
+    parser_list = subparsers.add_parser('list', help='list monthly archive DBs.')
+    add_common_arguments(parser_list)
+    parser_list.set_defaults(func=list_archives)
+
+    args = parser.parse_args()
+    try:
+        return args.func(args)
+    except (ValueError, DbOperationError) as err:
+        print(f'ERROR: {err}', file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
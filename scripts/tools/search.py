@@ -0,0 +1,81 @@
+import argparse
+import datetime
+import json
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from line_notify.src.disaster_search import LIMIT_DEFAULT, DisasterSearch
+from line_notify.src.errors import DbOperationError
+
+# 都市ごとの災害情報テーブル
+TABLES = {
+    'nagaoka': 't_disaster_text_nagaoka',
+    'niigata': 't_disaster_text_niigata',
+}
+
+
+def parse_date(value: str) -> datetime.datetime:
+    # ISO 8601 形式の日付、日時
+    return datetime.datetime.fromisoformat(value)
+
+
+def parse_hit_id(value: str) -> tuple[str | None, int]:
+    # 検索結果のID（データDBは rowid、アーカイブDBは「YYYY-MM:rowid」）
+    archive, sep, rowid = value.rpartition(':')
+    return (archive if sep else None), int(rowid)
+
+
+def format_hit_id(hit) -> str:
+    return f'{hit.archive}:{hit.rowid}' if hit.archive is not None else f'{hit.rowid}'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Search disaster history in the data DB.')
+    parser.add_argument('database_filepath', type=Path, help='data DB (variable_dir/db/line_notify_data.db).')
+    parser.add_argument('terms', nargs='*', help='words that all hits contain (e.g. 車両火災 与板).')
+    parser.add_argument('--city', choices=sorted(TABLES), default='nagaoka')
+    parser.add_argument('--since', type=parse_date, default=None, help='occurred at or after (ISO date/datetime).')
+    parser.add_argument('--until', type=parse_date, default=None, help='occurred before (ISO date/datetime).')
+    parser.add_argument('--category', default=None, help='disaster category in master data (e.g. 火災).')
+    parser.add_argument('--status', default=None, help='disaster status in master data (e.g. 鎮火).')
+    parser.add_argument('--district', default=None, help='district in master data (e.g. 長岡市).')
+    parser.add_argument('--limit', type=int, default=LIMIT_DEFAULT, help='hits per page.')
+    parser.add_argument('--before', type=parse_hit_id, default=None, help='show hits older than this id (next page).')
+    parser.add_argument('--archive-dir', type=Path, default=None,
+                        help='directory of monthly archive DBs searched after the data DB '
+                             '(default: <data DB dir>/archive).')
+    parser.add_argument('--count', action='store_true', help='print the number of hits only.')
+    parser.add_argument('--json', action='store_true', help='print hits as JSON lines.')
+    args = parser.parse_args()
+
+    search = DisasterSearch(args.database_filepath, TABLES[args.city], archive_dir=args.archive_dir)
+    before_archive, before = args.before if args.before is not None else (None, None)
+    conditions = dict(since=args.since, until=args.until, category=args.category, status=args.status,
+                      district=args.district)
+    start = time.perf_counter()
+    try:
+        if args.count:
+            print(search.count(args.terms, **conditions))
+            return 0
+        hits = search.search(args.terms, limit=args.limit, before=before, before_archive=before_archive, **conditions)
+    except (ValueError, DbOperationError) as err:
+        print(f'ERROR: {err}', file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    for hit in hits:
+        if args.json:
+            print(json.dumps(asdict(hit), ensure_ascii=False))
+        else:
+            print(f'{format_hit_id(hit):>8}  {hit.occurred_at or "-":<19}  {hit.disaster_text}')
+    if not args.json:
+        print(f'{len(hits)} hits ({elapsed * 1000:.1f}ms)', file=sys.stderr)
+        if len(hits) == args.limit:
+            print(f'next page: --before {format_hit_id(hits[-1])}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import argparse
+import email.utils
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from scripts.benchmark.page_generator import generate_page
+
+PAGE_PATH = '/fire/saigai/saigaipc.html'
+NOTIFY_PATH = '/api/notify'
+STATS_PATH = '/stats'
+
+
+@dataclass
+class StandInSettings:
+    # Webページ（録画したページを順に返す、指定がない場合は生成したページ）
+    pages: list[bytes] = field(default_factory=list)
+    current_count: int = 20
+    past_count: int = 200
+    # 何回の取得ごとにページを更新するか（0: 更新しない）
+    rotate_every: int = 1
+    page_latency: float = 0.0
+    notify_latency: float = 0.0
+    latency_jitter: float = 0.0
+    # LINE Notify のレート制限（トークンごと、rate_window 秒あたり rate_limit 件）
+    rate_limit: int = 1000
+    rate_window: float = 3600.0
+    # LINE Notify が500を返す割合
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+class StandInState:
+    """ページの内容、トークンごとの送信数、統計情報（全てのリクエストスレッドで共有）"""
+
+    def __init__(self, settings: StandInSettings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._rng = random.Random(settings.seed)
+        self._page_index = 0
+        self._page_requests = 0
+        self._page = self._build_page(0)
+        self._page_time = time.time()
+        self._windows: dict[str, tuple[float, int]] = {}
+        self.stats: dict[str, int] = {
+            'page_200': 0, 'page_304': 0, 'notify_200': 0, 'notify_401': 0, 'notify_429': 0, 'notify_500': 0,
+        }
+
+    def _build_page(self, index: int) -> bytes:
+        if self.settings.pages:
+            return self.settings.pages[index % len(self.settings.pages)]
+        return generate_page(self.settings.current_count, self.settings.past_count, seed=self.settings.seed + index)
+
+    def latency(self, base: float) -> float:
+        with self._lock:
+            return max(0.0, base + self._rng.uniform(-1.0, 1.0) * self.settings.latency_jitter)
+
+    def get_page(self) -> tuple[bytes, str, str]:
+        # 現在のページ、ETag、Last-Modified（rotate_every 回の取得ごとに次のページに更新）
+        with self._lock:
+            self._page_requests += 1
+            if self.settings.rotate_every and self._page_requests > self.settings.rotate_every:
+                self._page_requests = 1
+                self._page_index += 1
+                self._page = self._build_page(self._page_index)
+                self._page_time = time.time()
+            page = self._page
+            etag = f'"{hashlib.sha256(page).hexdigest()[:16]}"'
+            return page, etag, email.utils.formatdate(self._page_time, usegmt=True)
+
+    def post_notify(self, token: str) -> tuple[int, dict[str, str]]:
+        # LINE Notify と同じ応答ステータス、レート制限ヘッダー
+        now = time.time()
+        with self._lock:
+            if not token:
+                self.stats['notify_401'] += 1
+                return 401, {}
+            if self._rng.random() < self.settings.error_rate:
+                self.stats['notify_500'] += 1
+                return 500, {}
+            window_start, count = self._windows.get(token, (now, 0))
+            if now - window_start >= self.settings.rate_window:
+                window_start, count = now, 0
+            reset = window_start + self.settings.rate_window
+            if count >= self.settings.rate_limit:
+                status = 429
+            else:
+                count += 1
+                status = 200
+            self._windows[token] = (window_start, count)
+            self.stats[f'notify_{status}'] += 1
+            return status, {
+                'X-RateLimit-Limit': str(self.settings.rate_limit),
+                'X-RateLimit-Remaining': str(self.settings.rate_limit - count),
+                'X-RateLimit-Reset': str(int(reset)),
+            }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = 'LnStandIn/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def state(self) -> StandInState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        # リクエストごとのログは出力しない
+        pass
+
+    def _reply(self, status: int, body: bytes = b'', headers: dict[str, str] | None = None,
+               content_type: str = 'text/plain'):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if body or status not in (204, 304):
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == STATS_PATH:
+            with self.state._lock:
+                body = json.dumps(self.state.stats).encode('utf-8')
+            self._reply(200, body, content_type='application/json')
+            return
+        if path != PAGE_PATH:
+            self._reply(404)
+            return
+
+        time.sleep(self.state.latency(self.state.settings.page_latency))
+        page, etag, last_modified = self.state.get_page()
+        headers = {'ETag': etag, 'Last-Modified': last_modified}
+        if self.headers.get('If-None-Match') == etag:
+            with self.state._lock:
+                self.state.stats['page_304'] += 1
+            self._reply(304, headers=headers)
+            return
+        with self.state._lock:
+            self.state.stats['page_200'] += 1
+        self._reply(200, page, headers, content_type='text/html; charset=Shift_JIS')
+
+    def do_POST(self):
+        # 本文は読み捨てる（LINE Notify はクエリパラメータ、フォームのどちらでも受け付ける）
+        if (length := int(self.headers.get('Content-Length') or 0)) > 0:
+            self.rfile.read(length)
+        if self.path.split('?', 1)[0] != NOTIFY_PATH:
+            self._reply(404)
+            return
+
+        time.sleep(self.state.latency(self.state.settings.notify_latency))
+        authorization = self.headers.get('Authorization', '')
+        token = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else ''
+        status, headers = self.state.post_notify(token)
+        body = json.dumps({'status': status, 'message': 'ok' if status == 200 else 'error'}).encode('utf-8')
+        self._reply(status, body, headers, content_type='application/json')
+
+
+class StandInServer(ThreadingHTTPServer):
+    """消防出動情報ページと LINE Notify API の代わりに応答するローカルHTTPサーバー（負荷試験用）"""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], settings: StandInSettings):
+        super().__init__(address, StandInHandler)
+        self.state = StandInState(settings)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def page_url(self) -> str:
+        return self.base_url + PAGE_PATH
+
+    @property
+    def notify_url(self) -> str:
+        return self.base_url + NOTIFY_PATH
+
+    def start(self) -> threading.Thread:
+        # バックグラウンドのスレッドで応答を開始
+        thread = threading.Thread(target=self.serve_forever, name='ln-stand-in', daemon=True)
+        thread.start()
+        return thread
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--page', type=Path, action='append', default=[],
+                        help='recorded page (Shift_JIS) to serve; repeat to rotate pages.')
+    parser.add_argument('--current', type=int, default=20, help='current entries of synthetic pages.')
+    parser.add_argument('--past', type=int, default=200, help='past entries of synthetic pages.')
+    parser.add_argument('--rotate-every', type=int, default=1, help='switch page every N requests (0: never).')
+    parser.add_argument('--page-latency', type=float, default=0.0, help='page response latency [s].')
+    parser.add_argument('--notify-latency', type=float, default=0.0, help='notify response latency [s].')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='uniform latency jitter [s].')
+    parser.add_argument('--rate-limit', type=int, default=1000, help='notify requests per token per window.')
+    parser.add_argument('--rate-window', type=float, default=3600.0, help='rate limit window [s].')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='ratio of notify requests answered by 500.')
+    parser.add_argument('--seed', type=int, default=0, help='random seed.')
+
+
+def settings_from_args(args: argparse.Namespace) -> StandInSettings:
+    return StandInSettings(
+        pages=[path.read_bytes() for path in args.page],
+        current_count=args.current,
+        past_count=args.past,
+        rotate_every=args.rotate_every,
+        page_latency=args.page_latency,
+        notify_latency=args.notify_latency,
+        latency_jitter=args.latency_jitter,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Local stand-in for the fire department page and LINE Notify.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = StandInServer((args.host, args.port), settings_from_args(args))
+    print(f'LN_SITE_URL_NAGAOKA={server.page_url}')
+    print(f'LN_NOTIFY_URL={server.notify_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import argparse
+import datetime
+import json
+import sys
+import time
+from pathlib import Path
+
+from line_notify.src.disaster_stats import GROUP_COLUMNS, DisasterStats
+from line_notify.src.errors import DbOperationError
+
+# 都市名
+CITIES = {
+    'nagaoka': '長岡市',
+    'niigata': '新潟市',
+}
+
+
+def parse_date(value: str) -> datetime.date:
+    # ISO 8601 形式の日付
+    return datetime.date.fromisoformat(value)
+
+
+def backfill(args) -> int:
+    stats = DisasterStats(args.database_filepath, archive_dir=args.archive_dir)
+    start = time.perf_counter()
+    created = stats.rebuild(CITIES[args.city] if args.city else None, args.since, args.until)
+    print(f'rebuilt {created} daily rows ({time.perf_counter() - start:.2f}s).')
+    return 0
+
+
+def report(args) -> int:
+    stats = DisasterStats(args.database_filepath)
+    rows = stats.report(CITIES[args.city], args.by, args.since, args.until)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    for row in rows:
+        print('  '.join(f'{row[name]}' for name in args.by) + f'  {row["count"]:>6}')
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Daily disaster statistics by district/category/status.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_backfill = subparsers.add_parser('backfill', help='rebuild daily rows from the disaster text tables and archive DBs.')
+    parser_backfill.add_argument('database_filepath', type=Path)
+    parser_backfill.add_argument('--city', choices=sorted(CITIES), default=None, help='default: all cities.')
+    parser_backfill.add_argument('--since', type=parse_date, default=None, help='first day (inclusive).')
+    parser_backfill.add_argument('--until', type=parse_date, default=None, help='last day (exclusive).')
+    parser_backfill.add_argument('--archive-dir', type=Path, default=None,
+                                 help='directory of monthly archive DBs counted too (default: <data DB dir>/archive).')
+    parser_backfill.set_defaults(func=backfill)
+
+    parser_report = subparsers.add_parser('report', help='count disasters in a period.')
+    parser_report.add_argument('database_filepath', type=Path)
+    parser_report.add_argument('--city', choices=sorted(CITIES), default='nagaoka')
+    parser_report.add_argument('--since', type=parse_date, default=None, help='first day (inclusive).')
+    parser_report.add_argument('--until', type=parse_date, default=None, help='last day (exclusive).')
+    parser_report.add_argument('--by', nargs='*', choices=sorted(GROUP_COLUMNS), default=['month'],
+                               help='group by these columns (default: month).')
+    parser_report.add_argument('--json', action='store_true')
+    parser_report.set_defaults(func=report)
+
+    args = parser.parse_args()
+    try:
+        return args.func(args)
+    except (ValueError, DbOperationError) as err:
+        print(f'ERROR: {err}', file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())